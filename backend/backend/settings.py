@@ -116,6 +116,8 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'backend.wsgi.application'
+# The SSE order streams hold connections open: serve them with an ASGI server,
+# e.g. `uvicorn backend.asgi:application` (under WSGI each stream ties up a worker)
 
 
 # Database
@@ -128,6 +130,17 @@ DATABASES = {
     }
 }
 
+# Archived orders can live in their own database file:
+# ORDER_ARCHIVE_DB_PATH=/var/lib/kroypata/archive.sqlite3, then
+# python manage.py migrate --database archive
+if os.environ.get('ORDER_ARCHIVE_DB_PATH'):
+    DATABASES['archive'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['ORDER_ARCHIVE_DB_PATH'],
+    }
+ORDER_ARCHIVE_DATABASE = 'archive' if 'archive' in DATABASES else 'default'
+DATABASE_ROUTERS = ['orders.db_routers.OrderArchiveRouter']
+
 
 
 CACHES = {
@@ -201,6 +214,12 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'mediafiles')
 
+# Uploads are stored once per distinct content (utils.storage); `manage.py sweep_orphan_media` removes unreferenced files
+STORAGES = {
+    'default': {'BACKEND': 'utils.storage.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
 
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -304,6 +323,116 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_LOGOUT': True,
 }
 
+# Email (file backend locally - messages are written to BASE_DIR/sent_emails)
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.filebased.EmailBackend')
+EMAIL_FILE_PATH = BASE_DIR / 'sent_emails'
+DEFAULT_FROM_EMAIL = 'ICommerce <no-reply@chinakroy.com>'
+
+# Order outbox worker (python manage.py run_outbox_worker)
+# For local development point OUTBOX_WEBHOOK_URLS at the webhook sink:
+# OUTBOX_WEBHOOK_URLS=http://127.0.0.1:8000/api/orders/outbox/webhook-sink/
+OUTBOX_WEBHOOK_URLS = [url for url in os.environ.get('OUTBOX_WEBHOOK_URLS', '').split(',') if url]
+OUTBOX_WEBHOOK_TIMEOUT = 10  # seconds
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_BACKOFF_BASE = 5  # seconds, doubled on every retry
+OUTBOX_BACKOFF_MAX = 3600  # seconds
+OUTBOX_LOCK_TIMEOUT = 300  # seconds before a PROCESSING event is considered abandoned
+
+# Order exports (streamed to the client, or written to ORDER_EXPORT_DIR in the background)
+ORDER_EXPORT_CHUNK_SIZE = 2000  # rows fetched per DB round trip
+# Exports hold customer data: kept out of MEDIA_ROOT and served by an admin-only view
+ORDER_EXPORT_DIR = os.environ.get('ORDER_EXPORT_DIR', os.path.join(BASE_DIR, 'private', 'exports'))
+ADMIN_SITE_URL = os.environ.get('ADMIN_SITE_URL', 'https://api.chinakroy.com')  # where the admin is served, for links in emails
+
+# Order archival (python manage.py archive_orders)
+ORDER_ARCHIVE_AFTER_DAYS = 180  # finished orders older than this move to ArchivedOrder
+ORDER_ARCHIVE_STATUSES = ['DELIVERED', 'CANCELLED']
+ORDER_ARCHIVE_CHUNK_SIZE = 500  # orders moved per transaction
+
+# Mobile payment reconciliation (python manage.py reconcile_payments)
+PAYMENT_RECONCILIATION_TOLERANCE = 1  # BDT difference allowed between statement and order total
+
+# Live order status streams (SSE)
+ORDER_STREAM_POLL_INTERVAL = 2  # seconds between DB polls for changes made by other processes
+ORDER_STREAM_HEARTBEAT = 15  # seconds between keep-alive comments
+ORDER_STREAM_RETRY_MS = 5000  # client reconnect delay sent to EventSource
+ORDER_STREAM_STATUS_TTL = 24 * 3600  # seconds a published delivery status is remembered to skip polled duplicates
+
+# Product listing facets (GET /api/products/products/facets/)
+PRODUCT_FACET_PRICE_BUCKETS = [500, 1000, 2500, 5000, 10000]  # BDT bucket edges; the last bucket is open-ended
+
+# Product attribute index (in-memory bitmaps behind category/brand/color/shipping filters)
+PRODUCT_ATTRIBUTE_INDEX_ENABLED = True
+PRODUCT_ATTRIBUTE_INDEX_PATH = os.environ.get('PRODUCT_ATTRIBUTE_INDEX_PATH')  # optional file the index is persisted to
+PRODUCT_ATTRIBUTE_INDEX_REFRESH_INTERVAL = 5  # seconds between checks for changed products
+
+# Product autocomplete (GET /api/products/suggest/?q=)
+PRODUCT_SUGGEST_SNAPSHOT_PATH = os.environ.get('PRODUCT_SUGGEST_SNAPSHOT_PATH')  # shared by all workers when set
+PRODUCT_SUGGEST_REFRESH_INTERVAL = 30  # seconds between checks for catalog changes
+PRODUCT_SUGGEST_MAX_AGE = 900  # seconds before the index is rebuilt to pick up new popularity
+PRODUCT_SUGGEST_MIN_QUERY_HITS = 3  # searches before a query is suggested
+PRODUCT_SUGGEST_MAX_QUERIES = 5000
+PRODUCT_SUGGEST_MAX_DELTA = 1000  # changed products applied to the index in place; more trigger a rebuild
+PRODUCT_SEARCH_RECORD_INTERVAL = 60  # seconds searches are counted in memory before being written
+
+# Typo-tolerant search fallback (ProductViewSet ?search=, disabled per request with &fuzzy=0)
+PRODUCT_FUZZY_MIN_RESULTS = 3  # fall back to fuzzy matching below this many exact matches
+PRODUCT_FUZZY_MAX_RESULTS = 200
+PRODUCT_FUZZY_REFRESH_INTERVAL = 60  # seconds between checks for catalog changes
+
+# Catalog changes feed (GET /api/products/changes/?since=)
+CATALOG_CHANGES_SETTLE_SECONDS = 2  # rows newer than this are left for the next call
+CATALOG_CHANGES_RETENTION_DAYS = 30  # tombstones are pruned after this (tokens that needed them are refused)
+
+# Product feeds for Google Merchant / Facebook catalogs (python manage.py generate_product_feed)
+PRODUCT_FEED_SITE_URL = os.environ.get('PRODUCT_FEED_SITE_URL', 'https://chinakroy.com')  # storefront, for product links
+PRODUCT_FEED_MEDIA_URL = os.environ.get('PRODUCT_FEED_MEDIA_URL', PRODUCT_FEED_SITE_URL + MEDIA_URL)  # absolute image URLs
+PRODUCT_FEED_TITLE = 'ICommerce products'
+PRODUCT_FEED_CURRENCY = 'BDT'
+PRODUCT_FEED_CHUNK_SIZE = 2000  # products fetched per DB round trip
+PRODUCT_FEED_MAX_AGE = 6 * 3600  # seconds feed responses may be cached; run generate_product_feed at least this often
+
+# Sitemaps (website.sitemaps): sharded index written under MEDIA_ROOT/sitemaps by `manage.py generate_sitemaps`
+SITEMAP_SITE_URL = PRODUCT_FEED_SITE_URL  # storefront the listed pages live on
+SITEMAP_FILES_URL = os.environ.get('SITEMAP_FILES_URL', PRODUCT_FEED_MEDIA_URL + 'sitemaps/')  # where the shards are served
+SITEMAP_SHARD_SIZE = 50000  # URLs per shard (the protocol maximum)
+SITEMAP_CHUNK_SIZE = 5000  # rows fetched per DB round trip
+# Storefront path of each source, formatted with its fields; leave a source out to skip it
+SITEMAP_URL_PATTERNS = {
+    'products': '/products/{slug}',
+    'categories': '/categories?category={slug}',
+    'subcategories': '/categories?category={category__slug}&subcategory={slug}',
+    'sections': '/products?section={pk}',
+    'offers': '{link}',
+    'blog': '/blog/{slug}',
+}
+
+# Image processing (utils.image_jobs): uploads are optimized by `python manage.py run_image_worker`
+IMAGE_PROCESSING_INLINE = os.environ.get('IMAGE_PROCESSING_INLINE') == '1'  # optimize during save() instead (no worker)
+IMAGE_JOB_MAX_ATTEMPTS = 5
+IMAGE_JOB_BACKOFF_BASE = 30  # seconds, doubled on every retry
+IMAGE_JOB_BACKOFF_MAX = 3600  # seconds
+IMAGE_JOB_LOCK_TIMEOUT = 600  # seconds before a PROCESSING job is considered abandoned
+IMAGE_MAX_PIXELS = 80_000_000  # uploads larger than this are rejected from the header, before decoding
+IMAGE_DECODE_MAX_PIXELS = 25_000_000  # most pixels decoded at once (JPEGs are decoded scaled down to fit)
+IMAGE_REDUCING_GAP = 2.0  # decode/reduce() to this multiple of the target size before the LANCZOS resample
+IMAGE_WORKER_MEMORY_BUDGET_MB = int(os.environ.get('IMAGE_WORKER_MEMORY_BUDGET_MB', 1024))  # caps run_image_worker processes
+
+# On-demand resizing (utils.image_resize): /media/r/<width>x<height>/<path>
+IMAGE_RESIZE_CACHE_DIR = os.environ.get('IMAGE_RESIZE_CACHE_DIR', os.path.join(BASE_DIR, 'image_cache'))
+IMAGE_RESIZE_CACHE_MAX_MB = int(os.environ.get('IMAGE_RESIZE_CACHE_MAX_MB', 2048))  # least recently used entries are evicted beyond this
+# Only these boxes are rendered: every size is another cache entry per image, so the list stays short
+IMAGE_RESIZE_SIZES = [
+    size for size in os.environ.get(
+        'IMAGE_RESIZE_SIZES', '100x100,200x200,300x300,400x400,600x600,800x800,1200x1200'
+    ).split(',') if size
+]
+IMAGE_RESIZE_MAX_DIMENSION = 2400
+IMAGE_RESIZE_QUALITY = 85
+IMAGE_RESIZE_MAX_AGE = 60 * 60 * 24 * 30  # Cache-Control max-age, seconds
+IMAGE_RESIZE_TOUCH_INTERVAL = 3600  # seconds between recency updates of a cache entry
+IMAGE_RESIZE_EVICT_INTERVAL = 60  # seconds between cache size checks, per process
+
 # Authentication backends
 AUTHENTICATION_BACKENDS = [
     'users.authentication.EmailBackend',
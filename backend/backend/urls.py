@@ -10,6 +10,7 @@ from rest_framework_simplejwt.views import (
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
 
 from users.views import RegisterAPIView, CustomTokenObtainPairView
+from utils.views import resized_image
 
 from django.contrib.auth.models import User
 
@@ -65,6 +66,9 @@ urlpatterns = [
     
     # Direct registration endpoint (main level for convenience)
     path('api/register/', RegisterAPIView.as_view(), name='api_register'),
+
+    # On-demand image resizing (served in production too, ahead of the media files)
+    path(f"{settings.MEDIA_URL.lstrip('/')}r/<int:width>x<int:height>/<path:path>", resized_image, name='resized-image'),
 ]
 
 
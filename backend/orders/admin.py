@@ -1,15 +1,70 @@
-
 # ===================================================================
 # orders/admin.py
 
-from django.contrib import admin
+import io
+
+from django import forms
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
 from django.forms import Media
+from django.http import FileResponse, Http404
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
 from django.utils.html import format_html
 from unfold.admin import ModelAdmin, TabularInline
 from .models import (
     Order, OrderItem, ShippingMethod, OrderUpdate, OrderPayment, Coupon, ShippingTier,
-    ShippingCategory, FreeShippingRule, CashOnDelivery
+    ShippingCategory, FreeShippingRule, CashOnDelivery, OutboxEvent, DeliveryBatch, ArchivedOrder
 )
+from .cod_operations import OUTCOMES, apply_manifest, apply_to_queryset, parse_manifest
+from .exports import export_file_path, export_response
+from .lookup import lookup_order_ids
+from .reconciliation import PROVIDER_METHODS, StatementFormatError, reconcile_statement
+from .routing import create_batches, load_pending_parcels, plan_batches, serialize_plan
+
+
+class CODManifestForm(forms.Form):
+    manifest = forms.CharField(
+        widget=forms.Textarea(attrs={'rows': 12}),
+        required=False,
+        help_text="One line per parcel: order_number,outcome[,amount_collected][,notes]",
+    )
+    file = forms.FileField(required=False, help_text="Or upload the courier's CSV with the same columns")
+    delivery_person_name = forms.CharField(max_length=100, required=False)
+    delivery_person_phone = forms.CharField(max_length=20, required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not cleaned_data.get('manifest', '').strip() and not cleaned_data.get('file'):
+            raise forms.ValidationError('Paste a manifest or upload a CSV file.')
+        return cleaned_data
+
+class PaymentStatementForm(forms.Form):
+    statement = forms.FileField(help_text="Merchant statement CSV exported from bKash / Nagad / Rocket")
+    provider = forms.ChoiceField(choices=[(key, key.title()) for key in sorted(PROVIDER_METHODS)], initial='all')
+    dry_run = forms.BooleanField(required=False, initial=True, help_text="Only report, do not update payments")
+
+class DeliveryBatchPlanForm(forms.Form):
+    couriers = forms.CharField(
+        widget=forms.Textarea(attrs={'rows': 6}),
+        help_text="One courier per line: name[,phone]",
+    )
+    delivery_date = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
+    city = forms.CharField(max_length=100, required=False, help_text="Leave empty to plan every city")
+    max_parcels = forms.IntegerField(min_value=1, required=False, help_text="Per courier")
+    max_amount = forms.DecimalField(min_value=0, max_digits=14, decimal_places=2, required=False, help_text="Cash per courier")
+
+    def clean_couriers(self):
+        couriers = []
+        for line in self.cleaned_data['couriers'].splitlines():
+            parts = [part.strip() for part in line.split(',')]
+            if parts and parts[0]:
+                couriers.append({'name': parts[0], 'phone': parts[1] if len(parts) > 1 else None})
+        if not couriers:
+            raise forms.ValidationError('Add at least one courier.')
+        return couriers
 
 class ShippingTierInline(TabularInline):
     model = ShippingTier
@@ -274,12 +329,52 @@ class OrderAdmin(ModelAdmin):
         qs = super().get_queryset(request)
         return qs.select_related('user', 'shipping_method', 'shipping_address').prefetch_related('items', 'payment')
 
+    def get_search_results(self, request, queryset, search_term):
+        """Search through the order lookup index instead of LIKE scans over search_fields"""
+        if not search_term.strip():
+            return queryset, False
+        return queryset.filter(pk__in=lookup_order_ids(search_term)), False
+
+    actions = ['export_orders_csv', 'export_order_items_csv']
+
+    def export_orders_csv(self, request, queryset):
+        """Stream the selected orders (with payment and COD details) as CSV"""
+        # Rebuild from the ids so the export doesn't carry the changelist prefetches
+        return export_response('orders', 'csv', Order.objects.filter(pk__in=queryset.values('pk')).order_by('pk'))
+    export_orders_csv.short_description = 'Export selected orders (CSV)'
+
+    def export_order_items_csv(self, request, queryset):
+        """Stream the items of the selected orders as CSV"""
+        return export_response('order-items', 'csv', OrderItem.objects.filter(order__in=queryset.values('pk')).order_by('pk'))
+    export_order_items_csv.short_description = 'Export items of selected orders (CSV)'
+
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path(
+                'exports/<str:name>/',
+                self.admin_site.admin_view(self.export_download_view),
+                name='orders_order_export_download',
+            ),
+        ]
+        return custom_urls + urls
+
+    def export_download_view(self, request, name):
+        """Download a background export (they hold customer data, so never from MEDIA_ROOT)"""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        full_path = export_file_path(name)
+        if full_path is None:
+            raise Http404('Export not found')
+        return FileResponse(open(full_path, 'rb'), as_attachment=True, filename=name)
+
 @admin.register(OrderPayment)
 class OrderPaymentAdmin(ModelAdmin):
-    list_display = ('order', 'payment_method', 'sender_number', 'transaction_id', 'created_at')
-    list_filter = ('payment_method', 'created_at')
+    list_display = ('order', 'payment_method', 'sender_number', 'transaction_id', 'verification_status', 'created_at')
+    list_filter = ('payment_method', 'verification_status', 'created_at')
     search_fields = ('order__order_number', 'sender_number', 'transaction_id', 'admin_account_number')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('created_at', 'updated_at', 'verified_at', 'statement_amount')
+    change_list_template = 'admin/orders/orderpayment/change_list.html'
     
     fieldsets = (
         ('Order Information', {
@@ -288,12 +383,66 @@ class OrderPaymentAdmin(ModelAdmin):
         ('Payment Details', {
             'fields': ('payment_method', 'sender_number', 'transaction_id', 'admin_account_number')
         }),
+        ('Statement Verification', {
+            'fields': ('verification_status', 'verified_at', 'statement_amount', 'verification_note')
+        }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
     )
 
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path(
+                'reconcile/',
+                self.admin_site.admin_view(self.reconcile_view),
+                name='orders_orderpayment_reconcile',
+            ),
+        ]
+        return custom_urls + urls
+
+    def reconcile_view(self, request):
+        """Upload a provider statement and match it against unverified payments"""
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+
+        form = PaymentStatementForm(request.POST or None, request.FILES or None)
+        report = None
+        if request.method == 'POST' and form.is_valid():
+            statement = io.TextIOWrapper(form.cleaned_data['statement'].file, encoding='utf-8-sig', newline='')
+            try:
+                report = reconcile_statement(
+                    statement,
+                    provider=form.cleaned_data['provider'],
+                    dry_run=form.cleaned_data['dry_run'],
+                )
+            except (StatementFormatError, UnicodeDecodeError) as e:
+                form.add_error('statement', str(e))
+            else:
+                summary = report['summary']
+                message = (
+                    f"{summary['matched']} payments matched, {summary['mismatches']} mismatches, "
+                    f"{summary['duplicate_claims']} duplicate claims, {summary['unmatched_payments']} unmatched payments."
+                )
+                if summary['dry_run']:
+                    messages.info(request, f"Dry run: {message}")
+                else:
+                    messages.success(request, message)
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Reconcile payment statement',
+            'form': form,
+            'report': report,
+            'summary_rows': [
+                (key.replace('_', ' ').capitalize(), value) for key, value in report['summary'].items()
+            ] if report else [],
+        }
+        return TemplateResponse(request, 'admin/orders/orderpayment/reconcile.html', context)
+
 @admin.register(ShippingCategory)
 class ShippingCategoryAdmin(ModelAdmin):
     list_display = ('name', 'description', 'allowed_methods_count')
@@ -323,7 +472,7 @@ class CashOnDeliveryAdmin(ModelAdmin):
         'delivery_status', 'amount_to_collect', 'amount_collected', 
         'delivery_attempts', 'scheduled_delivery_date', 'created_at'
     )
-    list_filter = ('delivery_status', 'created_at', 'scheduled_delivery_date')
+    list_filter = ('delivery_status', 'created_at', 'scheduled_delivery_date', 'delivery_batch')
     search_fields = (
         'order__order_number', 'customer_full_name', 'alternative_phone', 
         'delivery_person_name', 'delivery_person_phone'
@@ -349,7 +498,7 @@ class CashOnDeliveryAdmin(ModelAdmin):
             'classes': ('tab',)
         }),
         ('Delivery Team Assignment', {
-            'fields': ('delivery_person_name', 'delivery_person_phone'),
+            'fields': ('delivery_person_name', 'delivery_person_phone', 'delivery_batch'),
             'classes': ('tab',)
         }),
         ('Delivery Notes & Tracking', {
@@ -373,23 +522,188 @@ class CashOnDeliveryAdmin(ModelAdmin):
         return qs.select_related('order')
     
     actions = ['mark_out_for_delivery', 'mark_delivered', 'increment_delivery_attempts']
+    change_list_template = 'admin/orders/cashondelivery/change_list.html'
+
+    def _report_bulk_result(self, request, result, message):
+        self.message_user(request, message.format(count=result['applied']))
+        for error in result['errors'][:20]:
+            self.message_user(request, f"{error.get('order_number')}: {error['error']}", level=messages.WARNING)
     
     def mark_out_for_delivery(self, request, queryset):
         """Mark selected COD orders as out for delivery"""
-        updated = queryset.update(delivery_status=CashOnDelivery.DeliveryStatus.OUT_FOR_DELIVERY)
-        self.message_user(request, f'{updated} orders marked as out for delivery.')
+        result = apply_to_queryset(queryset, 'OUT_FOR_DELIVERY')
+        self._report_bulk_result(request, result, '{count} orders marked as out for delivery.')
     mark_out_for_delivery.short_description = 'Mark as out for delivery'
     
     def mark_delivered(self, request, queryset):
         """Mark selected COD orders as delivered"""
-        for cod in queryset:
-            cod.mark_as_delivered()
-        self.message_user(request, f'{queryset.count()} orders marked as delivered and paid.')
+        result = apply_to_queryset(queryset, 'DELIVERED')
+        self._report_bulk_result(request, result, '{count} orders marked as delivered and paid.')
     mark_delivered.short_description = 'Mark as delivered & paid'
     
     def increment_delivery_attempts(self, request, queryset):
         """Increment delivery attempts for selected orders"""
-        for cod in queryset:
-            cod.increment_delivery_attempt("Delivery attempt via admin action")
-        self.message_user(request, f'Incremented delivery attempts for {queryset.count()} orders.')
+        result = apply_to_queryset(queryset, 'ATTEMPTED', notes='Delivery attempt via admin action')
+        self._report_bulk_result(request, result, 'Incremented delivery attempts for {count} orders.')
     increment_delivery_attempts.short_description = 'Increment delivery attempts'
+
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path(
+                'apply-manifest/',
+                self.admin_site.admin_view(self.apply_manifest_view),
+                name='orders_cashondelivery_apply_manifest',
+            ),
+            path(
+                'plan-batches/',
+                self.admin_site.admin_view(self.plan_batches_view),
+                name='orders_cashondelivery_plan_batches',
+            ),
+        ]
+        return custom_urls + urls
+
+    def plan_batches_view(self, request):
+        """Preview and create balanced courier batches for pending parcels"""
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+
+        form = DeliveryBatchPlanForm(request.POST or None, initial={'delivery_date': timezone.localdate()})
+        plan = None
+        if request.method == 'POST' and form.is_valid():
+            data = form.cleaned_data
+            parcels = load_pending_parcels(data['delivery_date'], city=data.get('city') or None)
+            batches, unassigned = plan_batches(
+                data['couriers'], parcels,
+                max_parcels=data.get('max_parcels'),
+                max_amount=data.get('max_amount'),
+            )
+            if '_create' in request.POST:
+                batch_objects, assigned = create_batches(batches, data['delivery_date'], created_by=request.user)
+                self.message_user(request, f'Created {len(batch_objects)} delivery batches covering {assigned} parcels.')
+                if unassigned:
+                    self.message_user(request, f'{len(unassigned)} parcels did not fit any courier.', level=messages.WARNING)
+                return redirect('admin:orders_deliverybatch_changelist')
+            plan = serialize_plan(batches, unassigned)
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Plan courier batches',
+            'form': form,
+            'plan': plan,
+        }
+        return TemplateResponse(request, 'admin/orders/cashondelivery/plan_batches.html', context)
+
+    def apply_manifest_view(self, request):
+        """Upload or paste a courier manifest and apply it in bulk"""
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+
+        form = CODManifestForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            uploaded = form.cleaned_data.get('file')
+            text = uploaded.read().decode('utf-8-sig') if uploaded else form.cleaned_data['manifest']
+            entries, parse_errors = parse_manifest(text)
+            result = apply_manifest(
+                entries,
+                delivery_person_name=form.cleaned_data.get('delivery_person_name') or None,
+                delivery_person_phone=form.cleaned_data.get('delivery_person_phone') or None,
+            )
+            result['errors'] = parse_errors + result['errors']
+            self._report_bulk_result(request, result, 'Manifest applied to {count} orders.')
+            return redirect('admin:orders_cashondelivery_changelist')
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Apply courier manifest',
+            'form': form,
+            'outcomes': OUTCOMES,
+        }
+        return TemplateResponse(request, 'admin/orders/cashondelivery/apply_manifest.html', context)
+
+
+class DeliveryBatchParcelInline(TabularInline):
+    model = CashOnDelivery
+    fk_name = 'delivery_batch'
+    fields = ('order', 'customer_full_name', 'alternative_phone', 'amount_to_collect', 'delivery_status')
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+    show_change_link = True
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DeliveryBatch)
+class DeliveryBatchAdmin(ModelAdmin):
+    list_display = ('code', 'delivery_date', 'delivery_person_name', 'parcels_count', 'total_amount', 'cities', 'status')
+    list_filter = ('status', 'delivery_date')
+    search_fields = ('code', 'delivery_person_name', 'delivery_person_phone', 'cities', 'postal_codes')
+    readonly_fields = ('code', 'parcels_count', 'total_amount', 'cities', 'postal_codes', 'created_by', 'created_at')
+    inlines = [DeliveryBatchParcelInline]
+
+    fieldsets = (
+        ('Batch', {
+            'fields': ('code', 'delivery_date', 'status')
+        }),
+        ('Courier', {
+            'fields': ('delivery_person_name', 'delivery_person_phone')
+        }),
+        ('Route', {
+            'fields': ('cities', 'postal_codes', 'parcels_count', 'total_amount')
+        }),
+        ('Audit', {
+            'fields': ('created_by', 'created_at'),
+            'classes': ('collapse',)
+        }),
+    )
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(ModelAdmin):
+    list_display = ('id', 'event_type', 'order', 'status', 'attempts', 'available_at', 'created_at', 'processed_at')
+    list_filter = ('status', 'event_type', 'created_at')
+    search_fields = ('event_type', 'order__order_number', 'last_error')
+    readonly_fields = (
+        'event_type', 'order', 'payload', 'status', 'attempts', 'available_at',
+        'locked_by', 'locked_at', 'last_error', 'completed_handlers', 'created_at', 'processed_at'
+    )
+    list_select_related = ('order',)
+    
+    actions = ['retry_events']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def retry_events(self, request, queryset):
+        """Put failed events back into the queue"""
+        updated = queryset.exclude(status=OutboxEvent.Status.DONE).update(
+            status=OutboxEvent.Status.PENDING,
+            attempts=0,
+            available_at=timezone.now(),
+            locked_by=None,
+            locked_at=None,
+        )
+        self.message_user(request, f'{updated} events queued for retry.')
+    retry_events.short_description = 'Retry selected events'
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(ModelAdmin):
+    list_display = ('order_number', 'customer_name', 'customer_email', 'status', 'payment_status', 'total_amount', 'ordered_at', 'archived_at')
+    list_filter = ('status', 'payment_status', 'ordered_at')
+    search_fields = ('order_number', 'customer_email', 'customer_phone', 'customer_name')
+    readonly_fields = (
+        'original_id', 'order_number', 'user_id', 'customer_name', 'customer_email', 'customer_phone',
+        'status', 'payment_status', 'total_amount', 'ordered_at', 'archived_at', 'data', 'sales_lines'
+    )
+    date_hierarchy = 'ordered_at'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
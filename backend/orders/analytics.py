@@ -0,0 +1,335 @@
+# orders/analytics.py
+"""
+Daily sales rollups.
+
+Every order has an OrderRollupEntry recording what it currently adds to the
+rollups. On each order event the outbox worker re-reads that one order and
+applies the difference to the few rows it touches (`refresh_order`), so the
+cost of an event does not grow with the number of orders that day; an event
+seen twice applies nothing the second time. `rebuild_sales_rollups` recomputes
+whole days (`refresh_day`, delete + re-aggregate) and rewrites their entries.
+Both are serialized on a per-day lock row, so concurrent order events wait for
+each other instead of failing and being retried.
+Dashboards read only the rollup tables, never orders_order/orders_orderitem.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import DecimalField, F, Q, Sum
+from django.utils import timezone
+
+ZERO = Decimal('0.00')
+
+
+def order_day(order):
+    """Local calendar day an order is reported under"""
+    return timezone.localdate(order.ordered_at)
+
+
+def day_bounds(day):
+    """[start, end) datetimes of a local day, so ordered_at lookups can use its index"""
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def empty_totals():
+    """({status: [orders, revenue]}, {(grain, shop_id, category_id, status): [orders, units, revenue]})"""
+    return defaultdict(lambda: [0, ZERO]), defaultdict(lambda: [0, 0, ZERO])
+
+
+def add_order_totals(orders, sales, status, total_amount, sales_lines, sign=1):
+    """Add one order's contribution to `empty_totals()`-shaped totals (sign=-1 takes it away)"""
+    from .models import DailySalesRollup
+
+    Grain = DailySalesRollup.Grain
+    orders[status][0] += sign
+    orders[status][1] += sign * Decimal(total_amount)
+    counted = set()
+    for line in sales_lines:
+        for key in (
+            (Grain.LINE, line['shop_id'], line['category_id'], status),
+            (Grain.SHOP, line['shop_id'], None, status),
+            (Grain.CATEGORY, None, line['category_id'], status),
+        ):
+            totals = sales[key]
+            if key not in counted:
+                # An order counts once per row, however many of its lines fall in it
+                totals[0] += sign
+                counted.add(key)
+            totals[1] += sign * line['units']
+            totals[2] += sign * Decimal(line['revenue'])
+
+
+def order_entries(orders):
+    """Unsaved OrderRollupEntry rows for an Order queryset (two queries)"""
+    from .models import OrderItem, OrderRollupEntry
+
+    lines = defaultdict(list)
+    for row in (
+        OrderItem.objects.filter(order__in=orders)
+        .values('order_id', 'product__shop_id', 'product__sub_category__category_id')
+        .annotate(
+            units=Sum('quantity'),
+            revenue=Sum(F('quantity') * F('unit_price'), output_field=DecimalField(max_digits=14, decimal_places=2)),
+        )
+        .order_by()
+    ):
+        lines[row['order_id']].append({
+            'shop_id': row['product__shop_id'],
+            'category_id': row['product__sub_category__category_id'],
+            'units': row['units'] or 0,
+            'revenue': str(row['revenue'] or ZERO),
+        })
+    return [
+        OrderRollupEntry(
+            order_id=row['pk'],
+            date=timezone.localdate(row['ordered_at']),
+            status=row['status'],
+            total_amount=row['total_amount'],
+            sales_lines=lines[row['pk']],
+        )
+        for row in orders.values('pk', 'ordered_at', 'status', 'total_amount')
+    ]
+
+
+def refresh_order(order_id):
+    """
+    Apply one order's change to the rollups: what it adds now minus what its
+    OrderRollupEntry says was counted before. Returns the number of rollup rows
+    written.
+    """
+    from .models import DailyOrderRollup, Order, OrderRollupEntry
+
+    order = Order.objects.filter(pk=order_id).only('ordered_at').first()
+    if order is None:
+        return 0  # deleted or archived; archived totals stay in the rollups
+    day = order_day(order)
+    with transaction.atomic():
+        if not DailyOrderRollup.objects.filter(date=day, status=Order.OrderStatus.PENDING).exists():
+            # The day was never aggregated (its lock row is missing): count all of it
+            _lock_day(day)
+            return sum(_refresh_locked_day(day))
+        days = {day}
+        _lock_day(day)
+        # Read under the lock: a concurrent event of the same order has committed by now
+        previous = OrderRollupEntry.objects.filter(order_id=order_id).first()
+        if previous is not None and previous.date not in days:
+            days.add(previous.date)
+            _lock_day(previous.date)
+        current = order_entries(Order.objects.filter(pk=order_id))
+
+        deltas = defaultdict(empty_totals)
+        if previous is not None:
+            add_order_totals(*deltas[previous.date], previous.status, previous.total_amount, previous.sales_lines, sign=-1)
+        for entry in current:
+            add_order_totals(*deltas[entry.date], entry.status, entry.total_amount, entry.sales_lines)
+            days.add(entry.date)
+        try:
+            with transaction.atomic():
+                changed = sum(_apply_delta(delta_day, *delta) for delta_day, delta in deltas.items())
+        except IntegrityError:
+            # A count would go negative: the rollups were changed behind the
+            # entries' back (e.g. rows edited by hand), so recompute the days
+            return sum(sum(_refresh_locked_day(stale_day)) for stale_day in sorted(days))
+
+        OrderRollupEntry.objects.filter(order_id=order_id).delete()
+        OrderRollupEntry.objects.bulk_create(current)
+        return changed
+
+
+def _apply_delta(day, order_totals, sales_totals):
+    """Add (possibly negative) totals to a day's rollup rows; the caller holds the day's lock"""
+    from .models import DailyOrderRollup, DailySalesRollup, Order
+
+    now = timezone.now()
+    changed = 0
+    for status, (orders_count, revenue) in order_totals.items():
+        if not (orders_count or revenue):
+            continue
+        changed += 1
+        rows = DailyOrderRollup.objects.filter(date=day, status=status)
+        if not rows.update(
+            orders_count=F('orders_count') + orders_count, revenue=F('revenue') + revenue, updated_at=now
+        ):
+            DailyOrderRollup.objects.create(date=day, status=status, orders_count=orders_count, revenue=revenue)
+    for (grain, shop_id, category_id, status), (orders_count, units, revenue) in sales_totals.items():
+        if not (orders_count or units or revenue):
+            continue
+        changed += 1
+        rows = DailySalesRollup.objects.filter(
+            date=day, grain=grain, shop_id=shop_id, category_id=category_id, status=status
+        )
+        if not rows.update(
+            orders_count=F('orders_count') + orders_count, units=F('units') + units,
+            revenue=F('revenue') + revenue, updated_at=now,
+        ):
+            DailySalesRollup.objects.create(
+                date=day, grain=grain, shop_id=shop_id, category_id=category_id, status=status,
+                orders_count=orders_count, units=units, revenue=revenue,
+            )
+    # Rows no order falls in any more are dropped, as a full refresh would; the lock row stays
+    DailyOrderRollup.objects.filter(date=day, orders_count=0).exclude(status=Order.OrderStatus.PENDING).delete()
+    DailySalesRollup.objects.filter(date=day, orders_count=0).delete()
+    return changed
+
+
+def refresh_day(day):
+    """Recompute both rollup tables and the order entries for one day. Returns (order_rows, sales_rows)."""
+    with transaction.atomic():
+        _lock_day(day)
+        return _refresh_locked_day(day)
+
+
+def _lock_day(day):
+    """
+    Take the day's lock row, the PENDING DailyOrderRollup: created if missing
+    (a concurrent insert waits for the first one to commit), then locked for
+    the rest of the transaction. Aggregation starts only after the lock, so the
+    refresh that waited sees the orders committed by the one before it.
+    """
+    from .models import DailyOrderRollup, Order
+
+    lock_row = DailyOrderRollup(date=day, status=Order.OrderStatus.PENDING)
+    DailyOrderRollup.objects.bulk_create([lock_row], ignore_conflicts=True)
+    list(DailyOrderRollup.objects.select_for_update().filter(date=day, status=Order.OrderStatus.PENDING))
+
+
+def _refresh_locked_day(day):
+    """Aggregate and rewrite the day's rows; the caller holds the day's lock"""
+    from .archive import archived_day_totals
+    from .models import DailyOrderRollup, DailySalesRollup, Order, OrderRollupEntry
+
+    start, end = day_bounds(day)
+
+    # Archived orders no longer have rows in the hot tables; start from their totals
+    order_totals, sales_totals = archived_day_totals(start, end)
+
+    orders = Order.objects.filter(ordered_at__gte=start, ordered_at__lt=end)
+    entries = order_entries(orders)
+    for entry in entries:
+        add_order_totals(order_totals, sales_totals, entry.status, entry.total_amount, entry.sales_lines)
+
+    # The lock row is rewritten in place rather than deleted, so waiting refreshes keep waiting on it
+    order_row_count = len(order_totals)
+    pending = order_totals.pop(Order.OrderStatus.PENDING, (0, ZERO))
+    order_rows = [
+        DailyOrderRollup(date=day, status=status, orders_count=orders_count, revenue=revenue)
+        for status, (orders_count, revenue) in order_totals.items()
+    ]
+    sales_rows = [
+        DailySalesRollup(
+            date=day,
+            grain=grain,
+            shop_id=shop_id,
+            category_id=category_id,
+            status=status,
+            orders_count=orders_count,
+            units=units,
+            revenue=revenue,
+        )
+        for (grain, shop_id, category_id, status), (orders_count, units, revenue) in sales_totals.items()
+    ]
+
+    DailyOrderRollup.objects.filter(date=day, status=Order.OrderStatus.PENDING).update(
+        orders_count=pending[0], revenue=pending[1], updated_at=timezone.now()
+    )
+    DailyOrderRollup.objects.filter(date=day).exclude(status=Order.OrderStatus.PENDING).delete()
+    DailySalesRollup.objects.filter(date=day).delete()
+    DailyOrderRollup.objects.bulk_create(order_rows)
+    DailySalesRollup.objects.bulk_create(sales_rows)
+    OrderRollupEntry.objects.filter(Q(date=day) | Q(order__in=orders)).delete()
+    OrderRollupEntry.objects.bulk_create(entries, batch_size=2000)
+    return order_row_count, len(sales_rows)
+
+
+def get_sales_summary(start, end, shop_id=None, category_id=None, status=None):
+    """
+    Dashboard numbers for [start, end] read from the rollups.
+    Order totals come from DailyOrderRollup unless the report is narrowed to a
+    shop or category, in which case they come from the sales rows of that
+    grain, so an order with several matching lines is still counted once.
+    """
+    from .models import DailyOrderRollup, DailySalesRollup
+
+    Grain = DailySalesRollup.Grain
+
+    def sales_rows(grain):
+        rows = DailySalesRollup.objects.filter(date__range=(start, end), grain=grain)
+        if shop_id:
+            rows = rows.filter(shop_id=shop_id)
+        if category_id:
+            rows = rows.filter(category_id=category_id)
+        if status:
+            rows = rows.filter(status=status)
+        return rows
+
+    sales = sales_rows(Grain.LINE)
+    if shop_id and category_id:
+        orders = sales
+    elif shop_id:
+        orders = sales_rows(Grain.SHOP)
+    elif category_id:
+        orders = sales_rows(Grain.CATEGORY)
+    else:
+        # The day's lock row stays behind with a zero count when nothing is pending
+        orders = DailyOrderRollup.objects.filter(date__range=(start, end), orders_count__gt=0)
+        if status:
+            orders = orders.filter(status=status)
+
+    def totals(queryset, *group_by):
+        return queryset.values(*group_by).annotate(
+            orders=Sum('orders_count'), revenue_total=Sum('revenue')
+        ).order_by(*group_by)
+
+    by_day = [
+        {'date': row['date'], 'orders': row['orders'], 'revenue': row['revenue_total'] or ZERO}
+        for row in totals(orders, 'date')
+    ]
+    by_status = [
+        {'status': row['status'], 'orders': row['orders'], 'revenue': row['revenue_total'] or ZERO}
+        for row in totals(orders, 'status')
+    ]
+    by_category = [
+        {
+            'category_id': row['category_id'],
+            'category': row['category__name'],
+            'units': row['units_total'] or 0,
+            'revenue': row['revenue_total'] or ZERO,
+        }
+        for row in sales.values('category_id', 'category__name').annotate(
+            units_total=Sum('units'), revenue_total=Sum('revenue')
+        ).order_by('-revenue_total')
+    ]
+    by_shop = [
+        {
+            'shop_id': row['shop_id'],
+            'shop': row['shop__name'],
+            'units': row['units_total'] or 0,
+            'revenue': row['revenue_total'] or ZERO,
+        }
+        for row in sales.values('shop_id', 'shop__name').annotate(
+            units_total=Sum('units'), revenue_total=Sum('revenue')
+        ).order_by('-revenue_total')
+    ]
+
+    order_totals = orders.aggregate(orders=Sum('orders_count'), revenue=Sum('revenue'))
+    return {
+        'start': start,
+        'end': end,
+        'totals': {
+            'orders': order_totals['orders'] or 0,
+            'revenue': order_totals['revenue'] or ZERO,
+            'units': sales.aggregate(units=Sum('units'))['units'] or 0,
+        },
+        'by_day': by_day,
+        'by_status': by_status,
+        'by_category': by_category,
+        'by_shop': by_shop,
+    }
+
+
+def default_date_range(days=30):
+    end = timezone.localdate()
+    return end - timedelta(days=days - 1), end
@@ -0,0 +1,172 @@
+# orders/archive.py
+"""
+Move finished orders out of the hot order tables.
+
+Delivered/cancelled orders older than ORDER_ARCHIVE_AFTER_DAYS are copied into
+ArchivedOrder (one row per order, with the order detail API representation as
+a JSON snapshot) and then deleted together with their items, updates, payment
+and COD rows. Work happens in chunks of ORDER_ARCHIVE_CHUNK_SIZE orders, each
+in its own transaction. The copy is written with ignore_conflicts, so a chunk
+interrupted between the copy and the delete is simply redone on the next run,
+even when the archive lives in a separate database. Hot rows are only deleted
+once their copy is confirmed; anything else raises ArchiveError.
+
+Reads stay transparent: `get_archived_order` and `customer_archived_orders`
+return the same shape as the order detail API, and `archived_day_totals` keeps
+archived orders in the daily sales rollups.
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class ArchiveError(RuntimeError):
+    pass
+
+
+def archive_cutoff(days=None):
+    days = settings.ORDER_ARCHIVE_AFTER_DAYS if days is None else days
+    return timezone.now() - timedelta(days=days)
+
+
+def archivable_orders(days=None):
+    """Finished orders older than the cutoff, oldest first"""
+    from .models import Order
+
+    return Order.objects.filter(
+        status__in=settings.ORDER_ARCHIVE_STATUSES,
+        ordered_at__lt=archive_cutoff(days),
+    ).order_by('ordered_at', 'pk')
+
+
+def _sales_lines(order):
+    """Item revenue per (shop, category), the shape DailySalesRollup needs"""
+    lines = defaultdict(lambda: {'units': 0, 'revenue': Decimal('0')})
+    for item in order.items.all():
+        product = item.product
+        key = (product.shop_id, product.sub_category.category_id if product.sub_category_id else None)
+        lines[key]['units'] += item.quantity
+        lines[key]['revenue'] += item.quantity * item.unit_price
+    return [
+        {'shop_id': shop_id, 'category_id': category_id, 'units': line['units'], 'revenue': str(line['revenue'])}
+        for (shop_id, category_id), line in lines.items()
+    ]
+
+
+def build_archived_order(order):
+    from .models import ArchivedOrder
+    from .serializers import OrderReadSerializer
+
+    data = dict(OrderReadSerializer(order).data)
+    data['delivery_address'] = order.delivery_address_id
+    return ArchivedOrder(
+        original_id=order.pk,
+        order_number=order.order_number,
+        user_id=order.user_id,
+        customer_name=order.customer_name,
+        customer_email=order.customer_email,
+        customer_phone=order.customer_phone,
+        status=order.status,
+        payment_status=order.payment_status,
+        total_amount=order.total_amount,
+        ordered_at=order.ordered_at,
+        data=data,
+        sales_lines=_sales_lines(order),
+    )
+
+
+def archive_chunk(order_ids, days=None):
+    """Archive one chunk of orders. Returns the number of orders moved."""
+    from .models import ArchivedOrder, Order
+
+    with transaction.atomic():
+        # Re-check the filter inside the transaction in case an order changed
+        orders = list(
+            archivable_orders(days).filter(pk__in=order_ids)
+            .select_related('shipping_method', 'payment', 'cash_on_delivery')
+            .prefetch_related(
+                'items__product__sub_category', 'items__product__additional_images',
+                'items__color', 'items__size', 'updates',
+            )
+        )
+        if not orders:
+            return 0
+
+        archived = [build_archived_order(order) for order in orders]
+        with transaction.atomic(using=settings.ORDER_ARCHIVE_DATABASE):
+            # Conflicts are copies left by an interrupted run, checked below
+            ArchivedOrder.objects.bulk_create(archived, ignore_conflicts=True)
+        stored = dict(
+            ArchivedOrder.objects.filter(original_id__in=[order.pk for order in orders])
+            .values_list('original_id', 'order_number')
+        )
+        missing = [order.order_number for order in orders if stored.get(order.pk) != order.order_number]
+        if missing:
+            # Rolls back the chunk: no hot order is deleted without its copy
+            raise ArchiveError(f"Archive copy missing or different for order(s) {', '.join(missing)}")
+
+        Order.objects.filter(pk__in=list(stored)).delete()
+    return len(orders)
+
+
+# ---------------------------------------------------------------------------
+# Reads
+# ---------------------------------------------------------------------------
+
+def archived_representation(archived):
+    return {**archived.data, 'archived': True, 'archived_at': archived.archived_at}
+
+
+def _visible_to(archived, user):
+    if user.is_authenticated and (getattr(user, 'user_type', None) == 'ADMIN' or user.is_superuser or user.is_staff):
+        return True
+    if not user.is_authenticated:
+        return False
+    return archived.user_id == user.id or (archived.user_id is None and archived.customer_email == user.email)
+
+
+def get_archived_order(order_number, user):
+    """Newest archived order with this number visible to `user` (numbers repeat across days), or None"""
+    from .models import ArchivedOrder
+
+    for archived in ArchivedOrder.objects.filter(order_number=order_number).order_by('-ordered_at', '-pk'):
+        if _visible_to(archived, user):
+            return archived_representation(archived)
+    return None
+
+
+def customer_archived_orders(user):
+    """A customer's archived orders: their own plus guest orders placed with their email"""
+    from .models import ArchivedOrder
+
+    return ArchivedOrder.objects.filter(
+        Q(user_id=user.id) | Q(customer_email=user.email, user_id__isnull=True)
+    )
+
+
+def archived_representations(queryset):
+    return [archived_representation(archived) for archived in queryset.order_by('-ordered_at')]
+
+
+def archived_day_totals(start, end):
+    """
+    Archived contributions to a day's rollups:
+    ({status: [orders, revenue]}, {(grain, shop_id, category_id, status): [orders, units, revenue]})
+    """
+    from .analytics import add_order_totals, empty_totals
+    from .models import ArchivedOrder
+
+    orders, sales = empty_totals()
+    for row in ArchivedOrder.objects.filter(ordered_at__gte=start, ordered_at__lt=end).values(
+        'status', 'total_amount', 'sales_lines'
+    ):
+        add_order_totals(orders, sales, row['status'], row['total_amount'], row['sales_lines'])
+    return orders, sales
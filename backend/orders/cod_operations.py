@@ -0,0 +1,210 @@
+# orders/cod_operations.py
+"""
+Bulk Cash on Delivery operations.
+
+A courier manifest is a list of `order_number,outcome[,amount_collected][,notes]`
+lines. `apply_manifest` applies the whole manifest in one transaction with a
+fixed number of queries (one SELECT, one bulk_update, one set-based UPDATE for
+orders, one bulk INSERT of OrderUpdates, one bulk INSERT per outbox event
+type), instead of saving every COD row and order one by one.
+"""
+import csv
+import io
+import logging
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Manifest outcomes -> (resulting COD delivery status, outbox event, update note)
+OUTCOMES = {
+    'OUT_FOR_DELIVERY': ('OUT_FOR_DELIVERY', 'cod.out_for_delivery', 'Out for delivery'),
+    'DELIVERED': ('DELIVERED', 'order.delivered', 'Delivered and payment collected'),
+    'ATTEMPTED': ('PENDING', 'cod.delivery_attempted', 'Delivery attempt failed'),
+    'PAYMENT_FAILED': ('PAYMENT_FAILED', 'cod.payment_failed', 'Payment failed at delivery'),
+    'RETURNED': ('RETURNED', 'cod.returned', 'Returned to sender'),
+}
+
+# Rows in these states are final and are never changed by a manifest
+FINAL_DELIVERY_STATUSES = ('DELIVERED', 'RETURNED')
+
+COD_UPDATE_FIELDS = [
+    'delivery_status', 'delivery_attempts', 'delivery_notes', 'amount_collected',
+    'payment_collected_at', 'actual_delivery_date', 'delivery_person_name',
+    'delivery_person_phone', 'updated_at',
+]
+
+
+def parse_manifest(text):
+    """
+    Parse manifest text (CSV or pasted lines) into (entries, errors).
+    A header row starting with `order_number` is skipped.
+    """
+    entries = []
+    errors = []
+    reader = csv.reader(io.StringIO(text.strip()))
+    for line_number, row in enumerate(reader, start=1):
+        row = [cell.strip() for cell in row]
+        if not row or not any(row):
+            continue
+        if line_number == 1 and row[0].lower() == 'order_number':
+            continue
+        if len(row) < 2:
+            errors.append({'line': line_number, 'error': 'Expected at least order_number,outcome'})
+            continue
+
+        entry = {'line': line_number, 'order_number': row[0], 'outcome': row[1].upper()}
+        if len(row) > 2 and row[2]:
+            entry['amount_collected'] = row[2]
+        if len(row) > 3 and row[3]:
+            entry['notes'] = ','.join(row[3:])
+        entries.append(entry)
+    return entries, errors
+
+
+def _validate_entry(entry):
+    if not isinstance(entry.get('order_number'), str) or not entry['order_number']:
+        return 'Missing order_number'
+    if not isinstance(entry.get('outcome'), str) or entry['outcome'] not in OUTCOMES:
+        return f"Unknown outcome '{entry.get('outcome')}' (expected one of: {', '.join(OUTCOMES)})"
+    if entry.get('amount_collected') not in (None, ''):
+        try:
+            amount = Decimal(str(entry['amount_collected']))
+        except InvalidOperation:
+            return f"Invalid amount '{entry['amount_collected']}'"
+        if not amount.is_finite():
+            return f"Invalid amount '{entry['amount_collected']}'"
+        if amount < 0:
+            return 'Amount collected cannot be negative'
+        entry['amount_collected'] = amount
+    return None
+
+
+def apply_manifest(entries, delivery_person_name=None, delivery_person_phone=None, keep_attempted_status=False):
+    """
+    Apply manifest entries in one transaction.
+    Returns {'applied': n, 'by_outcome': {...}, 'errors': [...]}; entries with
+    errors are skipped, the rest are applied.
+    With `keep_attempted_status`, ATTEMPTED only counts the attempt and leaves
+    the delivery status as it was.
+    """
+    from .models import CashOnDelivery, Order, OrderUpdate
+    from .order_stream import build_delivery_event, build_update_event, hub
+    from .outbox import enqueue_events
+
+    errors = []
+    valid_entries = {}
+    for entry in entries:
+        error = _validate_entry(entry)
+        if error is None and entry['order_number'] in valid_entries:
+            error = 'Order appears more than once in the manifest'
+        if error:
+            errors.append({'line': entry.get('line'), 'order_number': entry.get('order_number'), 'error': error})
+            continue
+        valid_entries[entry['order_number']] = entry
+
+    now = timezone.now()
+    stamp = timezone.localtime(now).strftime("%Y-%m-%d %H:%M")
+    by_outcome = defaultdict(int)
+
+    with transaction.atomic():
+        cods = {
+            cod.order.order_number: cod
+            for cod in CashOnDelivery.objects.select_for_update(of=('self',))
+            .select_related('order').filter(order__order_number__in=list(valid_entries))
+        }
+
+        changed_cods = []
+        delivered_order_ids = []
+        order_updates = []
+        events = defaultdict(list)
+
+        for order_number, entry in valid_entries.items():
+            cod = cods.get(order_number)
+            if cod is None:
+                errors.append({'line': entry.get('line'), 'order_number': order_number, 'error': 'No COD record for this order'})
+                continue
+            if cod.delivery_status in FINAL_DELIVERY_STATUSES:
+                errors.append({
+                    'line': entry.get('line'), 'order_number': order_number,
+                    'error': f'Already {cod.get_delivery_status_display().lower()}',
+                })
+                continue
+
+            outcome = entry['outcome']
+            delivery_status, event_type, note = OUTCOMES[outcome]
+            if not (keep_attempted_status and outcome == 'ATTEMPTED'):
+                cod.delivery_status = delivery_status
+            cod.updated_at = now
+            if delivery_person_name:
+                cod.delivery_person_name = delivery_person_name
+            if delivery_person_phone:
+                cod.delivery_person_phone = delivery_person_phone
+
+            if outcome in ('ATTEMPTED', 'PAYMENT_FAILED'):
+                cod.delivery_attempts += 1
+            if outcome == 'DELIVERED':
+                cod.actual_delivery_date = now
+                cod.payment_collected_at = now
+                if entry.get('amount_collected') not in (None, ''):
+                    cod.amount_collected = entry['amount_collected']
+                else:
+                    cod.amount_collected = cod.amount_to_collect
+                cod.order.status = Order.OrderStatus.DELIVERED
+                cod.order.payment_status = Order.PaymentStatus.PAID
+                delivered_order_ids.append(cod.order_id)
+
+            notes = f"{note}: {entry['notes']}" if entry.get('notes') else note
+            if outcome in ('ATTEMPTED', 'PAYMENT_FAILED'):
+                notes = f"Attempt #{cod.delivery_attempts} - {notes}"
+            cod.delivery_notes = f"{cod.delivery_notes or ''}\n[{stamp}] {notes}".strip()
+
+            changed_cods.append(cod)
+            order_updates.append(OrderUpdate(order=cod.order, status=cod.order.status, notes=notes))
+            events[event_type].append(cod.order)
+            by_outcome[outcome] += 1
+
+        if changed_cods:
+            CashOnDelivery.objects.bulk_update(changed_cods, COD_UPDATE_FIELDS, batch_size=500)
+        if delivered_order_ids:
+            Order.objects.filter(pk__in=delivered_order_ids).update(
+                status=Order.OrderStatus.DELIVERED,
+                payment_status=Order.PaymentStatus.PAID,
+            )
+        created_updates = OrderUpdate.objects.bulk_create(order_updates, batch_size=500)
+        for event_type, orders in events.items():
+            enqueue_events(event_type, orders)
+
+        # bulk_update / bulk_create skip save(), so notify live streams here
+        stream_events = [build_delivery_event(cod, cod.order.order_number) for cod in changed_cods]
+        stream_events += [
+            build_update_event(update, update.order.order_number)
+            for update in created_updates if update.pk
+        ]
+
+        def publish_stream_events():
+            for event in stream_events:
+                hub.publish(event)
+        transaction.on_commit(publish_stream_events)
+
+    logger.info(f"Applied COD manifest: {dict(by_outcome)}, {len(errors)} errors")
+    return {
+        'applied': len(changed_cods),
+        'by_outcome': dict(by_outcome),
+        'errors': sorted(errors, key=lambda error: error.get('line') or 0),
+    }
+
+
+def apply_to_queryset(queryset, outcome, notes=None):
+    """
+    Apply one outcome to every COD row in a queryset (admin actions).
+    ATTEMPTED keeps each row's delivery status, as the attempts action always has.
+    """
+    entries = [
+        {'order_number': order_number, 'outcome': outcome, 'notes': notes}
+        for order_number in queryset.values_list('order__order_number', flat=True)
+    ]
+    return apply_manifest(entries, keep_attempted_status=True)
@@ -0,0 +1,34 @@
+# orders/db_routers.py
+from django.conf import settings
+
+
+class OrderArchiveRouter:
+    """
+    Send ArchivedOrder to settings.ORDER_ARCHIVE_DATABASE and keep every other
+    model out of that database. With the default setting ('default') the
+    archive table simply lives next to the hot tables.
+    """
+
+    def _is_archive(self, model):
+        return model._meta.app_label == 'orders' and model._meta.model_name == 'archivedorder'
+
+    def db_for_read(self, model, **hints):
+        if self._is_archive(model):
+            return settings.ORDER_ARCHIVE_DATABASE
+        return None
+
+    def db_for_write(self, model, **hints):
+        if self._is_archive(model):
+            return settings.ORDER_ARCHIVE_DATABASE
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        archive_db = settings.ORDER_ARCHIVE_DATABASE
+        if app_label == 'orders' and model_name == 'archivedorder':
+            return db == archive_db
+        if archive_db != 'default' and db == archive_db:
+            return False
+        return None
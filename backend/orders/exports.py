@@ -0,0 +1,299 @@
+# orders/exports.py
+"""
+Streaming order exports (CSV / NDJSON) for admin and accounting.
+
+Rows are produced from `.iterator(chunk_size=...)` so memory stays flat no
+matter how many orders are exported; per-order aggregates (item counts) are
+looked up once per chunk instead of once per order. `stream_export` feeds a
+StreamingHttpResponse, `write_export_file` writes the same bytes to a file
+in ORDER_EXPORT_DIR for the background job. That directory is not served
+publicly: files are downloaded through the order admin (`export_file_path`).
+"""
+import csv
+import json
+import logging
+import os
+import tempfile
+import uuid
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+EXPORT_KINDS = ('orders', 'order-items', 'landing-orders')
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class Echo:
+    """File-like object that returns what is written, for csv.writer streaming"""
+
+    def write(self, value):
+        return value
+
+
+def _fmt(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return timezone.localtime(value).isoformat() if timezone.is_aware(value) else value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# ---------------------------------------------------------------------------
+# Querysets
+# ---------------------------------------------------------------------------
+
+def _date_bounds(start, end):
+    """Local-day [start, end] -> aware datetimes usable against indexed timestamps"""
+    bounds = {}
+    if start:
+        bounds['gte'] = timezone.make_aware(datetime.combine(start, time.min))
+    if end:
+        bounds['lt'] = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min))
+    return bounds
+
+
+def build_export_queryset(kind, start=None, end=None, status=None, payment_status=None):
+    """Filtered, ordered queryset for an export kind"""
+    from products.models import LandingPageOrder
+    from .models import Order, OrderItem
+
+    bounds = _date_bounds(start, end)
+    if kind == 'orders':
+        queryset = Order.objects.all()
+        prefix = ''
+        date_field = 'ordered_at'
+    elif kind == 'order-items':
+        queryset = OrderItem.objects.all()
+        prefix = 'order__'
+        date_field = 'order__ordered_at'
+    elif kind == 'landing-orders':
+        queryset = LandingPageOrder.objects.all()
+        prefix = ''
+        date_field = 'created_at'
+    else:
+        raise ValueError(f"Unknown export kind: {kind}")
+
+    for lookup, value in bounds.items():
+        queryset = queryset.filter(**{f'{date_field}__{lookup}': value})
+    if status:
+        queryset = queryset.filter(**{f'{prefix}status': status})
+    if payment_status and kind != 'landing-orders':
+        queryset = queryset.filter(**{f'{prefix}payment_status': payment_status})
+    return queryset.order_by('pk')
+
+
+# ---------------------------------------------------------------------------
+# Row builders
+# ---------------------------------------------------------------------------
+
+ORDER_COLUMNS = [
+    'order_number', 'ordered_at', 'status', 'payment_status',
+    'customer_name', 'customer_email', 'customer_phone',
+    'cart_subtotal', 'total_amount', 'items_count', 'units',
+    'shipping_method', 'tracking_number',
+    'shipping_address', 'shipping_city', 'shipping_postal_code',
+    'payment_method', 'transaction_id', 'sender_number',
+    'cod_delivery_status', 'cod_amount_to_collect', 'cod_amount_collected',
+    'cod_delivery_attempts', 'cod_payment_collected_at',
+]
+
+ORDER_ITEM_COLUMNS = [
+    'order_number', 'ordered_at', 'status', 'payment_status', 'customer_name',
+    'product_id', 'product_name', 'color', 'size', 'quantity', 'unit_price', 'line_total',
+]
+
+LANDING_ORDER_COLUMNS = [
+    'order_number', 'created_at', 'status', 'full_name', 'email', 'phone',
+    'detailed_address', 'product_id', 'product_name', 'quantity', 'unit_price',
+    'total_price', 'is_wholesaler', 'customer_notes', 'admin_notes',
+]
+
+
+def _iter_order_rows(queryset, chunk_size):
+    from .models import OrderItem
+
+    queryset = queryset.select_related(
+        'shipping_method', 'shipping_address', 'payment', 'cash_on_delivery'
+    )
+    for chunk in _chunks(queryset.iterator(chunk_size=chunk_size), chunk_size):
+        item_totals = {
+            row['order_id']: row
+            for row in OrderItem.objects.filter(order_id__in=[order.pk for order in chunk])
+            .values('order_id').annotate(items_count=Count('id'), units=Sum('quantity')).order_by()
+        }
+        for order in chunk:
+            totals = item_totals.get(order.pk, {})
+            address = order.shipping_address
+            payment = getattr(order, 'payment', None)
+            cod = getattr(order, 'cash_on_delivery', None)
+            yield {
+                'order_number': order.order_number,
+                'ordered_at': order.ordered_at,
+                'status': order.status,
+                'payment_status': order.payment_status,
+                'customer_name': order.customer_name,
+                'customer_email': order.customer_email,
+                'customer_phone': order.customer_phone,
+                'cart_subtotal': order.cart_subtotal,
+                'total_amount': order.total_amount,
+                'items_count': totals.get('items_count', 0),
+                'units': totals.get('units') or 0,
+                'shipping_method': order.shipping_method.name if order.shipping_method else None,
+                'tracking_number': order.tracking_number,
+                'shipping_address': ', '.join(
+                    part for part in (address.address_line_1, address.address_line_2) if part
+                ) if address else None,
+                'shipping_city': address.city if address else None,
+                'shipping_postal_code': address.postal_code if address else None,
+                'payment_method': payment.payment_method if payment else None,
+                'transaction_id': payment.transaction_id if payment else None,
+                'sender_number': payment.sender_number if payment else None,
+                'cod_delivery_status': cod.delivery_status if cod else None,
+                'cod_amount_to_collect': cod.amount_to_collect if cod else None,
+                'cod_amount_collected': cod.amount_collected if cod else None,
+                'cod_delivery_attempts': cod.delivery_attempts if cod else None,
+                'cod_payment_collected_at': cod.payment_collected_at if cod else None,
+            }
+
+
+def _iter_order_item_rows(queryset, chunk_size):
+    queryset = queryset.select_related('order', 'product', 'color', 'size')
+    for item in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            'order_number': item.order.order_number,
+            'ordered_at': item.order.ordered_at,
+            'status': item.order.status,
+            'payment_status': item.order.payment_status,
+            'customer_name': item.order.customer_name,
+            'product_id': item.product_id,
+            'product_name': item.product.name,
+            'color': item.color.name if item.color else None,
+            'size': item.size.name if item.size else None,
+            'quantity': item.quantity,
+            'unit_price': item.unit_price,
+            'line_total': item.unit_price * item.quantity,
+        }
+
+
+def _iter_landing_order_rows(queryset, chunk_size):
+    queryset = queryset.select_related('product')
+    for order in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            'order_number': order.order_number,
+            'created_at': order.created_at,
+            'status': order.status,
+            'full_name': order.full_name,
+            'email': order.email,
+            'phone': order.phone,
+            'detailed_address': order.detailed_address,
+            'product_id': order.product_id,
+            'product_name': order.product.name,
+            'quantity': order.quantity,
+            'unit_price': order.unit_price,
+            'total_price': order.total_price,
+            'is_wholesaler': order.is_wholesaler,
+            'customer_notes': order.customer_notes,
+            'admin_notes': order.admin_notes,
+        }
+
+
+EXPORTERS = {
+    'orders': (ORDER_COLUMNS, _iter_order_rows),
+    'order-items': (ORDER_ITEM_COLUMNS, _iter_order_item_rows),
+    'landing-orders': (LANDING_ORDER_COLUMNS, _iter_landing_order_rows),
+}
+
+
+# ---------------------------------------------------------------------------
+# Output
+# ---------------------------------------------------------------------------
+
+def stream_export(kind, fmt, queryset, chunk_size=None):
+    """Yield the export as text chunks (one line per row)"""
+    columns, iter_rows = EXPORTERS[kind]
+    chunk_size = chunk_size or settings.ORDER_EXPORT_CHUNK_SIZE
+    rows = iter_rows(queryset, chunk_size)
+
+    if fmt == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(columns)
+        for row in rows:
+            yield writer.writerow([_fmt(row[column]) for column in columns])
+    elif fmt == 'ndjson':
+        for row in rows:
+            yield json.dumps({column: _fmt(row[column]) for column in columns}) + '\n'
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+
+def export_filename(kind, fmt):
+    return f"{kind}-{timezone.localtime().strftime('%Y%m%d-%H%M%S')}.{fmt}"
+
+
+def export_response(kind, fmt, queryset):
+    """StreamingHttpResponse download of an export (used by the API and admin actions)"""
+    from django.http import StreamingHttpResponse
+
+    response = StreamingHttpResponse(stream_export(kind, fmt, queryset), content_type=EXPORT_FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(kind, fmt)}"'
+    return response
+
+
+def write_export_file(kind, fmt, start=None, end=None, status=None, payment_status=None):
+    """
+    Write an export to ORDER_EXPORT_DIR; returns (file name, rows).
+    The name carries a random token so exports never overwrite each other.
+    """
+    queryset = build_export_queryset(kind, start=start, end=end, status=status, payment_status=payment_status)
+
+    name = f"{uuid.uuid4().hex[:12]}-{export_filename(kind, fmt)}"
+    os.makedirs(settings.ORDER_EXPORT_DIR, exist_ok=True)
+    full_path = os.path.join(settings.ORDER_EXPORT_DIR, name)
+
+    # Write to a temp name and rename so a half-written file is never served
+    descriptor, tmp_path = tempfile.mkstemp(dir=settings.ORDER_EXPORT_DIR, suffix='.part')
+    rows = 0
+    try:
+        with os.fdopen(descriptor, 'w', encoding='utf-8', newline='') as fh:
+            for line in stream_export(kind, fmt, queryset):
+                fh.write(line)
+                rows += 1
+        os.replace(tmp_path, full_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+    if fmt == 'csv':
+        rows -= 1  # header
+    logger.info(f"Wrote {rows} {kind} rows to {full_path}")
+    return name, rows
+
+
+def export_file_path(name):
+    """Absolute path of a finished export, or None (also for names reaching outside ORDER_EXPORT_DIR)"""
+    if not name or name != os.path.basename(name) or name.startswith('.') or name.endswith('.part'):
+        return None
+    path = os.path.join(settings.ORDER_EXPORT_DIR, name)
+    return path if os.path.isfile(path) else None
@@ -0,0 +1,197 @@
+# orders/lookup.py
+"""
+Order lookup index for support staff.
+
+Every order gets a handful of normalized tokens in OrderLookupToken, written
+whenever a searchable field changes:
+
+    n:<ORDER NUMBER>   n:<order number digits>
+    p:<phone>          (digits without +880 / leading 0)
+    r:<phone reversed> (so the last digits of a phone are a prefix too)
+    e:<email>          l:<email local part>
+    k:<TRACKING NUMBER>
+    w:<name word>      t:<name trigram>
+
+The (token, order) unique index serves exact and prefix lookups as index range
+scans (token >= 'n:ORD12' AND token < 'n:ORD12\\uffff'), and query words are
+combined on order ids, so a lookup never scans orders_order. Like the admin,
+every word of the query must match some field. Words match field prefixes
+(phone numbers also by their last digits); when nothing matches, name words fall back to substring matching on their
+trigrams.
+"""
+import re
+
+from django.db import transaction
+from django.db.models import Q
+
+# Token kinds
+ORDER_NUMBER = 'n:'
+PHONE = 'p:'
+PHONE_REVERSED = 'r:'
+EMAIL = 'e:'
+EMAIL_LOCAL = 'l:'
+TRACKING = 'k:'
+NAME_WORD = 'w:'
+NAME_TRIGRAM = 't:'
+
+MAX_TOKEN_LENGTH = 100
+PREFIX_END = '\uffff'  # sorts after every character used in tokens
+DEFAULT_LIMIT = 50
+
+
+def normalize_phone(value):
+    digits = re.sub(r'\D', '', value or '')
+    if digits.startswith('880'):
+        digits = digits[3:]
+    return digits.lstrip('0')
+
+
+def _name_words(value):
+    return [word for word in re.split(r'[^\w]+', (value or '').lower()) if word]
+
+
+def _trigrams(word):
+    return {word[index:index + 3] for index in range(len(word) - 2)}
+
+
+def order_tokens(order):
+    """The set of lookup tokens for an order"""
+    tokens = set()
+    if order.order_number:
+        number = order.order_number.upper()
+        tokens.add(ORDER_NUMBER + number)
+        digits = re.sub(r'\D', '', number)
+        if digits and digits != number:
+            tokens.add(ORDER_NUMBER + digits)
+    phone = normalize_phone(order.customer_phone)
+    if phone:
+        tokens.add(PHONE + phone)
+        tokens.add(PHONE_REVERSED + phone[::-1])
+    email = (order.customer_email or '').strip().lower()
+    if email:
+        tokens.add(EMAIL + email)
+        tokens.add(EMAIL_LOCAL + email.split('@', 1)[0])
+    if order.tracking_number:
+        tokens.add(TRACKING + order.tracking_number.strip().upper())
+    for word in _name_words(order.customer_name):
+        tokens.add(NAME_WORD + word)
+        tokens.update(NAME_TRIGRAM + trigram for trigram in _trigrams(word))
+    return {token[:MAX_TOKEN_LENGTH] for token in tokens}
+
+
+# Order fields the tokens are built from
+LOOKUP_FIELDS = ('order_number', 'customer_name', 'customer_email', 'customer_phone', 'tracking_number')
+
+
+def lookup_key(order):
+    """Searchable field values; tokens are rebuilt only when this changes"""
+    return tuple(order.__dict__.get(field) for field in LOOKUP_FIELDS)
+
+
+def refresh_order_tokens(orders):
+    """Rewrite the tokens of `orders` (one DELETE and one bulk INSERT)"""
+    from .models import OrderLookupToken
+
+    orders = list(orders)
+    if not orders:
+        return 0
+    rows = [OrderLookupToken(order_id=order.pk, token=token) for order in orders for token in order_tokens(order)]
+    with transaction.atomic():
+        OrderLookupToken.objects.filter(order_id__in=[order.pk for order in orders]).delete()
+        OrderLookupToken.objects.bulk_create(rows, batch_size=2000)
+    return len(rows)
+
+
+# ---------------------------------------------------------------------------
+# Search
+# ---------------------------------------------------------------------------
+
+PHONE_QUERY_RE = re.compile(r'[\d+\-\s()]+')
+
+
+def _any_prefix(prefixes):
+    """Token condition: starts with any of `prefixes` (index range scans)"""
+    condition = Q()
+    for prefix in prefixes:
+        condition |= Q(token__gte=prefix, token__lt=prefix + PREFIX_END)
+    return condition
+
+
+def _word_conditions(word, substring=False):
+    """
+    Token conditions one query word adds; an order matches the word when it has
+    a token satisfying each of them. Normally that is one prefix condition over
+    every field. With `substring`, name-like words instead require all of their
+    trigrams (a LIKE '%word%' on the name).
+    """
+    upper, lower = word.upper(), word.lower()
+    prefixes = [ORDER_NUMBER + upper, TRACKING + upper]
+
+    if '@' in word:
+        return [_any_prefix(prefixes + [EMAIL + lower])]
+
+    digits = normalize_phone(word)
+    if digits and PHONE_QUERY_RE.fullmatch(word):
+        if len(digits) >= 4:
+            prefixes += [PHONE + digits, PHONE_REVERSED + digits[::-1]]
+        return [_any_prefix(prefixes)]
+
+    name_words = _name_words(lower)
+    if substring and name_words and all(len(name_word) >= 3 for name_word in name_words):
+        return [
+            Q(token=NAME_TRIGRAM + trigram)
+            for name_word in name_words for trigram in sorted(_trigrams(name_word))
+        ]
+    return [_any_prefix(prefixes + [EMAIL_LOCAL + lower] + [NAME_WORD + name_word for name_word in name_words])]
+
+
+def _query_conditions(query, substring=False):
+    # Longest words first: they are usually the most selective
+    words = sorted((query or '').split(), key=len, reverse=True)
+    return [condition for word in words for condition in _word_conditions(word, substring)]
+
+
+def _token_order_ids(condition):
+    from .models import OrderLookupToken
+
+    return OrderLookupToken.objects.filter(condition).values_list('order_id', flat=True)
+
+
+def search_order_ids(query, limit=DEFAULT_LIMIT):
+    """
+    Ids of the newest `limit` orders matching every word of `query`. The first
+    condition drives an index range scan, the others filter it with IN
+    subqueries. Falls back to substring (trigram) matching on names when
+    nothing matches by prefix.
+    """
+    for substring in (False, True):
+        conditions = _query_conditions(query, substring)
+        if not conditions:
+            return []
+        queryset = _token_order_ids(conditions[0])
+        for condition in conditions[1:]:
+            queryset = queryset.filter(order_id__in=_token_order_ids(condition))
+        order_ids = list(queryset.distinct().order_by('-order_id')[:limit])
+        if order_ids:
+            return order_ids
+    return []
+
+
+def lookup_order_ids(query):
+    """
+    All matching order ids as one subquery, for
+    `Order.objects.filter(pk__in=lookup_order_ids(q))` (admin search, where the
+    changelist counts and pages the result). Conditions are combined with
+    INTERSECT, which SQLite evaluates faster than nested IN subqueries here.
+    """
+    from .models import OrderLookupToken
+
+    for substring in (False, True):
+        conditions = _query_conditions(query, substring)
+        if not conditions:
+            break
+        first, *rest = [_token_order_ids(condition) for condition in conditions]
+        order_ids = first.intersection(*rest) if rest else first
+        if substring or order_ids.exists():
+            return order_ids
+    return OrderLookupToken.objects.none().values_list('order_id', flat=True)
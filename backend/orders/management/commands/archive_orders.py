@@ -0,0 +1,57 @@
+"""
+Django management command to move old finished orders into the archive
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.archive import ArchiveError, archivable_orders, archive_chunk
+
+
+class Command(BaseCommand):
+    help = 'Move delivered/cancelled orders older than ORDER_ARCHIVE_AFTER_DAYS into ArchivedOrder'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.ORDER_ARCHIVE_AFTER_DAYS,
+            help='Archive finished orders placed more than this many days ago'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=settings.ORDER_ARCHIVE_CHUNK_SIZE,
+            help='Orders moved per transaction'
+        )
+        parser.add_argument('--limit', type=int, help='Stop after this many orders')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the orders that would be archived')
+
+    def handle(self, *args, **options):
+        days = options['days']
+        chunk_size = max(options['chunk_size'], 1)
+        limit = options['limit']
+        candidates = archivable_orders(days)
+
+        total = candidates.count()
+        if limit is not None:
+            total = min(total, limit)
+        self.stdout.write(
+            f"🗄️  {total} orders older than {days} days to archive "
+            f"(database: {settings.ORDER_ARCHIVE_DATABASE})"
+        )
+        if options['dry_run'] or not total:
+            if options['dry_run']:
+                self.stdout.write(self.style.WARNING('Dry run - nothing was changed'))
+            return
+
+        moved = 0
+        while moved < total:
+            order_ids = list(candidates.values_list('pk', flat=True)[:min(chunk_size, total - moved)])
+            if not order_ids:
+                break
+            try:
+                archived = archive_chunk(order_ids, days)
+            except ArchiveError as e:
+                raise CommandError(f'{e} - stopped after {moved} orders, nothing deleted from this chunk')
+            if not archived:
+                break
+            moved += archived
+            self.stdout.write(f"  archived {moved}/{total}")
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Archived {moved} orders'))
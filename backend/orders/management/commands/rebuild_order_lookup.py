@@ -0,0 +1,32 @@
+"""
+Django management command to rebuild the staff order lookup index
+"""
+from django.core.management.base import BaseCommand
+
+from orders.lookup import LOOKUP_FIELDS, refresh_order_tokens
+from orders.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Rebuild OrderLookupToken rows for every order (after bulk imports or raw SQL updates)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Orders re-indexed per transaction')
+
+    def handle(self, *args, **options):
+        chunk_size = max(options['chunk_size'], 1)
+        total = Order.objects.count()
+        self.stdout.write(f'🔎 Rebuilding lookup tokens for {total} orders...')
+
+        indexed = tokens = 0
+        last_pk = 0
+        while True:
+            chunk = list(Order.objects.filter(pk__gt=last_pk).order_by('pk').only(*LOOKUP_FIELDS)[:chunk_size])
+            if not chunk:
+                break
+            tokens += refresh_order_tokens(chunk)
+            indexed += len(chunk)
+            last_pk = chunk[-1].pk
+            self.stdout.write(f'  {indexed}/{total}')
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Indexed {indexed} orders ({tokens} tokens)'))
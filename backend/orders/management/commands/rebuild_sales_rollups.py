@@ -0,0 +1,68 @@
+"""
+Django management command to rebuild the daily sales rollup tables
+"""
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from orders.analytics import day_bounds, refresh_day
+from orders.models import ArchivedOrder, DailyOrderRollup, Order
+
+
+class Command(BaseCommand):
+    help = 'Rebuild daily order/sales rollups for a date range (defaults to every day with orders)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=str, help='First day to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--end', type=str, help='Last day to rebuild (YYYY-MM-DD), defaults to today')
+        parser.add_argument('--days', type=int, help='Rebuild only the last N days (catch-up mode)')
+
+    def handle(self, *args, **options):
+        try:
+            end = date.fromisoformat(options['end']) if options['end'] else timezone.localdate()
+            if options['days']:
+                start = end - timedelta(days=options['days'] - 1)
+            elif options['start']:
+                start = date.fromisoformat(options['start'])
+            else:
+                first_orders = [
+                    model.objects.order_by('ordered_at').values_list('ordered_at', flat=True).first()
+                    for model in (Order, ArchivedOrder)
+                ]
+                first_order = min((value for value in first_orders if value), default=None)
+                if first_order is None:
+                    self.stdout.write(self.style.WARNING('No orders found, nothing to rebuild'))
+                    return
+                start = timezone.localdate(first_order)
+        except ValueError as e:
+            raise CommandError(f'Invalid date: {e}')
+
+        if start > end:
+            raise CommandError('--start must be on or before --end')
+
+        self.stdout.write(f'📊 Rebuilding sales rollups from {start} to {end}...')
+
+        # Days that have orders, plus days that only have stale rollup rows
+        range_start, _ = day_bounds(start)
+        _, range_end = day_bounds(end)
+        order_days = set()
+        for model in (Order, ArchivedOrder):
+            order_days.update(
+                model.objects.filter(ordered_at__gte=range_start, ordered_at__lt=range_end).dates('ordered_at', 'day')
+            )
+        rollup_days = set(
+            DailyOrderRollup.objects.filter(date__range=(start, end)).values_list('date', flat=True)
+        )
+
+        total_order_rows = total_sales_rows = 0
+        for day in sorted(order_days | rollup_days):
+            order_rows, sales_rows = refresh_day(day)
+            total_order_rows += order_rows
+            total_sales_rows += sales_rows
+            self.stdout.write(f'  {day}: {order_rows} status rows, {sales_rows} shop/category rows')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Rebuilt {len(order_days | rollup_days)} days '
+            f'({total_order_rows} order rollups, {total_sales_rows} sales rollups)'
+        ))
@@ -0,0 +1,62 @@
+"""
+Django management command to reconcile mobile payments against a provider statement
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.reconciliation import PROVIDER_METHODS, StatementFormatError, reconcile_statement
+
+
+class Command(BaseCommand):
+    help = 'Match bKash/Nagad/Rocket statement CSV rows against unverified order payments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('statement', type=str, help='Path to the provider statement CSV')
+        parser.add_argument(
+            '--provider', choices=sorted(PROVIDER_METHODS), default='all',
+            help='Only reconcile payments made with this provider'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Report only, do not update payments or orders')
+        parser.add_argument('--report', type=str, help='Write the full JSON report to this path')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"💳 Reconciling {options['statement']} ({options['provider']})...")
+        try:
+            with open(options['statement'], newline='', encoding='utf-8-sig') as fh:
+                report = reconcile_statement(fh, provider=options['provider'], dry_run=options['dry_run'])
+        except FileNotFoundError:
+            raise CommandError(f"Statement file not found: {options['statement']}")
+        except StatementFormatError as e:
+            raise CommandError(str(e))
+
+        summary = report['summary']
+        self.stdout.write(f"  Statement rows:           {summary['statement_rows']}")
+        self.stdout.write(f"  Payments checked:         {summary['payments_checked']}")
+        self.stdout.write(self.style.SUCCESS(f"  Matched:                  {summary['matched']}"))
+        self.stdout.write(f"  Orders marked paid:       {summary['orders_marked_paid']}")
+        self.stdout.write(f"  Unmatched statement rows: {summary['unmatched_statement_rows']}")
+        self.stdout.write(f"  Unmatched payments:       {summary['unmatched_payments']}")
+
+        for mismatch in report['mismatches']:
+            self.stdout.write(self.style.WARNING(
+                f"  ⚠️  {mismatch['order_number']} ({mismatch['transaction_id']}): {'; '.join(mismatch['problems'])}"
+            ))
+        for duplicate in report['duplicate_claims']:
+            self.stdout.write(self.style.ERROR(
+                f"  ❌ {duplicate['transaction_id']} claimed by {', '.join(duplicate['order_numbers'])}"
+            ))
+        if summary['duplicate_statement_rows']:
+            self.stdout.write(self.style.WARNING(
+                f"  ⚠️  {summary['duplicate_statement_rows']} duplicate transaction IDs in the statement"
+            ))
+
+        if options['report']:
+            with open(options['report'], 'w', encoding='utf-8') as fh:
+                json.dump(report, fh, indent=2, default=str)
+            self.stdout.write(f"  Report written to {options['report']}")
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('Dry run - nothing was changed'))
+        else:
+            self.stdout.write(self.style.SUCCESS('✅ Reconciliation complete'))
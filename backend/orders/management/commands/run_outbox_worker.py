@@ -0,0 +1,65 @@
+"""
+Django management command that drains the order outbox
+"""
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from orders.models import OutboxEvent
+from orders.outbox import claim_events, process_event
+
+
+def _process_in_thread(event_id):
+    # Every worker thread gets its own DB connection; close it when done so
+    # long-running workers don't leak connections.
+    try:
+        return process_event(event_id)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Dispatch pending outbox events (emails, webhooks) with retries and backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4, help='Number of worker threads')
+        parser.add_argument('--batch-size', type=int, default=50, help='Events claimed per poll')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds to sleep when the outbox is empty')
+        parser.add_argument('--once', action='store_true', help='Drain the currently due events and exit')
+
+    def handle(self, *args, **options):
+        worker_id = f"worker-{uuid.uuid4().hex[:12]}"
+        threads = max(options['threads'], 1)
+        self.stdout.write(f'Outbox worker {worker_id} started with {threads} threads')
+
+        totals = {OutboxEvent.Status.DONE: 0, OutboxEvent.Status.PENDING: 0, OutboxEvent.Status.FAILED: 0}
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            try:
+                while True:
+                    close_old_connections()
+                    event_ids = claim_events(options['batch_size'], worker_id=worker_id)
+                    if not event_ids:
+                        if options['once']:
+                            break
+                        time.sleep(options['poll_interval'])
+                        continue
+
+                    for status in executor.map(_process_in_thread, event_ids):
+                        totals[status] = totals.get(status, 0) + 1
+                    self.stdout.write(
+                        f"Processed {len(event_ids)} events "
+                        f"(done={totals[OutboxEvent.Status.DONE]}, "
+                        f"retrying={totals[OutboxEvent.Status.PENDING]}, "
+                        f"failed={totals[OutboxEvent.Status.FAILED]})"
+                    )
+            except KeyboardInterrupt:
+                self.stdout.write(self.style.WARNING('Stopping outbox worker...'))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Outbox worker finished: {totals[OutboxEvent.Status.DONE]} done, "
+            f"{totals[OutboxEvent.Status.PENDING]} scheduled for retry, "
+            f"{totals[OutboxEvent.Status.FAILED]} failed"
+        ))
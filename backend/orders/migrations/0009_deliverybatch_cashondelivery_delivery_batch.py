@@ -0,0 +1,43 @@
+# Generated by Django 5.2.4 on 2026-10-19 02:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_dailyorderrollup_dailysalesrollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeliveryBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(help_text='e.g., B20250101-01', max_length=30, unique=True)),
+                ('delivery_date', models.DateField(db_index=True)),
+                ('delivery_person_name', models.CharField(max_length=100)),
+                ('delivery_person_phone', models.CharField(blank=True, max_length=20, null=True)),
+                ('cities', models.CharField(blank=True, help_text='Cities covered by this batch', max_length=255)),
+                ('postal_codes', models.TextField(blank=True, help_text='Postal codes covered, in route order')),
+                ('parcels_count', models.PositiveIntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, help_text='Cash to collect on this run', max_digits=14)),
+                ('status', models.CharField(choices=[('PLANNED', 'Planned'), ('DISPATCHED', 'Dispatched'), ('COMPLETED', 'Completed')], db_index=True, default='PLANNED', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='delivery_batches', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Delivery Batch',
+                'verbose_name_plural': 'Delivery Batches',
+                'ordering': ['-delivery_date', 'code'],
+            },
+        ),
+        migrations.AddField(
+            model_name='cashondelivery',
+            name='delivery_batch',
+            field=models.ForeignKey(blank=True, help_text='Courier batch this parcel was planned into', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='parcels', to='orders.deliverybatch'),
+        ),
+    ]
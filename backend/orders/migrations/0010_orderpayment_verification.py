@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-19 02:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_deliverybatch_cashondelivery_delivery_batch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderpayment',
+            name='statement_amount',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Amount shown on the provider statement', max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='orderpayment',
+            name='verification_note',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='orderpayment',
+            name='verification_status',
+            field=models.CharField(choices=[('UNVERIFIED', 'Not yet verified'), ('VERIFIED', 'Verified against statement'), ('MISMATCH', 'Amount or sender mismatch'), ('DUPLICATE', 'Transaction ID used by several orders')], db_index=True, default='UNVERIFIED', help_text='Result of matching this payment against the provider statement', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='orderpayment',
+            name='verified_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='orderpayment',
+            name='transaction_id',
+            field=models.CharField(blank=True, db_index=True, help_text='Transaction/Reference ID', max_length=100, null=True),
+        ),
+    ]
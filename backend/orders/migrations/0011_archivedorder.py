@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-19 03:00
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0010_orderpayment_verification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_id', models.BigIntegerField(help_text='Primary key the order had in orders_order', unique=True)),
+                ('order_number', models.CharField(max_length=50, unique=True)),
+                ('user_id', models.BigIntegerField(blank=True, db_index=True, null=True)),
+                ('customer_name', models.CharField(max_length=100)),
+                ('customer_email', models.EmailField(db_index=True, max_length=254)),
+                ('customer_phone', models.CharField(max_length=50)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending Confirmation'), ('PROCESSING', 'Processing'), ('SHIPPED', 'Shipped'), ('DELIVERED', 'Delivered'), ('CANCELLED', 'Cancelled')], max_length=20)),
+                ('payment_status', models.CharField(choices=[('PENDING', 'Pending'), ('PAID', 'Paid'), ('FAILED', 'Failed'), ('COD_PENDING', 'Cash on Delivery - Pending')], max_length=20)),
+                ('total_amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('ordered_at', models.DateTimeField(db_index=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('data', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, help_text='Order detail snapshot (items, updates, payment, COD)')),
+                ('sales_lines', models.JSONField(blank=True, default=list, help_text='Per shop/category units and revenue, so sales rollups can still include this order')),
+            ],
+            options={
+                'verbose_name': 'Archived Order',
+                'verbose_name_plural': 'Archived Orders',
+                'ordering': ['-ordered_at'],
+            },
+        ),
+    ]
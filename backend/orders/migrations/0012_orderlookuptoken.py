@@ -0,0 +1,72 @@
+# Generated by Django 5.2.4 on 2026-10-19 03:02
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def order_tokens(order):
+    """Lookup tokens of an order, as orders.lookup.order_tokens built them when this migration was written"""
+    tokens = set()
+    if order.order_number:
+        number = order.order_number.upper()
+        tokens.add('n:' + number)
+        digits = re.sub(r'\D', '', number)
+        if digits and digits != number:
+            tokens.add('n:' + digits)
+    phone = re.sub(r'\D', '', order.customer_phone or '')
+    if phone.startswith('880'):
+        phone = phone[3:]
+    phone = phone.lstrip('0')
+    if phone:
+        tokens.add('p:' + phone)
+    email = (order.customer_email or '').strip().lower()
+    if email:
+        tokens.add('e:' + email)
+        tokens.add('l:' + email.split('@', 1)[0])
+    if order.tracking_number:
+        tokens.add('k:' + order.tracking_number.strip().upper())
+    for word in re.split(r'[^\w]+', (order.customer_name or '').lower()):
+        if word:
+            tokens.add('w:' + word)
+            tokens.update('t:' + word[index:index + 3] for index in range(len(word) - 2))
+    return {token[:100] for token in tokens}
+
+
+def build_lookup_tokens(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    OrderLookupToken = apps.get_model('orders', 'OrderLookupToken')
+    batch = []
+    for order in Order.objects.only(
+        'order_number', 'customer_name', 'customer_email', 'customer_phone', 'tracking_number'
+    ).iterator(chunk_size=2000):
+        batch.extend(OrderLookupToken(order_id=order.pk, token=token) for token in order_tokens(order))
+        if len(batch) >= 5000:
+            OrderLookupToken.objects.bulk_create(batch)
+            batch = []
+    OrderLookupToken.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0011_archivedorder'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderLookupToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=100)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lookup_tokens', to='orders.order')),
+            ],
+            options={
+                'verbose_name': 'Order Lookup Token',
+                'verbose_name_plural': 'Order Lookup Tokens',
+                'constraints': [models.UniqueConstraint(fields=('token', 'order'), name='order_lookup_token_uniq')],
+            },
+        ),
+        migrations.RunPython(build_lookup_tokens, migrations.RunPython.noop),
+    ]
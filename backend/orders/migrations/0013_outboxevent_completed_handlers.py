@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 03:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0012_orderlookuptoken'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxevent',
+            name='completed_handlers',
+            field=models.JSONField(blank=True, default=list, help_text='Handlers that already succeeded; skipped on retry'),
+        ),
+    ]
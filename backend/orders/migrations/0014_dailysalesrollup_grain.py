@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 04:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0013_outboxevent_completed_handlers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailysalesrollup',
+            name='grain',
+            field=models.CharField(choices=[('LINE', 'Shop x category'), ('SHOP', 'Shop'), ('CATEGORY', 'Category')], default='LINE', help_text='What the row is grouped by; SHOP rows have no category, CATEGORY rows no shop', max_length=10),
+        ),
+    ]
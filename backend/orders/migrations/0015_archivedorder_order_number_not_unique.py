@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 04:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0014_dailysalesrollup_grain'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='archivedorder',
+            name='order_number',
+            field=models.CharField(db_index=True, max_length=50),
+        ),
+    ]
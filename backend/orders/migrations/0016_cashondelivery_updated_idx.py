@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-19 04:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0015_archivedorder_order_number_not_unique'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cashondelivery',
+            index=models.Index(fields=['updated_at', 'id'], name='cod_updated_idx'),
+        ),
+    ]
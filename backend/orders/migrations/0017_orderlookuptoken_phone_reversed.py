@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-19 10:45
+
+from django.db import migrations
+
+
+def add_reversed_phone_tokens(apps, schema_editor):
+    """Add an 'r:<reversed phone>' token next to every existing 'p:<phone>' token"""
+    OrderLookupToken = apps.get_model('orders', 'OrderLookupToken')
+    batch = []
+    for order_id, token in OrderLookupToken.objects.filter(
+        token__startswith='p:'
+    ).values_list('order_id', 'token').iterator(chunk_size=2000):
+        batch.append(OrderLookupToken(order_id=order_id, token='r:' + token[2:][::-1]))
+        if len(batch) >= 5000:
+            OrderLookupToken.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    OrderLookupToken.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def remove_reversed_phone_tokens(apps, schema_editor):
+    apps.get_model('orders', 'OrderLookupToken').objects.filter(token__startswith='r:').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0016_cashondelivery_updated_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_reversed_phone_tokens, remove_reversed_phone_tokens),
+    ]
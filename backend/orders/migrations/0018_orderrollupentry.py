@@ -0,0 +1,76 @@
+# Generated by Django 5.2.4 on 2026-10-19 04:42
+
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import DecimalField, F, Sum
+from django.utils import timezone
+
+
+def build_rollup_entries(apps, schema_editor):
+    """Record what every existing order adds to the rollups, as orders.analytics.order_entries does"""
+    Order = apps.get_model('orders', 'Order')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    OrderRollupEntry = apps.get_model('orders', 'OrderRollupEntry')
+    last_pk = 0
+    while True:
+        orders = list(
+            Order.objects.filter(pk__gt=last_pk).order_by('pk')
+            .values('pk', 'ordered_at', 'status', 'total_amount')[:2000]
+        )
+        if not orders:
+            break
+        last_pk = orders[-1]['pk']
+        lines = defaultdict(list)
+        for row in (
+            OrderItem.objects.filter(order_id__in=[order['pk'] for order in orders])
+            .values('order_id', 'product__shop_id', 'product__sub_category__category_id')
+            .annotate(
+                units=Sum('quantity'),
+                revenue=Sum(F('quantity') * F('unit_price'), output_field=DecimalField(max_digits=14, decimal_places=2)),
+            )
+            .order_by()
+        ):
+            lines[row['order_id']].append({
+                'shop_id': row['product__shop_id'],
+                'category_id': row['product__sub_category__category_id'],
+                'units': row['units'] or 0,
+                'revenue': str(row['revenue'] or 0),
+            })
+        OrderRollupEntry.objects.bulk_create([
+            OrderRollupEntry(
+                order_id=order['pk'],
+                date=timezone.localdate(order['ordered_at']),
+                status=order['status'],
+                total_amount=order['total_amount'],
+                sales_lines=lines[order['pk']],
+            )
+            for order in orders
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0017_orderlookuptoken_phone_reversed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderRollupEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(db_index=True, help_text='Order date (local time)')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending Confirmation'), ('PROCESSING', 'Processing'), ('SHIPPED', 'Shipped'), ('DELIVERED', 'Delivered'), ('CANCELLED', 'Cancelled')], max_length=20)),
+                ('total_amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('sales_lines', models.JSONField(blank=True, default=list, help_text='Item units and revenue per (shop, category), as counted in DailySalesRollup')),
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='rollup_entry', to='orders.order')),
+            ],
+            options={
+                'verbose_name': 'Order Rollup Entry',
+                'verbose_name_plural': 'Order Rollup Entries',
+            },
+        ),
+        migrations.RunPython(build_rollup_entries, migrations.RunPython.noop),
+    ]
@@ -2,6 +2,7 @@
 import uuid
 from django.db import models
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
 from products.models import Product, Color, Size
 from users.models import Address
@@ -670,6 +671,16 @@ class Order(models.Model):
     def __str__(self):
         return str(self.order_number)
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded status so save() can tell when it changed
+        instance._loaded_status = instance.__dict__.get('status')
+        # ...and the searchable fields, so the lookup index is only rewritten when they change
+        from .lookup import lookup_key
+        instance._loaded_lookup_key = lookup_key(instance)
+        return instance
+
     def save(self, *args, **kwargs):
         # Generate a human-readable order number if not set
         if not self.order_number:
@@ -685,10 +696,14 @@ class Order(models.Model):
             
             self.order_number = f"ORD{time_part}{random_part}"
             
-            # Ensure uniqueness (handle unlikely collision by incrementing random part)
+            # Ensure uniqueness (handle unlikely collision by incrementing random part).
+            # Numbers only carry the time of day, so archived orders are checked too.
             counter = 1
             original_order_number = self.order_number
-            while Order.objects.filter(order_number=self.order_number).exclude(pk=self.pk).exists():
+            while (
+                Order.objects.filter(order_number=self.order_number).exclude(pk=self.pk).exists()
+                or ArchivedOrder.objects.filter(order_number=self.order_number).exists()
+            ):
                 # If collision occurs, increment the random part
                 new_random = (int(random_part) + counter) % 1000
                 self.order_number = f"ORD{time_part}{new_random:03d}"
@@ -700,6 +715,20 @@ class Order(models.Model):
         
         super().save(*args, **kwargs)
 
+        previous_status = getattr(self, '_loaded_status', None)
+        if previous_status and previous_status != self.status:
+            # Keeps the sales rollups (and webhook consumers) in sync
+            from .outbox import enqueue_event
+            enqueue_event('order.status_changed', order=self, previous_status=previous_status)
+        self._loaded_status = self.status
+
+        # Keep the staff lookup index in sync with the searchable fields
+        from .lookup import lookup_key, refresh_order_tokens
+        key = lookup_key(self)
+        if key != getattr(self, '_loaded_lookup_key', None):
+            refresh_order_tokens([self])
+            self._loaded_lookup_key = key
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items', db_index=True)
     product = models.ForeignKey(Product, on_delete=models.CASCADE, db_index=True)
@@ -728,6 +757,14 @@ class OrderUpdate(models.Model):
     def __str__(self):
         return f"Update for {self.order.order_number} at {self.timestamp}"
 
+    def save(self, *args, **kwargs):
+        is_new = self._state.adding
+        super().save(*args, **kwargs)
+        if is_new:
+            # Push to live order status streams
+            from .order_stream import build_update_event, publish_after_commit
+            publish_after_commit(build_update_event(self, self.order.order_number))
+
 class OrderPayment(models.Model):
     class PaymentMethod(models.TextChoices):
         BKASH = 'bkash', 'bKash'
@@ -736,14 +773,32 @@ class OrderPayment(models.Model):
         CARD = 'card', 'Card'
         COD = 'cod', 'Cash on Delivery'
 
+    class VerificationStatus(models.TextChoices):
+        UNVERIFIED = 'UNVERIFIED', 'Not yet verified'
+        VERIFIED = 'VERIFIED', 'Verified against statement'
+        MISMATCH = 'MISMATCH', 'Amount or sender mismatch'
+        DUPLICATE = 'DUPLICATE', 'Transaction ID used by several orders'
+
     order = models.OneToOneField(Order, on_delete=models.CASCADE, related_name='payment')
     admin_account_number = models.CharField(max_length=50, help_text="Admin's account number for receiving payment", blank=True, null=True)
     sender_number = models.CharField(max_length=50, help_text="Customer's payment number", blank=True, null=True)
-    transaction_id = models.CharField(max_length=100, help_text="Transaction/Reference ID", blank=True, null=True)
+    transaction_id = models.CharField(max_length=100, help_text="Transaction/Reference ID", blank=True, null=True, db_index=True)
     payment_method = models.CharField(max_length=10, choices=PaymentMethod.choices)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Statement reconciliation (python manage.py reconcile_payments)
+    verification_status = models.CharField(
+        max_length=20,
+        choices=VerificationStatus.choices,
+        default=VerificationStatus.UNVERIFIED,
+        db_index=True,
+        help_text="Result of matching this payment against the provider statement"
+    )
+    verified_at = models.DateTimeField(blank=True, null=True)
+    statement_amount = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True, help_text="Amount shown on the provider statement")
+    verification_note = models.CharField(max_length=255, blank=True, null=True)
+
     class Meta:
         verbose_name = "Order Payment"
         verbose_name_plural = "Order Payments"
@@ -797,6 +852,14 @@ class CashOnDelivery(models.Model):
     # Delivery team information
     delivery_person_name = models.CharField(max_length=100, blank=True, null=True, help_text="Name of delivery person")
     delivery_person_phone = models.CharField(max_length=20, blank=True, null=True, help_text="Delivery person contact number")
+    delivery_batch = models.ForeignKey(
+        'DeliveryBatch',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='parcels',
+        help_text="Courier batch this parcel was planned into"
+    )
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
@@ -810,16 +873,30 @@ class CashOnDelivery(models.Model):
         indexes = [
             models.Index(fields=['delivery_status', '-created_at'], name='cod_status_created_idx'),
             models.Index(fields=['scheduled_delivery_date'], name='cod_scheduled_date_idx'),
+            models.Index(fields=['updated_at', 'id'], name='cod_updated_idx'),  # order stream poller
         ]
     
     def __str__(self):
         return f"COD for Order {self.order.order_number} - {self.get_delivery_status_display()}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded status so save() can tell when it changed
+        instance._loaded_delivery_status = instance.__dict__.get('delivery_status')
+        return instance
+
     def save(self, *args, **kwargs):
         # Auto-set amount to collect from order total if not set
         if not self.amount_to_collect and self.order:
             self.amount_to_collect = self.order.total_amount
         super().save(*args, **kwargs)
+
+        if getattr(self, '_loaded_delivery_status', None) != self.delivery_status:
+            self._loaded_delivery_status = self.delivery_status
+            # Push to live order status streams
+            from .order_stream import build_delivery_event, publish_after_commit
+            publish_after_commit(build_delivery_event(self, self.order.order_number))
     
     def is_payment_complete(self):
         """Check if payment has been fully collected"""
@@ -848,12 +925,17 @@ class CashOnDelivery(models.Model):
         if notes:
             self.delivery_notes = notes
         
-        # Update order status and payment status
-        self.order.status = Order.OrderStatus.DELIVERED
-        self.order.payment_status = Order.PaymentStatus.PAID
-        self.order.save()
+        from django.db import transaction
+        from .outbox import enqueue_event
         
-        self.save()
+        with transaction.atomic():
+            # Update order status and payment status
+            self.order.status = Order.OrderStatus.DELIVERED
+            self.order.payment_status = Order.PaymentStatus.PAID
+            self.order.save()
+            
+            self.save()
+            enqueue_event('order.delivered', order=self.order, amount_collected=str(self.amount_collected))
     
     def increment_delivery_attempt(self, notes=None):
         """Increment delivery attempt counter and add notes"""
@@ -862,4 +944,215 @@ class CashOnDelivery(models.Model):
             existing_notes = self.delivery_notes or ""
             timestamp = timezone.now().strftime("%Y-%m-%d %H:%M")
             self.delivery_notes = f"{existing_notes}\n[{timestamp}] Attempt #{self.delivery_attempts}: {notes}".strip()
-        self.save()
+        
+        from django.db import transaction
+        from .outbox import enqueue_event
+        
+        with transaction.atomic():
+            self.save()
+            enqueue_event('cod.delivery_attempted', order=self.order, delivery_attempts=self.delivery_attempts)
+
+class OutboxEvent(models.Model):
+    """
+    Transactional outbox for order side-effects (emails, webhooks, ...).
+    Rows are written in the same transaction as the order change and drained
+    by the `run_outbox_worker` management command, so notification I/O never
+    runs inside a checkout request.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'Pending'
+        PROCESSING = 'PROCESSING', 'Processing'
+        DONE = 'DONE', 'Done'
+        FAILED = 'FAILED', 'Failed'
+
+    event_type = models.CharField(max_length=50, db_index=True, help_text="e.g., order.created, order.payment_confirmed")
+    order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True, blank=True, related_name='outbox_events')
+    payload = models.JSONField(default=dict, blank=True, help_text="Snapshot of the data handlers need")
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now, help_text="Earliest time a worker may pick up this event")
+    locked_by = models.CharField(max_length=64, blank=True, null=True, help_text="Worker that claimed this event")
+    locked_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True, null=True)
+    completed_handlers = models.JSONField(default=list, blank=True, help_text="Handlers that already succeeded; skipped on retry")
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = "Outbox Event"
+        verbose_name_plural = "Outbox Events"
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='outbox_status_available_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} #{self.pk} ({self.get_status_display()})"
+
+
+class DailyOrderRollup(models.Model):
+    """
+    Orders and revenue per day and order status.
+    Derived data: maintained by the outbox worker from order events and
+    rebuilt with `python manage.py rebuild_sales_rollups`.
+    """
+    date = models.DateField(help_text="Order date (local time)")
+    status = models.CharField(max_length=20, choices=Order.OrderStatus.choices)
+    orders_count = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, help_text="Sum of order totals")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['date', 'status']
+        verbose_name = "Daily Order Rollup"
+        verbose_name_plural = "Daily Order Rollups"
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'status'], name='unique_daily_order_rollup'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.status}: {self.orders_count} orders"
+
+
+class DailySalesRollup(models.Model):
+    """
+    Units and item revenue per day x shop x category x order status.
+    `orders_count` counts distinct orders within the row, so an order with items
+    from two categories is counted once in each; that is why per-shop and
+    per-category totals get rows of their own (`grain`) instead of being summed
+    from the shop x category rows.
+    """
+
+    class Grain(models.TextChoices):
+        LINE = 'LINE', 'Shop x category'
+        SHOP = 'SHOP', 'Shop'
+        CATEGORY = 'CATEGORY', 'Category'
+
+    date = models.DateField(help_text="Order date (local time)")
+    grain = models.CharField(
+        max_length=10, choices=Grain.choices, default=Grain.LINE,
+        help_text="What the row is grouped by; SHOP rows have no category, CATEGORY rows no shop",
+    )
+    shop = models.ForeignKey('shops.Shop', on_delete=models.SET_NULL, null=True, blank=True, related_name='sales_rollups')
+    category = models.ForeignKey('products.Category', on_delete=models.SET_NULL, null=True, blank=True, related_name='sales_rollups')
+    status = models.CharField(max_length=20, choices=Order.OrderStatus.choices)
+    orders_count = models.PositiveIntegerField(default=0)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, help_text="Sum of quantity x unit price")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['date']
+        verbose_name = "Daily Sales Rollup"
+        verbose_name_plural = "Daily Sales Rollups"
+        indexes = [
+            models.Index(fields=['date', 'shop'], name='sales_rollup_date_shop_idx'),
+            models.Index(fields=['shop', 'date'], name='sales_rollup_shop_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.grain} shop={self.shop_id} category={self.category_id} {self.status}"
+
+
+class OrderRollupEntry(models.Model):
+    """
+    What one order currently adds to the daily rollups, so an order event only
+    applies the difference instead of re-aggregating the whole day.
+    Written by orders/analytics.py together with the rollup rows.
+    """
+    order = models.OneToOneField(Order, on_delete=models.CASCADE, related_name='rollup_entry')
+    date = models.DateField(db_index=True, help_text="Order date (local time)")
+    status = models.CharField(max_length=20, choices=Order.OrderStatus.choices)
+    total_amount = models.DecimalField(max_digits=12, decimal_places=2)
+    sales_lines = models.JSONField(
+        default=list, blank=True,
+        help_text="Item units and revenue per (shop, category), as counted in DailySalesRollup"
+    )
+
+    class Meta:
+        verbose_name = "Order Rollup Entry"
+        verbose_name_plural = "Order Rollup Entries"
+
+    def __str__(self):
+        return f"{self.date} order={self.order_id} {self.status}"
+
+
+class DeliveryBatch(models.Model):
+    """A courier's run of COD parcels, created by the route batching planner"""
+
+    class BatchStatus(models.TextChoices):
+        PLANNED = 'PLANNED', 'Planned'
+        DISPATCHED = 'DISPATCHED', 'Dispatched'
+        COMPLETED = 'COMPLETED', 'Completed'
+
+    code = models.CharField(max_length=30, unique=True, help_text="e.g., B20250101-01")
+    delivery_date = models.DateField(db_index=True)
+    delivery_person_name = models.CharField(max_length=100)
+    delivery_person_phone = models.CharField(max_length=20, blank=True, null=True)
+    cities = models.CharField(max_length=255, blank=True, help_text="Cities covered by this batch")
+    postal_codes = models.TextField(blank=True, help_text="Postal codes covered, in route order")
+    parcels_count = models.PositiveIntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0, help_text="Cash to collect on this run")
+    status = models.CharField(max_length=20, choices=BatchStatus.choices, default=BatchStatus.PLANNED, db_index=True)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='delivery_batches')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-delivery_date', 'code']
+        verbose_name = "Delivery Batch"
+        verbose_name_plural = "Delivery Batches"
+
+    def __str__(self):
+        return f"{self.code} - {self.delivery_person_name} ({self.parcels_count} parcels)"
+
+
+class ArchivedOrder(models.Model):
+    """
+    Cold-storage copy of a finished order, written by `archive_orders`.
+    Items, updates, payment and COD details live in the `data` snapshot (the
+    order detail API representation), so the row has no foreign keys and can
+    be stored in a separate database (see ORDER_ARCHIVE_DATABASE).
+    """
+    original_id = models.BigIntegerField(unique=True, help_text="Primary key the order had in orders_order")
+    # Not unique: order numbers only carry the time of day, and older ones were reused
+    order_number = models.CharField(max_length=50, db_index=True)
+    user_id = models.BigIntegerField(null=True, blank=True, db_index=True)
+    customer_name = models.CharField(max_length=100)
+    customer_email = models.EmailField(db_index=True)
+    customer_phone = models.CharField(max_length=50)
+    status = models.CharField(max_length=20, choices=Order.OrderStatus.choices)
+    payment_status = models.CharField(max_length=20, choices=Order.PaymentStatus.choices)
+    total_amount = models.DecimalField(max_digits=12, decimal_places=2)
+    ordered_at = models.DateTimeField(db_index=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    data = models.JSONField(encoder=DjangoJSONEncoder, help_text="Order detail snapshot (items, updates, payment, COD)")
+    sales_lines = models.JSONField(
+        default=list, blank=True,
+        help_text="Per shop/category units and revenue, so sales rollups can still include this order"
+    )
+
+    class Meta:
+        ordering = ['-ordered_at']
+        verbose_name = "Archived Order"
+        verbose_name_plural = "Archived Orders"
+
+    def __str__(self):
+        return f"{self.order_number} (archived)"
+
+
+class OrderLookupToken(models.Model):
+    """Normalized search token for staff order lookup (see orders/lookup.py)"""
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='lookup_tokens')
+    token = models.CharField(max_length=100)
+
+    class Meta:
+        verbose_name = "Order Lookup Token"
+        verbose_name_plural = "Order Lookup Tokens"
+        constraints = [
+            # Also the index behind exact and prefix (range) lookups
+            models.UniqueConstraint(fields=['token', 'order'], name='order_lookup_token_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.token} -> {self.order_id}"
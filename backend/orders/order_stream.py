@@ -0,0 +1,222 @@
+# orders/order_stream.py
+"""
+In-process pub/sub feeding the order status SSE endpoints.
+
+Writes made in this process (OrderUpdate / CashOnDelivery saves) are published
+directly once their transaction commits. Writes made elsewhere (other server
+processes, the outbox worker, the shell) are picked up by a single DB poller
+per process that only runs while somebody is listening, so the cost is a
+couple of cheap queries per poll interval no matter how many clients watch.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+QUEUE_CHANNEL = 'queue'
+SUBSCRIBER_QUEUE_SIZE = 100
+RECENT_EVENTS_LIMIT = 5000
+POLL_BATCH_SIZE = 500  # rows read per table per poll
+# Delivery statuses after which an order's status is not remembered any more
+FINAL_DELIVERY_STATUSES = {'DELIVERED', 'RETURNED'}
+
+
+def order_channel(order_id):
+    return f"order:{order_id}"
+
+
+def build_update_event(update, order_number=None):
+    return {
+        'type': 'order_update',
+        'id': f"u{update.pk}",
+        'order_id': str(update.order_id),
+        'order_number': order_number,
+        'status': update.status,
+        'notes': update.notes,
+        'timestamp': update.timestamp.isoformat() if update.timestamp else None,
+    }
+
+
+def build_delivery_event(cod, order_number=None):
+    return {
+        'type': 'delivery_status',
+        'id': f"d{cod.pk}-{cod.updated_at.timestamp() if cod.updated_at else ''}",
+        'order_id': str(cod.order_id),
+        'order_number': order_number,
+        'delivery_status': cod.delivery_status,
+        'delivery_attempts': cod.delivery_attempts,
+        'updated_at': cod.updated_at.isoformat() if cod.updated_at else None,
+    }
+
+
+def format_sse(event):
+    """Serialize an event dict into an SSE frame"""
+    return (
+        f"id: {event['id']}\n"
+        f"event: {event['type']}\n"
+        f"data: {json.dumps(event, default=str)}\n\n"
+    )
+
+
+class OrderStreamHub:
+    """
+    Fan-out of order events to asyncio queues.
+    `publish` is thread-safe and can be called from sync code (views, admin).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+        self._recent = OrderedDict()
+        self._delivery_status = OrderedDict()  # order id -> (delivery status, published at), oldest first
+        self._poller = None
+        self._update_cursor = None
+        self._cod_cursor = None  # (updated_at, id) of the last COD row seen
+
+    def subscribe(self, channel):
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers[channel].add((loop, queue))
+        self._ensure_poller(loop)
+        return queue
+
+    def unsubscribe(self, channel, queue):
+        with self._lock:
+            subscribers = self._subscribers.get(channel, set())
+            for entry in [entry for entry in subscribers if entry[1] is queue]:
+                subscribers.discard(entry)
+            if not subscribers:
+                self._subscribers.pop(channel, None)
+
+    def has_subscribers(self):
+        with self._lock:
+            return any(self._subscribers.values())
+
+    def publish(self, event):
+        """Deliver an event to the order's watchers and the admin queue (once per event id)"""
+        with self._lock:
+            if event['id'] in self._recent:
+                return
+            self._recent[event['id']] = True
+            if len(self._recent) > RECENT_EVENTS_LIMIT:
+                self._recent.popitem(last=False)
+            if event['type'] == 'delivery_status':
+                self._remember_delivery_status(event['order_id'], event['delivery_status'])
+
+            targets = list(self._subscribers.get(order_channel(event['order_id']), ()))
+            targets += list(self._subscribers.get(QUEUE_CHANNEL, ()))
+
+        for loop, queue in targets:
+            try:
+                loop.call_soon_threadsafe(self._put, queue, event)
+            except RuntimeError:
+                # Loop already closed; the subscriber is gone
+                pass
+
+    def _remember_delivery_status(self, order_id, delivery_status):
+        """Keep the last published status per order (caller holds the lock), until it is final or expires"""
+        now = time.monotonic()
+        self._delivery_status.pop(order_id, None)
+        if delivery_status not in FINAL_DELIVERY_STATUSES:
+            self._delivery_status[order_id] = (delivery_status, now)
+        expired = now - settings.ORDER_STREAM_STATUS_TTL
+        while self._delivery_status:
+            oldest_id, (_, published_at) = next(iter(self._delivery_status.items()))
+            if published_at >= expired:
+                break
+            del self._delivery_status[oldest_id]
+
+    def _published_delivery_status(self, order_id):
+        with self._lock:
+            entry = self._delivery_status.get(order_id)
+        return entry[0] if entry else None
+
+    @staticmethod
+    def _put(queue, event):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Slow consumer: drop the event, the client resyncs on reconnect
+            logger.warning(f"Order stream subscriber queue full, dropping event {event['id']}")
+
+    # ------------------------------------------------------------------
+    # DB polling fallback
+    # ------------------------------------------------------------------
+
+    def _ensure_poller(self, loop):
+        if self._poller is None or self._poller.done():
+            self._poller = loop.create_task(self._poll_forever())
+
+    async def _poll_forever(self):
+        interval = settings.ORDER_STREAM_POLL_INTERVAL
+        try:
+            while self.has_subscribers():
+                try:
+                    events = await sync_to_async(self._poll_changes, thread_sensitive=False)()
+                    for event in events:
+                        self.publish(event)
+                except Exception as e:
+                    logger.error(f"Order stream poll failed: {e}")
+                await asyncio.sleep(interval)
+        finally:
+            # Start from "now" again next time instead of replaying the gap
+            self._poller = None
+            self._update_cursor = None
+            self._cod_cursor = None
+
+    def _poll_changes(self):
+        """Return events for OrderUpdate rows / COD status changes since the last poll"""
+        from django.db import close_old_connections
+        from .models import CashOnDelivery, OrderUpdate
+
+        close_old_connections()
+        now = timezone.now()
+        if self._update_cursor is None:
+            # First poll only sets the cursors; clients get their initial
+            # state from the snapshot sent on connect.
+            self._update_cursor = OrderUpdate.objects.order_by('-id').values_list('id', flat=True).first() or 0
+            self._cod_cursor = (now, 0)
+            return []
+
+        events = []
+        updates = (
+            OrderUpdate.objects.filter(id__gt=self._update_cursor)
+            .select_related('order').order_by('id')[:POLL_BATCH_SIZE]
+        )
+        for update in updates:
+            events.append(build_update_event(update, update.order.order_number))
+            self._update_cursor = update.pk
+
+        # Keyset on (updated_at, id): bulk updates stamp many rows with the same time
+        cursor_at, cursor_id = self._cod_cursor
+        cods = (
+            CashOnDelivery.objects.filter(Q(updated_at__gt=cursor_at) | Q(updated_at=cursor_at, pk__gt=cursor_id))
+            .select_related('order').order_by('updated_at', 'pk')[:POLL_BATCH_SIZE]
+        )
+        for cod in cods:
+            self._cod_cursor = (cod.updated_at, cod.pk)
+            # Already published by this process (forgotten ones are still deduplicated by event id)
+            if self._published_delivery_status(str(cod.order_id)) == cod.delivery_status:
+                continue
+            events.append(build_delivery_event(cod, cod.order.order_number))
+        return events
+
+
+hub = OrderStreamHub()
+
+
+def publish_after_commit(event):
+    """Publish once the surrounding transaction commits (immediately in autocommit)"""
+    from django.db import transaction
+
+    transaction.on_commit(lambda: hub.publish(event))
@@ -0,0 +1,272 @@
+# orders/outbox.py
+"""
+Transactional outbox for order side-effects.
+
+Call `enqueue_event` inside the same transaction that changes the order; the
+event only becomes visible to the worker once that transaction commits.
+`python manage.py run_outbox_worker` claims pending events and dispatches
+them to the handlers registered below with `register_handler`.
+"""
+import logging
+import random
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db.models import F, Q
+from django.urls import reverse
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_handlers = defaultdict(list)
+
+
+def register_handler(*event_types):
+    """
+    Register a handler for one or more event types. Use '*' to receive every event.
+    Handlers get the OutboxEvent instance and should raise on failure so the
+    event is retried.
+    """
+    def decorator(func):
+        for event_type in event_types:
+            _handlers[event_type].append(func)
+        return func
+    return decorator
+
+
+def get_handlers(event_type):
+    return _handlers.get(event_type, []) + _handlers.get('*', [])
+
+
+def build_order_payload(order, **extra):
+    """Snapshot of the order fields most handlers need"""
+    payload = {
+        'order_number': order.order_number,
+        'status': order.status,
+        'payment_status': order.payment_status,
+        'total_amount': str(order.total_amount),
+        'customer_name': order.customer_name,
+        'customer_email': order.customer_email,
+    }
+    payload.update(extra)
+    return payload
+
+
+def enqueue_event(event_type, order=None, **payload):
+    """Write a single outbox event (call inside the order's transaction)"""
+    from .models import OutboxEvent
+
+    if order is not None:
+        payload = build_order_payload(order, **payload)
+    return OutboxEvent.objects.create(event_type=event_type, order=order, payload=payload)
+
+
+def enqueue_events(event_type, orders, **payload):
+    """Write one outbox event per order with a single INSERT"""
+    from .models import OutboxEvent
+
+    return OutboxEvent.objects.bulk_create([
+        OutboxEvent(event_type=event_type, order=order, payload=build_order_payload(order, **payload))
+        for order in orders
+    ])
+
+
+def claim_events(batch_size=50, worker_id=None):
+    """
+    Claim up to `batch_size` due events for this worker and return their ids.
+    Events stuck in PROCESSING longer than OUTBOX_LOCK_TIMEOUT (crashed worker)
+    are claimed again.
+    """
+    from .models import OutboxEvent
+
+    worker_id = worker_id or uuid.uuid4().hex
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=settings.OUTBOX_LOCK_TIMEOUT)
+    claimable = (
+        Q(status=OutboxEvent.Status.PENDING, available_at__lte=now) |
+        Q(status=OutboxEvent.Status.PROCESSING, locked_at__lt=stale_before)
+    )
+
+    candidate_ids = list(
+        OutboxEvent.objects.filter(claimable).order_by('id').values_list('id', flat=True)[:batch_size]
+    )
+    if not candidate_ids:
+        return []
+
+    # The status condition is re-checked in the UPDATE so two workers can never
+    # claim the same row.
+    OutboxEvent.objects.filter(claimable, id__in=candidate_ids).update(
+        status=OutboxEvent.Status.PROCESSING,
+        locked_by=worker_id,
+        locked_at=now,
+        attempts=F('attempts') + 1,
+    )
+    return list(
+        OutboxEvent.objects.filter(
+            id__in=candidate_ids, locked_by=worker_id, locked_at=now
+        ).values_list('id', flat=True)
+    )
+
+
+def get_retry_delay(attempts):
+    """Exponential backoff with jitter, capped at OUTBOX_BACKOFF_MAX seconds"""
+    delay = min(settings.OUTBOX_BACKOFF_BASE * (2 ** max(attempts - 1, 0)), settings.OUTBOX_BACKOFF_MAX)
+    return delay + random.uniform(0, delay * 0.1)
+
+
+def handler_name(handler):
+    return f"{handler.__module__}.{handler.__qualname__}"
+
+
+def mark_completed(event, key):
+    """
+    Record that a handler (or one step of it, e.g. one webhook URL) succeeded,
+    so a retry of the event skips it
+    """
+    from .models import OutboxEvent
+
+    event.completed_handlers = [*(event.completed_handlers or []), key]
+    OutboxEvent.objects.filter(pk=event.pk).update(completed_handlers=event.completed_handlers)
+
+
+def process_event(event_id):
+    """
+    Dispatch one claimed event to its handlers.
+    Handlers that succeeded on an earlier attempt are skipped, so a failing
+    webhook never resends the customer email. Returns the resulting status.
+    """
+    from .models import OutboxEvent
+
+    event = OutboxEvent.objects.select_related('order').get(pk=event_id)
+    try:
+        for handler in get_handlers(event.event_type):
+            name = handler_name(handler)
+            if name in (event.completed_handlers or []):
+                continue
+            handler(event)
+            mark_completed(event, name)
+    except Exception as e:
+        logger.warning(f"Outbox event {event.pk} ({event.event_type}) failed on attempt {event.attempts}: {e}")
+        if event.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+            status = OutboxEvent.Status.FAILED
+            available_at = event.available_at
+        else:
+            status = OutboxEvent.Status.PENDING
+            available_at = timezone.now() + timedelta(seconds=get_retry_delay(event.attempts))
+        OutboxEvent.objects.filter(pk=event.pk).update(
+            status=status,
+            available_at=available_at,
+            locked_by=None,
+            locked_at=None,
+            last_error=str(e)[:2000],
+        )
+        return status
+
+    OutboxEvent.objects.filter(pk=event.pk).update(
+        status=OutboxEvent.Status.DONE,
+        locked_by=None,
+        locked_at=None,
+        last_error=None,
+        processed_at=timezone.now(),
+    )
+    return OutboxEvent.Status.DONE
+
+
+# ---------------------------------------------------------------------------
+# Handlers
+# ---------------------------------------------------------------------------
+
+ORDER_EMAIL_SUBJECTS = {
+    'order.created': 'Your order {order_number} has been received',
+    'order.payment_confirmed': 'Payment confirmed for order {order_number}',
+    'order.payment_verified': 'Payment received for order {order_number}',
+    'order.delivered': 'Your order {order_number} has been delivered',
+}
+
+
+@register_handler(*ORDER_EMAIL_SUBJECTS.keys())
+def send_order_email(event):
+    """Send the customer notification email for an order event"""
+    payload = event.payload
+    recipient = payload.get('customer_email')
+    if not recipient:
+        return
+
+    subject = ORDER_EMAIL_SUBJECTS[event.event_type].format(order_number=payload.get('order_number'))
+    lines = [
+        f"Hello {payload.get('customer_name') or 'there'},",
+        "",
+        f"Order number: {payload.get('order_number')}",
+        f"Order status: {payload.get('status')}",
+        f"Payment status: {payload.get('payment_status')}",
+        f"Total amount: {payload.get('total_amount')} BDT",
+    ]
+    if payload.get('notes'):
+        lines.extend(["", payload['notes']])
+    send_mail(subject, "\n".join(lines), settings.DEFAULT_FROM_EMAIL, [recipient])
+
+
+# Events that are internal jobs rather than order notifications
+INTERNAL_EVENT_PREFIXES = ('export.',)
+
+
+@register_handler('*')
+def post_order_webhook(event):
+    """POST every order event to the configured webhook URLs (each URL once, also across retries)"""
+    if event.event_type.startswith(INTERNAL_EVENT_PREFIXES):
+        return
+    body = {
+        'id': event.pk,
+        'event': event.event_type,
+        'created_at': event.created_at.isoformat(),
+        'data': event.payload,
+    }
+    for url in settings.OUTBOX_WEBHOOK_URLS:
+        key = f"{handler_name(post_order_webhook)}:{url}"
+        if key in (event.completed_handlers or []):
+            continue
+        response = requests.post(url, json=body, timeout=settings.OUTBOX_WEBHOOK_TIMEOUT)
+        response.raise_for_status()
+        mark_completed(event, key)
+
+
+@register_handler('order.created', 'order.status_changed', 'order.payment_confirmed', 'order.delivered')
+def refresh_sales_rollups(event):
+    """Apply the order's change to the daily sales rollups"""
+    from .analytics import refresh_order
+
+    if event.order_id is None:
+        return
+    refresh_order(event.order_id)
+
+
+@register_handler('export.requested')
+def generate_export_file(event):
+    """Write a requested order export to ORDER_EXPORT_DIR and email the admin download link"""
+    from datetime import date
+    from .exports import write_export_file
+
+    payload = event.payload
+    name, rows = write_export_file(
+        payload['kind'],
+        payload['format'],
+        start=date.fromisoformat(payload['start']) if payload.get('start') else None,
+        end=date.fromisoformat(payload['end']) if payload.get('end') else None,
+        status=payload.get('status'),
+        payment_status=payload.get('payment_status'),
+    )
+    event.payload = {**payload, 'file': name, 'rows': rows}
+    event.save(update_fields=['payload'])
+
+    if payload.get('requested_by'):
+        url = settings.ADMIN_SITE_URL.rstrip('/') + reverse('admin:orders_order_export_download', args=[name])
+        send_mail(
+            f"Your {payload['kind']} export is ready",
+            f"{rows} rows exported.\n\nDownload (admin sign-in required): {url}",
+            settings.DEFAULT_FROM_EMAIL,
+            [payload['requested_by']],
+        )
@@ -0,0 +1,252 @@
+# orders/reconciliation.py
+"""
+Reconcile customer-entered mobile payments against a provider statement.
+
+The statement (bKash / Nagad / Rocket merchant CSV export) is streamed row by
+row and hash-joined on transaction ID against the unverified OrderPayment rows,
+which are loaded once into a dict. Results are written with one bulk_update
+for the payments and one set-based UPDATE for the orders, so a 100k-line
+statement reconciles in seconds.
+"""
+import csv
+import logging
+import re
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Statement header aliases (lower-cased, spaces/underscores collapsed)
+COLUMN_ALIASES = {
+    'transaction_id': ('trxid', 'trx id', 'trx_id', 'transaction id', 'transaction_id', 'txnid', 'txn id', 'txn_id', 'transaction reference'),
+    'amount': ('amount', 'transaction amount', 'amount (bdt)', 'credit', 'credit amount'),
+    'sender': ('sender', 'sender number', 'from', 'from account', 'customer number', 'customer account', 'msisdn', 'account'),
+    'date': ('date', 'time', 'date time', 'datetime', 'transaction date', 'transaction time'),
+}
+
+PROVIDER_METHODS = {
+    'bkash': ['bkash'],
+    'nagad': ['nagad'],
+    'rocket': ['rocket'],
+    'all': ['bkash', 'nagad', 'rocket'],
+}
+
+SAMPLE_LIMIT = 50  # rows listed per category in the report
+
+
+class StatementFormatError(ValueError):
+    pass
+
+
+def normalize_transaction_id(value):
+    return re.sub(r'\s+', '', value or '').upper()
+
+
+def normalize_phone(value):
+    """Compare phone numbers on their last 10 digits (drops +880 / 0 prefixes)"""
+    digits = re.sub(r'\D', '', value or '')
+    return digits[-10:]
+
+
+def _normalize_header(value):
+    return re.sub(r'[\s_]+', ' ', (value or '').strip().lower())
+
+
+def _map_columns(header):
+    normalized = [_normalize_header(column) for column in header]
+    columns = {}
+    for key, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in normalized:
+                columns[key] = normalized.index(alias)
+                break
+    missing = [key for key in ('transaction_id', 'amount') if key not in columns]
+    if missing:
+        raise StatementFormatError(
+            f"Statement is missing required column(s): {', '.join(missing)}. Found: {', '.join(header)}"
+        )
+    return columns
+
+
+def iter_statement(lines):
+    """
+    Stream (line_number, transaction_id, amount, sender) tuples from statement lines.
+    Rows with an unreadable amount are yielded with amount=None; a NaN or
+    infinite amount means a broken export and raises StatementFormatError.
+    """
+    reader = csv.reader(lines)
+    columns = None
+    for line_number, row in enumerate(reader, start=1):
+        if not row or not any(cell.strip() for cell in row):
+            continue
+        if columns is None:
+            columns = _map_columns(row)
+            continue
+
+        def cell(key):
+            index = columns.get(key)
+            return row[index].strip() if index is not None and index < len(row) else ''
+
+        transaction_id = normalize_transaction_id(cell('transaction_id'))
+        if not transaction_id:
+            continue
+        try:
+            amount = Decimal(cell('amount').replace(',', ''))
+        except InvalidOperation:
+            amount = None
+        if amount is not None and not amount.is_finite():
+            raise StatementFormatError(f"Line {line_number}: amount {cell('amount')!r} is not a number")
+        yield line_number, transaction_id, amount, cell('sender')
+
+    if columns is None:
+        raise StatementFormatError('Statement file is empty')
+
+
+def load_unverified_payments(provider='all'):
+    """
+    Build the in-memory side of the join: {transaction_id: [payment dict, ...]}.
+    More than one payment per key means several orders claim the same transaction.
+    """
+    from .models import OrderPayment
+
+    payments = defaultdict(list)
+    queryset = OrderPayment.objects.filter(
+        payment_method__in=PROVIDER_METHODS[provider],
+        transaction_id__isnull=False,
+    ).exclude(
+        verification_status=OrderPayment.VerificationStatus.VERIFIED,
+    ).values(
+        'id', 'order_id', 'order__order_number', 'order__total_amount', 'order__payment_status',
+        'transaction_id', 'sender_number',
+    )
+    for row in queryset.iterator(chunk_size=5000):
+        key = normalize_transaction_id(row['transaction_id'])
+        if key:
+            payments[key].append(row)
+    return payments
+
+
+def reconcile_statement(lines, provider='all', dry_run=False):
+    """
+    Reconcile a statement against unverified payments and return a report dict.
+    With dry_run nothing is written.
+    """
+    from .models import Order, OrderPayment
+    from .outbox import enqueue_events
+
+    tolerance = Decimal(str(settings.PAYMENT_RECONCILIATION_TOLERANCE))
+    payments = load_unverified_payments(provider)
+    now = timezone.now()
+
+    seen = {}
+    statement_rows = 0
+    unmatched_statement = 0
+    duplicate_statement_count = 0
+    report = defaultdict(list)
+    updates = {}
+
+    for line_number, transaction_id, amount, sender in iter_statement(lines):
+        statement_rows += 1
+        if transaction_id in seen:
+            duplicate_statement_count += 1
+            if len(report['duplicate_statement_rows']) < SAMPLE_LIMIT:
+                report['duplicate_statement_rows'].append({
+                    'line': line_number, 'first_line': seen[transaction_id], 'transaction_id': transaction_id,
+                })
+            continue
+        seen[transaction_id] = line_number
+
+        claims = payments.get(transaction_id)
+        if not claims:
+            unmatched_statement += 1
+            continue
+
+        if len(claims) > 1:
+            for claim in claims:
+                updates[claim['id']] = (OrderPayment.VerificationStatus.DUPLICATE, amount, 'Transaction ID claimed by several orders')
+            report['duplicate_claims'].append({
+                'transaction_id': transaction_id,
+                'order_numbers': [claim['order__order_number'] for claim in claims],
+            })
+            continue
+
+        claim = claims[0]
+        problems = []
+        if amount is None:
+            problems.append('unreadable amount on statement')
+        elif abs(amount - claim['order__total_amount']) > tolerance:
+            problems.append(f"amount {amount} != order total {claim['order__total_amount']}")
+        if sender and claim['sender_number'] and normalize_phone(sender) != normalize_phone(claim['sender_number']):
+            problems.append(f"sender {sender} != {claim['sender_number']}")
+
+        if problems:
+            updates[claim['id']] = (OrderPayment.VerificationStatus.MISMATCH, amount, '; '.join(problems)[:255])
+            report['mismatches'].append({
+                'line': line_number,
+                'order_number': claim['order__order_number'],
+                'transaction_id': transaction_id,
+                'problems': problems,
+            })
+        else:
+            updates[claim['id']] = (OrderPayment.VerificationStatus.VERIFIED, amount, None)
+            report['matched'].append(claim)
+
+    unmatched_payments = [
+        {'order_number': claim['order__order_number'], 'transaction_id': key}
+        for key, claims in payments.items() if key not in seen
+        for claim in claims
+    ]
+
+    matched = report.pop('matched', [])
+    newly_paid_order_ids = [
+        claim['order_id'] for claim in matched if claim['order__payment_status'] != Order.PaymentStatus.PAID
+    ]
+
+    if not dry_run and updates:
+        payment_objects = []
+        for payment_id, (verification_status, amount, note) in updates.items():
+            payment_objects.append(OrderPayment(
+                id=payment_id,
+                verification_status=verification_status,
+                statement_amount=amount,
+                verification_note=note,
+                verified_at=now if verification_status == OrderPayment.VerificationStatus.VERIFIED else None,
+                updated_at=now,
+            ))
+        with transaction.atomic():
+            OrderPayment.objects.bulk_update(
+                payment_objects,
+                ['verification_status', 'statement_amount', 'verification_note', 'verified_at', 'updated_at'],
+                batch_size=1000,
+            )
+            if newly_paid_order_ids:
+                Order.objects.filter(pk__in=newly_paid_order_ids).update(payment_status=Order.PaymentStatus.PAID)
+            if matched:
+                verified_orders = Order.objects.filter(pk__in=[claim['order_id'] for claim in matched])
+                enqueue_events('order.payment_verified', verified_orders)
+
+    summary = {
+        'statement_rows': statement_rows,
+        'payments_checked': sum(len(claims) for claims in payments.values()),
+        'matched': len(matched),
+        'orders_marked_paid': len(newly_paid_order_ids),
+        'mismatches': len(report['mismatches']),
+        'duplicate_claims': len(report['duplicate_claims']),
+        'duplicate_statement_rows': duplicate_statement_count,
+        'unmatched_statement_rows': unmatched_statement,
+        'unmatched_payments': len(unmatched_payments),
+        'dry_run': dry_run,
+    }
+    logger.info(f"Payment reconciliation ({provider}): {summary}")
+    return {
+        'summary': summary,
+        'matched_orders': [claim['order__order_number'] for claim in matched[:SAMPLE_LIMIT]],
+        'mismatches': report['mismatches'][:SAMPLE_LIMIT],
+        'duplicate_claims': report['duplicate_claims'][:SAMPLE_LIMIT],
+        'duplicate_statement_rows': report['duplicate_statement_rows'],
+        'unmatched_payments': unmatched_payments[:SAMPLE_LIMIT],
+    }
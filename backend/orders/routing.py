@@ -0,0 +1,276 @@
+# orders/routing.py
+"""
+Courier route batching for pending Cash on Delivery parcels.
+
+Parcels are clustered by delivery zone (city + postal code, taken from the
+delivery address, falling back to the shipping address). Zones are then
+packed onto couriers largest-first, always onto the least loaded courier
+(LPT scheduling with a heap), preferring a courier already working the same
+city while that keeps the load within the balance tolerance. Zones bigger than
+a courier's share are split. Everything runs on one `values()` query plus
+O(n log k) work in Python, so thousands of parcels plan in milliseconds.
+"""
+import heapq
+import logging
+import math
+import re
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# A courier may take this much more than an even share to stay in one city
+BALANCE_TOLERANCE = 0.15
+# Times create_batches picks new codes when a concurrent planner took the same ones
+CODE_ATTEMPTS = 5
+
+
+def _postal_sort_key(postal_code):
+    """Numeric postal codes sort numerically, so neighbouring zones stay adjacent"""
+    digits = re.sub(r'\D', '', postal_code or '')
+    return (0, int(digits), postal_code) if digits else (1, 0, postal_code or '')
+
+
+def load_pending_parcels(delivery_date=None, city=None):
+    """Pending, unbatched COD parcels due on or before `delivery_date`, as plain dicts"""
+    from .models import CashOnDelivery
+
+    queryset = CashOnDelivery.objects.filter(
+        delivery_status=CashOnDelivery.DeliveryStatus.PENDING,
+        delivery_batch__isnull=True,
+    )
+    if delivery_date:
+        queryset = queryset.filter(
+            Q(scheduled_delivery_date__isnull=True) | Q(scheduled_delivery_date__lte=delivery_date)
+        )
+
+    parcels = []
+    for row in queryset.values(
+        'id', 'amount_to_collect', 'scheduled_delivery_date', 'order__order_number',
+        'order__delivery_address__city', 'order__delivery_address__postal_code',
+        'order__shipping_address__city', 'order__shipping_address__postal_code',
+    ).iterator(chunk_size=2000):
+        parcel_city = row['order__delivery_address__city'] or row['order__shipping_address__city'] or ''
+        postal_code = row['order__delivery_address__postal_code'] or row['order__shipping_address__postal_code'] or ''
+        parcel_city = parcel_city.strip().title()
+        if city and parcel_city.lower() != city.strip().lower():
+            continue
+        parcels.append({
+            'id': row['id'],
+            'order_number': row['order__order_number'],
+            'amount': row['amount_to_collect'] or Decimal('0'),
+            'scheduled_delivery_date': row['scheduled_delivery_date'],
+            'city': parcel_city or 'Unknown',
+            'postal_code': postal_code.strip(),
+        })
+    return parcels
+
+
+def _build_zones(parcels):
+    """Group parcels into (city, postal_code) zones, overdue parcels first within a zone"""
+    zones = defaultdict(list)
+    for parcel in parcels:
+        zones[(parcel['city'], parcel['postal_code'])].append(parcel)
+    for zone_parcels in zones.values():
+        zone_parcels.sort(key=lambda parcel: (parcel['scheduled_delivery_date'] is None, parcel['scheduled_delivery_date'] or 0))
+    return zones
+
+
+def plan_batches(couriers, parcels, max_parcels=None, max_amount=None):
+    """
+    Pack parcels onto couriers.
+    couriers: list of {'name': ..., 'phone': ...}
+    Returns (batches, unassigned) where each batch is
+    {'courier': {...}, 'parcels': [...], 'cities': [...], 'postal_codes': [...], 'total_amount': Decimal}
+    """
+    if max_parcels is not None and max_parcels < 1:
+        raise ValueError("max_parcels must be at least 1")
+    if not couriers:
+        return [], list(parcels)
+
+    courier_count = len(couriers)
+    share = math.ceil(len(parcels) / courier_count) if parcels else 0
+    capacity = min(share, max_parcels) if max_parcels else share
+    soft_limit = max(capacity, math.floor(share * (1 + BALANCE_TOLERANCE)))
+    slack = math.ceil(share * BALANCE_TOLERANCE)
+    if max_parcels:
+        soft_limit = min(soft_limit, max_parcels)
+
+    zones = _build_zones(parcels)
+
+    # Split zones bigger than a courier's share so they can be balanced
+    pieces = []
+    for (zone_city, postal_code), zone_parcels in zones.items():
+        for start in range(0, len(zone_parcels), max(capacity, 1)):
+            pieces.append((zone_city, postal_code, zone_parcels[start:start + max(capacity, 1)]))
+    # Largest first (LPT); ties keep neighbouring postal codes together
+    pieces.sort(key=lambda piece: (-len(piece[2]), piece[0], _postal_sort_key(piece[1])))
+
+    batches = [
+        {'courier': courier, 'parcels': [], 'cities': set(), 'postal_codes': [], 'total_amount': Decimal('0')}
+        for courier in couriers
+    ]
+    heap = [(0, index) for index in range(courier_count)]
+    city_couriers = defaultdict(set)
+    unassigned = []
+
+    def fits(batch, piece_parcels):
+        if max_parcels and len(batch['parcels']) + len(piece_parcels) > max_parcels:
+            return False
+        if max_amount is not None:
+            piece_amount = sum(parcel['amount'] for parcel in piece_parcels)
+            if batch['total_amount'] + piece_amount > max_amount:
+                return False
+        return True
+
+    for zone_city, postal_code, piece_parcels in pieces:
+        # Prefer a courier already in this city if it stays within tolerance
+        # and is not already well ahead of the least loaded courier
+        chosen = None
+        min_load = min(len(batch['parcels']) for batch in batches)
+        for index in sorted(city_couriers[zone_city], key=lambda i: len(batches[i]['parcels'])):
+            batch = batches[index]
+            if (
+                len(batch['parcels']) + len(piece_parcels) <= soft_limit
+                and len(batch['parcels']) <= min_load + slack
+                and fits(batch, piece_parcels)
+            ):
+                chosen = index
+                break
+
+        if chosen is None:
+            # Least loaded courier that can take the piece
+            skipped = []
+            while heap:
+                load, index = heapq.heappop(heap)
+                if load != len(batches[index]['parcels']):
+                    continue  # stale heap entry
+                skipped.append((load, index))
+                if fits(batches[index], piece_parcels):
+                    chosen = index
+                    break
+            for entry in skipped:
+                if entry[1] != chosen:
+                    heapq.heappush(heap, entry)
+
+        if chosen is None:
+            unassigned.extend(piece_parcels)
+            continue
+
+        batch = batches[chosen]
+        batch['parcels'].extend(piece_parcels)
+        batch['cities'].add(zone_city)
+        batch['postal_codes'].append(postal_code)
+        batch['total_amount'] += sum(parcel['amount'] for parcel in piece_parcels)
+        city_couriers[zone_city].add(chosen)
+        heapq.heappush(heap, (len(batch['parcels']), chosen))
+
+    for batch in batches:
+        batch['cities'] = sorted(batch['cities'])
+        # Route order: walk the postal codes in sequence
+        batch['postal_codes'] = sorted(set(batch['postal_codes']), key=_postal_sort_key)
+        batch['parcels'].sort(key=lambda parcel: (parcel['city'], _postal_sort_key(parcel['postal_code'])))
+
+    return [batch for batch in batches if batch['parcels']], unassigned
+
+
+def _insert_batches(batches, delivery_date, created_by):
+    """
+    INSERT the batches with the next free codes of the day (B20250101-01, -02, ...).
+    Codes come from the highest one taken, so two planners running at once can
+    pick the same ones: the loser's INSERT hits the unique code and is retried
+    (in a savepoint) with fresh codes.
+    """
+    from .models import DeliveryBatch
+
+    prefix = f"B{delivery_date.strftime('%Y%m%d')}"
+    for attempt in range(1, CODE_ATTEMPTS + 1):
+        existing = max(
+            (int(code.rsplit('-', 1)[-1]) for code in
+             DeliveryBatch.objects.filter(code__startswith=f"{prefix}-").values_list('code', flat=True)
+             if code.rsplit('-', 1)[-1].isdigit()),
+            default=0,
+        )
+        try:
+            with transaction.atomic():
+                return DeliveryBatch.objects.bulk_create([
+                    DeliveryBatch(
+                        code=f"{prefix}-{existing + position:02d}",
+                        delivery_date=delivery_date,
+                        delivery_person_name=batch['courier']['name'],
+                        delivery_person_phone=batch['courier'].get('phone') or None,
+                        cities=', '.join(batch['cities'])[:255],
+                        postal_codes=', '.join(code for code in batch['postal_codes'] if code),
+                        parcels_count=len(batch['parcels']),
+                        total_amount=batch['total_amount'],
+                        created_by=created_by,
+                    )
+                    for position, batch in enumerate(batches, start=1)
+                ])
+        except IntegrityError:
+            if attempt == CODE_ATTEMPTS:
+                raise
+            logger.warning(f"Delivery batch codes for {delivery_date} were taken concurrently, retrying ({attempt})")
+
+
+def create_batches(batches, delivery_date, created_by=None):
+    """
+    Persist planned batches and bulk-assign the courier to their parcels.
+    One INSERT for the batches and one UPDATE per batch, in one transaction.
+    """
+    from .models import CashOnDelivery
+    from .outbox import enqueue_events
+
+    now = timezone.now()
+
+    with transaction.atomic():
+        batch_objects = _insert_batches(batches, delivery_date, created_by)
+
+        assigned = 0
+        for batch_object, batch in zip(batch_objects, batches):
+            parcel_ids = [parcel['id'] for parcel in batch['parcels']]
+            # Only parcels that are still pending and unbatched are claimed
+            assigned += CashOnDelivery.objects.filter(
+                pk__in=parcel_ids,
+                delivery_status=CashOnDelivery.DeliveryStatus.PENDING,
+                delivery_batch__isnull=True,
+            ).update(
+                delivery_batch=batch_object,
+                delivery_person_name=batch_object.delivery_person_name,
+                delivery_person_phone=batch_object.delivery_person_phone,
+                scheduled_delivery_date=delivery_date,
+                updated_at=now,
+            )
+
+        orders = [
+            cod.order for cod in
+            CashOnDelivery.objects.filter(delivery_batch__in=batch_objects).select_related('order')
+        ]
+        enqueue_events('cod.batched', orders, delivery_date=delivery_date.isoformat())
+
+    logger.info(f"Created {len(batch_objects)} delivery batches for {delivery_date} ({assigned} parcels)")
+    return batch_objects, assigned
+
+
+def serialize_plan(batches, unassigned):
+    """JSON-friendly view of a plan"""
+    return {
+        'batches': [
+            {
+                'delivery_person_name': batch['courier']['name'],
+                'delivery_person_phone': batch['courier'].get('phone'),
+                'parcels_count': len(batch['parcels']),
+                'total_amount': batch['total_amount'],
+                'cities': batch['cities'],
+                'postal_codes': batch['postal_codes'],
+                'order_numbers': [parcel['order_number'] for parcel in batch['parcels']],
+            }
+            for batch in batches
+        ],
+        'unassigned_count': len(unassigned),
+        'unassigned_order_numbers': [parcel['order_number'] for parcel in unassigned],
+    }
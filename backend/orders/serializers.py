@@ -10,6 +10,7 @@ from .models import (
     Order, OrderItem, OrderUpdate, ShippingMethod, OrderPayment, Coupon, ShippingTier,
     ShippingCategory, FreeShippingRule, CashOnDelivery
 )
+from .outbox import enqueue_event
 from products.models import Product, Color, Size
 from products.serializers import ColorSerializer, SizeSerializer
 from users.models import Address
@@ -175,14 +176,14 @@ class OrderCreateSerializer(serializers.ModelSerializer):
                 street_address = shipping_address_data.get('street_address') or shipping_address_data.get('address_line_1', '')
                 zip_code = shipping_address_data.get('zip_code') or shipping_address_data.get('postal_code', '')
                 
-                shipping_address = Address.objects.create(
+                shipping_address, _ = Address.objects.get_or_create_for_checkout(
                     user=user,
+                    guest_email=validated_data.get('customer_email'),
                     address_line_1=street_address,
                     city=shipping_address_data.get('city', ''),
                     state=shipping_address_data.get('state', ''),
                     postal_code=zip_code,
                     country=shipping_address_data.get('country', 'Bangladesh'),
-                    is_default=False
                 )
             
             # Create or get delivery address
@@ -191,14 +192,14 @@ class OrderCreateSerializer(serializers.ModelSerializer):
                 street_address = delivery_address_data.get('street_address') or delivery_address_data.get('address_line_1', '')
                 zip_code = delivery_address_data.get('zip_code') or delivery_address_data.get('postal_code', '')
                 
-                delivery_address = Address.objects.create(
+                delivery_address, _ = Address.objects.get_or_create_for_checkout(
                     user=user,
+                    guest_email=validated_data.get('customer_email'),
                     address_line_1=street_address,
                     city=delivery_address_data.get('city', ''),
                     state=delivery_address_data.get('state', ''),
                     postal_code=zip_code,
                     country=delivery_address_data.get('country', 'Bangladesh'),
-                    is_default=False
                 )
             
             # If no delivery address provided, use shipping address as delivery address
@@ -521,6 +522,9 @@ class OrderCreateSerializer(serializers.ModelSerializer):
                         # Don't fail the order creation for this
                         pass
                     
+                    # Notifications are dispatched by the outbox worker after commit
+                    enqueue_event('order.created', order=order)
+                    
                     return order
                     
                 except serializers.ValidationError:
@@ -1,3 +1,401 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.core import mail
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from products.models import Category, SubCategory
+from products.tests import create_product
+
+from .analytics import get_sales_summary, order_day, refresh_day, refresh_order
+from .archive import archive_chunk, get_archived_order
+from .cod_operations import apply_manifest, apply_to_queryset, parse_manifest
+from .exports import write_export_file
+from .lookup import lookup_order_ids, search_order_ids
+from .models import ArchivedOrder, CashOnDelivery, DailyOrderRollup, DailySalesRollup, DeliveryBatch, Order, OrderItem, OrderPayment, OutboxEvent
+from .order_stream import OrderStreamHub
+from .outbox import claim_events, enqueue_event, process_event
+from .reconciliation import StatementFormatError, reconcile_statement
+from .routing import create_batches, plan_batches
+
+
+def create_order(**fields):
+    defaults = {
+        'total_amount': Decimal('500.00'),
+        'customer_name': 'Rahim',
+        'customer_email': 'rahim@example.com',
+        'customer_phone': '01700000000',
+    }
+    defaults.update(fields)
+    return Order.objects.create(**defaults)
+
+
+@override_settings(OUTBOX_WEBHOOK_URLS=['https://hooks.example.com/orders'], OUTBOX_MAX_ATTEMPTS=3)
+class OutboxTests(TestCase):
+
+    def setUp(self):
+        self.order = create_order()
+        OutboxEvent.objects.all().delete()
+
+    def test_claimed_events_are_not_claimed_again(self):
+        event = enqueue_event('order.created', order=self.order)
+        self.assertEqual(claim_events(worker_id='a'), [event.pk])
+        self.assertEqual(claim_events(worker_id='b'), [])
+        event.refresh_from_db()
+        self.assertEqual(event.status, OutboxEvent.Status.PROCESSING)
+        self.assertEqual(event.attempts, 1)
+
+    def test_failed_handler_is_retried_without_repeating_finished_handlers(self):
+        event = enqueue_event('order.created', order=self.order)
+        with mock.patch('orders.outbox.requests.post', side_effect=ConnectionError('down')):
+            claim_events(worker_id='a')
+            self.assertEqual(process_event(event.pk), OutboxEvent.Status.PENDING)
+
+        event.refresh_from_db()
+        self.assertEqual(event.last_error, 'down')
+        self.assertGreater(event.available_at, event.created_at)
+        self.assertIn('orders.outbox.send_order_email', event.completed_handlers)
+        self.assertEqual(len(mail.outbox), 1)
+
+        OutboxEvent.objects.filter(pk=event.pk).update(available_at=event.created_at)
+        with mock.patch('orders.outbox.requests.post') as post:
+            claim_events(worker_id='a')
+            self.assertEqual(process_event(event.pk), OutboxEvent.Status.DONE)
+        post.assert_called_once()
+        self.assertEqual(len(mail.outbox), 1)
+
+    @override_settings(OUTBOX_WEBHOOK_URLS=['https://a.example.com/hook', 'https://b.example.com/hook'])
+    def test_retry_only_posts_to_failed_webhooks(self):
+        event = enqueue_event('order.created', order=self.order)
+        ok = mock.Mock()
+
+        def post(url, **kwargs):
+            if url.startswith('https://b.'):
+                raise ConnectionError('down')
+            return ok
+
+        with mock.patch('orders.outbox.requests.post', side_effect=post):
+            claim_events(worker_id='a')
+            self.assertEqual(process_event(event.pk), OutboxEvent.Status.PENDING)
+
+        OutboxEvent.objects.filter(pk=event.pk).update(available_at=event.created_at)
+        with mock.patch('orders.outbox.requests.post') as retry:
+            claim_events(worker_id='a')
+            self.assertEqual(process_event(event.pk), OutboxEvent.Status.DONE)
+        self.assertEqual([call.args[0] for call in retry.call_args_list], ['https://b.example.com/hook'])
+
+    def test_event_fails_after_max_attempts(self):
+        event = enqueue_event('order.created', order=self.order)
+        OutboxEvent.objects.filter(pk=event.pk).update(attempts=2)
+        with mock.patch('orders.outbox.requests.post', side_effect=ConnectionError('down')):
+            claim_events(worker_id='a')
+            self.assertEqual(process_event(event.pk), OutboxEvent.Status.FAILED)
+
+
+class SalesRollupTests(TestCase):
+
+    def setUp(self):
+        self.lotion = create_product('Baby Lotion')
+        toys = Category.objects.create(name='Toys', slug='toys')
+        self.ball = create_product('Ball', sub_category=SubCategory.objects.create(name='Balls', category=toys, slug='balls'))
+        self.order = create_order(status=Order.OrderStatus.DELIVERED)
+        OrderItem.objects.create(order=self.order, product=self.lotion, quantity=2, unit_price=Decimal('100.00'))
+        OrderItem.objects.create(order=self.order, product=self.ball, quantity=1, unit_price=Decimal('300.00'))
+        self.day = order_day(self.order)
+
+    def summary(self, **filters):
+        return get_sales_summary(self.day, self.day, **filters)['totals']
+
+    def test_refresh_is_idempotent(self):
+        refresh_day(self.day)
+        refresh_day(self.day)
+        self.assertEqual(self.summary(), {'orders': 1, 'revenue': Decimal('500.00'), 'units': 3})
+        self.assertEqual(DailyOrderRollup.objects.filter(date=self.day, orders_count__gt=0).count(), 1)
+
+    def test_narrowed_summary_counts_an_order_once(self):
+        refresh_day(self.day)
+        by_shop = self.summary(shop_id=self.lotion.shop_id)
+        self.assertEqual((by_shop['orders'], by_shop['units']), (1, 3))
+        by_category = self.summary(category_id=self.ball.sub_category.category_id)
+        self.assertEqual((by_category['orders'], by_category['revenue']), (1, Decimal('300.00')))
+
+    def test_order_events_apply_only_the_change(self):
+        refresh_day(self.day)
+        other = create_order(status=Order.OrderStatus.PENDING, total_amount=Decimal('200.00'))
+        OrderItem.objects.create(order=other, product=self.lotion, quantity=1, unit_price=Decimal('200.00'))
+        refresh_order(other.pk)
+        refresh_order(other.pk)
+        self.assertEqual(self.summary(), {'orders': 2, 'revenue': Decimal('700.00'), 'units': 4})
+
+        Order.objects.filter(pk=other.pk).update(status=Order.OrderStatus.CANCELLED)
+        refresh_order(other.pk)
+        self.assertEqual(self.summary(status=Order.OrderStatus.CANCELLED)['orders'], 1)
+        self.assertEqual(self.summary(status=Order.OrderStatus.PENDING)['orders'], 0)
+        incremental = list(DailySalesRollup.objects.order_by('grain', 'shop', 'category', 'status').values_list(
+            'grain', 'shop', 'category', 'status', 'orders_count', 'units', 'revenue'
+        ))
+        refresh_day(self.day)
+        self.assertEqual(list(DailySalesRollup.objects.order_by('grain', 'shop', 'category', 'status').values_list(
+            'grain', 'shop', 'category', 'status', 'orders_count', 'units', 'revenue'
+        )), incremental)
+
+    @override_settings(SECURE_SSL_REDIRECT=False)
+    def test_api_rejects_non_integer_category(self):
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_superuser(email='admin@example.com', password='x', name='Admin'))
+        response = client.get(reverse('orders:sales-analytics'), {'category': 'toys'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_archived_orders_keep_their_totals(self):
+        refresh_day(self.day)
+        before = [self.summary(), self.summary(shop_id=self.lotion.shop_id)]
+        self.assertEqual(archive_chunk([self.order.pk], days=0), 1)
+        refresh_day(self.day)
+        self.assertEqual([self.summary(), self.summary(shop_id=self.lotion.shop_id)], before)
+
+
+class CodManifestTests(TestCase):
+
+    def setUp(self):
+        self.cods = [
+            CashOnDelivery.objects.create(
+                order=create_order(), customer_full_name='Rahim', alternative_phone='01800000000',
+                amount_to_collect=Decimal('500.00'),
+            )
+            for _ in range(2)
+        ]
+        self.numbers = [cod.order.order_number for cod in self.cods]
+
+    def test_manifest_is_applied(self):
+        entries, errors = parse_manifest(
+            f"order_number,outcome,amount\n{self.numbers[0]},delivered,450\n{self.numbers[1]},attempted,,no answer"
+        )
+        self.assertEqual(errors, [])
+        result = apply_manifest(entries)
+        self.assertEqual(result['by_outcome'], {'DELIVERED': 1, 'ATTEMPTED': 1})
+
+        delivered, attempted = [CashOnDelivery.objects.get(pk=cod.pk) for cod in self.cods]
+        self.assertEqual(delivered.amount_collected, Decimal('450.00'))
+        self.assertEqual(delivered.order.status, Order.OrderStatus.DELIVERED)
+        self.assertEqual(attempted.delivery_attempts, 1)
+        self.assertEqual(attempted.delivery_status, CashOnDelivery.DeliveryStatus.PENDING)
+
+    def test_invalid_entries_are_reported(self):
+        result = apply_manifest([
+            {'line': 1, 'order_number': self.numbers[0], 'outcome': 'DELIVERED', 'amount_collected': 'NaN'},
+            {'line': 2, 'order_number': self.numbers[1], 'outcome': 'LOST'},
+            {'line': 3, 'outcome': 'DELIVERED'},
+        ])
+        self.assertEqual(result['applied'], 0)
+        self.assertEqual([error['line'] for error in result['errors']], [1, 2, 3])
+
+    def test_attempts_action_keeps_the_delivery_status(self):
+        CashOnDelivery.objects.filter(pk=self.cods[0].pk).update(
+            delivery_status=CashOnDelivery.DeliveryStatus.OUT_FOR_DELIVERY
+        )
+        apply_to_queryset(CashOnDelivery.objects.filter(pk=self.cods[0].pk), 'ATTEMPTED')
+        cod = CashOnDelivery.objects.get(pk=self.cods[0].pk)
+        self.assertEqual(cod.delivery_status, CashOnDelivery.DeliveryStatus.OUT_FOR_DELIVERY)
+        self.assertEqual(cod.delivery_attempts, 1)
+
+    @override_settings(SECURE_SSL_REDIRECT=False)
+    def test_api_rejects_malformed_entries(self):
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_superuser(email='admin@example.com', password='x', name='Admin'))
+        response = client.post('/api/orders/cod/manifest/', {'entries': ['not an object']}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ExportFileTests(TestCase):
+
+    def setUp(self):
+        self.export_dir = tempfile.mkdtemp()
+        self.settings_override = override_settings(ORDER_EXPORT_DIR=self.export_dir)
+        self.settings_override.enable()
+        create_order()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.export_dir, ignore_errors=True)
+
+    def test_export_is_written_outside_media_root(self):
+        name, rows = write_export_file('orders', 'csv')
+        self.assertEqual(rows, 1)
+        self.assertTrue(os.path.isfile(os.path.join(self.export_dir, name)))
+        self.assertFalse(os.path.exists(os.path.join(settings.MEDIA_ROOT, 'exports', name)))
+
+    def test_download_requires_admin(self):
+        name, _ = write_export_file('orders', 'csv')
+        url = reverse('admin:orders_order_export_download', args=[name])
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.force_login(get_user_model().objects.create_superuser(email='admin@example.com', password='x', name='Admin'))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Rahim', b''.join(response.streaming_content))
+        self.assertEqual(self.client.get(reverse('admin:orders_order_export_download', args=['..'])).status_code, 404)
+
+    @override_settings(ADMIN_SITE_URL='https://admin.example.com/')
+    def test_requested_export_emails_an_absolute_link(self):
+        event = enqueue_event('export.requested', kind='orders', format='csv', requested_by='admin@example.com')
+        claim_events(worker_id='a')
+        self.assertEqual(process_event(event.pk), OutboxEvent.Status.DONE)
+        event.refresh_from_db()
+        url = 'https://admin.example.com' + reverse('admin:orders_order_export_download', args=[event.payload['file']])
+        self.assertIn(url, mail.outbox[0].body)
+
+
+class ReconciliationTests(TestCase):
+
+    def setUp(self):
+        self.payments = [
+            OrderPayment.objects.create(
+                order=create_order(), payment_method='bkash', transaction_id=f'TRX{number}', sender_number='01711111111',
+            )
+            for number in range(3)
+        ]
+        self.numbers = [payment.order.order_number for payment in self.payments]
+
+    def test_statement_is_reconciled(self):
+        report = reconcile_statement([
+            'TrxID,Amount,Sender',
+            'trx0,500.00,+8801711111111',
+            'TRX1,450.00,01711111111',
+            'TRX1,450.00,01711111111',
+            'TRX9,100.00,01799999999',
+        ])
+        summary = report['summary']
+        self.assertEqual(
+            (summary['matched'], summary['mismatches'], summary['duplicate_statement_rows'], summary['unmatched_payments']),
+            (1, 1, 1, 1),
+        )
+        self.assertEqual(report['matched_orders'], [self.numbers[0]])
+        self.assertEqual(Order.objects.get(pk=self.payments[0].order_id).payment_status, Order.PaymentStatus.PAID)
+        self.assertEqual(
+            OrderPayment.objects.get(pk=self.payments[1].pk).verification_status, OrderPayment.VerificationStatus.MISMATCH
+        )
+
+    def test_dry_run_writes_nothing(self):
+        reconcile_statement(['TrxID,Amount', 'TRX0,500'], dry_run=True)
+        self.assertEqual(
+            OrderPayment.objects.get(pk=self.payments[0].pk).verification_status, OrderPayment.VerificationStatus.UNVERIFIED
+        )
+
+    def test_non_finite_amount_is_rejected(self):
+        for amount in ('NaN', 'Infinity', '-inf', 'sNaN'):
+            with self.assertRaises(StatementFormatError):
+                reconcile_statement(['TrxID,Amount', 'TRX2,500', f'TRX0,{amount}'])
+        self.assertFalse(OrderPayment.objects.filter(verification_status=OrderPayment.VerificationStatus.VERIFIED).exists())
+
+    def test_missing_columns_are_reported(self):
+        with self.assertRaises(StatementFormatError):
+            reconcile_statement(['Reference,Total', 'TRX0,500'])
+
+
+class OrderStreamHubTests(TestCase):
+
+    def delivery_event(self, order_id, delivery_status, version=1):
+        return {'type': 'delivery_status', 'id': f'd{order_id}-{version}', 'order_id': order_id, 'delivery_status': delivery_status}
+
+    def test_final_statuses_are_forgotten(self):
+        hub = OrderStreamHub()
+        hub.publish(self.delivery_event('1', 'OUT_FOR_DELIVERY'))
+        self.assertEqual(hub._published_delivery_status('1'), 'OUT_FOR_DELIVERY')
+        hub.publish(self.delivery_event('1', 'DELIVERED', version=2))
+        self.assertIsNone(hub._published_delivery_status('1'))
+
+    def test_poller_pages_through_rows_with_the_same_timestamp(self):
+        hub = OrderStreamHub()
+        hub._poll_changes()
+        cods = [
+            CashOnDelivery.objects.create(
+                order=create_order(), customer_full_name='Rahim', alternative_phone='01800000000',
+                amount_to_collect=Decimal('500.00'),
+            )
+            for _ in range(3)
+        ]
+        CashOnDelivery.objects.update(delivery_status=CashOnDelivery.DeliveryStatus.OUT_FOR_DELIVERY, updated_at=timezone.now())
+        seen = []
+        with mock.patch('orders.order_stream.POLL_BATCH_SIZE', 2):
+            for _ in range(3):
+                seen += [event['order_id'] for event in hub._poll_changes() if event['type'] == 'delivery_status']
+        self.assertCountEqual(seen, [str(cod.order_id) for cod in cods])
+
+    def test_old_statuses_expire(self):
+        hub = OrderStreamHub()
+        hub.publish(self.delivery_event('1', 'PENDING'))
+        with override_settings(ORDER_STREAM_STATUS_TTL=0):
+            hub.publish(self.delivery_event('2', 'PENDING'))
+        self.assertEqual(list(hub._delivery_status), ['2'])
+
+
+class ArchiveTests(TestCase):
+
+    def setUp(self):
+        self.first = create_order(status=Order.OrderStatus.DELIVERED)
+        archive_chunk([self.first.pk], days=0)
+
+    def test_reused_order_number_is_archived_too(self):
+        second = create_order(status=Order.OrderStatus.DELIVERED, order_number=self.first.order_number, customer_email='karim@example.com')
+        self.assertEqual(archive_chunk([second.pk], days=0), 1)
+        self.assertFalse(Order.objects.filter(pk=second.pk).exists())
+        self.assertEqual(
+            set(ArchivedOrder.objects.filter(order_number=self.first.order_number).values_list('original_id', flat=True)),
+            {self.first.pk, second.pk},
+        )
+
+        karim = get_user_model().objects.create_user(email='karim@example.com', password='x', name='Karim')
+        self.assertEqual(get_archived_order(self.first.order_number, karim)['customer_email'], 'karim@example.com')
+
+
+class OrderLookupTests(TestCase):
+
+    def setUp(self):
+        self.order = create_order(customer_phone='+8801712345678')
+        self.other = create_order(customer_phone='01898765432')
+
+    def test_phone_matches_by_prefix_and_last_digits(self):
+        for query in ('01712', '1712345678', '5678', '345678'):
+            self.assertEqual(search_order_ids(query), [self.order.pk], query)
+            self.assertEqual(set(lookup_order_ids(query)), {self.order.pk}, query)
+
+
+class RouteBatchingTests(TestCase):
+
+    def setUp(self):
+        self.day = timezone.localdate()
+        self.plan = [{
+            'courier': {'name': 'Karim'}, 'parcels': [], 'cities': ['Dhaka'], 'postal_codes': ['1205'],
+            'total_amount': Decimal('0'),
+        }]
+
+    def test_codes_taken_concurrently_are_retried(self):
+        bulk_create = DeliveryBatch.objects.bulk_create
+        attempts = []
+
+        def concurrent_planner(objs, *args, **kwargs):
+            attempts.append([batch.code for batch in objs])
+            if len(attempts) == 1:
+                # Another planner committed the same codes after we read the highest one
+                raise IntegrityError('UNIQUE constraint failed: orders_deliverybatch.code')
+            return bulk_create(objs, *args, **kwargs)
+
+        with mock.patch.object(DeliveryBatch.objects, 'bulk_create', side_effect=concurrent_planner):
+            batch_objects, _ = create_batches(self.plan, self.day)
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual([batch.code for batch in batch_objects], attempts[1])
+        self.assertTrue(DeliveryBatch.objects.filter(code=attempts[1][0]).exists())
+
+    def test_zero_max_parcels_is_rejected(self):
+        with self.assertRaises(ValueError):
+            plan_batches([{'name': 'Karim'}], [], max_parcels=0)
@@ -4,7 +4,9 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     OrderViewSet, ShippingMethodViewSet, OrderPaymentViewSet, ShippingMethodListAPIView, 
     CouponViewSet, PaymentAccountsAPIView, ShippingCategoryViewSet, FreeShippingRuleViewSet,
-    analyze_cart_shipping, enhanced_checkout_calculation, debug_orders_api
+    analyze_cart_shipping, enhanced_checkout_calculation, debug_orders_api, outbox_webhook_sink,
+    order_status_stream, order_queue_stream, sales_analytics, export_orders, apply_cod_manifest,
+    plan_delivery_batches, order_lookup
 )
 
 # Create router for ViewSets
@@ -19,6 +21,10 @@ router.register(r'coupons', CouponViewSet, basename='coupon')
 app_name = 'orders'
 
 urlpatterns = [
+    # Live order status streams (SSE, must come before the router's detail routes)
+    path('orders/queue/stream/', order_queue_stream, name='order-queue-stream'),
+    path('orders/<int:pk>/stream/', order_status_stream, name='order-status-stream'),
+
     # Order-related API endpoints
     path('', include(router.urls)),
     
@@ -30,6 +36,20 @@ urlpatterns = [
     path('analyze-cart-shipping/', analyze_cart_shipping, name='analyze-cart-shipping'),
     path('enhanced-checkout-calculation/', enhanced_checkout_calculation, name='enhanced-checkout-calculation'),
     
+    # Order lookup for support staff (order number, phone, email, tracking number or name)
+    path('lookup/', order_lookup, name='order-lookup'),
+    
+    # Sales analytics (served from the daily rollup tables)
+    path('analytics/sales/', sales_analytics, name='sales-analytics'),
+    
+    # Bulk COD delivery operations
+    path('cod/manifest/', apply_cod_manifest, name='cod-manifest'),
+    path('cod/batches/', plan_delivery_batches, name='cod-delivery-batches'),
+    
+    # Streaming CSV/NDJSON exports
+    path('exports/<str:kind>/', export_orders, name='export-orders'),
+    
     # Debug endpoint
     path('debug/', debug_orders_api, name='debug-orders'),
+    path('outbox/webhook-sink/', outbox_webhook_sink, name='outbox-webhook-sink'),
 ]
@@ -8,17 +8,21 @@ from rest_framework.response import Response
 from django.db import transaction
 from django.shortcuts import get_object_or_404
 from django.db.models import Q
+from django.http import Http404
 from products.models import Product
 from .models import (
     Order, ShippingMethod, OrderPayment, Coupon, OrderItem, OrderUpdate,
-    ShippingCategory, FreeShippingRule
+    ShippingCategory, FreeShippingRule, ArchivedOrder
 )
+from .archive import archived_representations, customer_archived_orders, get_archived_order
+from .lookup import search_order_ids
+from .outbox import enqueue_event
 from .serializers import (
     OrderSerializer, ShippingMethodSerializer, OrderPaymentSerializer, 
     OrderCreateSerializer, OrderReadSerializer, CouponSerializer, CouponValidationSerializer,
     ShippingCategorySerializer, FreeShippingRuleSerializer
 )
-from users.permissions import IsCustomerForOrder
+from users.permissions import IsAdmin, IsCustomerForOrder, IsSellerOrAdmin
 
 logger = logging.getLogger(__name__)
 
@@ -482,7 +486,8 @@ class OrderViewSet(viewsets.ModelViewSet):
             # Add context for serializer to build absolute URLs
             serializer.context['request'] = request
             
-            orders_data = serializer.data
+            # Archived orders are older than every hot order, so they go last
+            orders_data = list(serializer.data) + archived_representations(self.get_archived_queryset())
             logger.info(f"Serialized orders count: {len(orders_data)}")
             
             return Response(orders_data, status=status.HTTP_200_OK)
@@ -494,12 +499,44 @@ class OrderViewSet(viewsets.ModelViewSet):
                 'detail': 'There was an error retrieving your orders. Please try again.'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    def get_archived_queryset(self):
+        """Archived orders matching the same filters get_queryset applies to hot orders"""
+        user = self.request.user
+        user_param = self.request.query_params.get('user')
+        order_number_param = self.request.query_params.get('order_number')
+        is_admin = user.is_authenticated and (
+            (hasattr(user, 'user_type') and user.user_type == 'ADMIN') or 
+            user.is_superuser or 
+            user.is_staff
+        )
+
+        if user_param:
+            if is_admin:
+                return ArchivedOrder.objects.filter(user_id=user_param)
+            if user.is_authenticated and str(user.id) == str(user_param):
+                return customer_archived_orders(user)
+        elif order_number_param:
+            if is_admin:
+                return ArchivedOrder.objects.filter(order_number=order_number_param)
+            if user.is_authenticated:
+                return ArchivedOrder.objects.filter(order_number=order_number_param, user_id=user.id)
+        elif user.is_authenticated and not is_admin:
+            # Staff work on recent orders; archived ones are browsed in the admin
+            return customer_archived_orders(user)
+        return ArchivedOrder.objects.none()
+
     def retrieve(self, request, *args, **kwargs):
         """
         Custom retrieve method with proper error handling
         """
         try:
-            instance = self.get_object()
+            try:
+                instance = self.get_object()
+            except Http404:
+                archived = get_archived_order(kwargs.get(self.lookup_field), request.user)
+                if archived is None:
+                    return Response({'error': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
+                return Response(archived, status=status.HTTP_200_OK)
             serializer = self.get_serializer(instance)
             
             # Add context for serializer to build absolute URLs
@@ -681,7 +718,11 @@ class OrderViewSet(viewsets.ModelViewSet):
                     }, status=status.HTTP_400_BAD_REQUEST)
                 
                 try:
-                    shipping_address = Address.objects.create(**address_fields)
+                    # Reuse the customer's identical address instead of adding a copy per order
+                    shipping_address, _ = Address.objects.get_or_create_for_checkout(
+                        guest_email=request.data.get('customer_email'),
+                        **address_fields
+                    )
                 except Exception as e:
                     logger.exception(f"Failed to create address: {e}")
                     return Response({
@@ -743,75 +784,79 @@ class OrderViewSet(viewsets.ModelViewSet):
                 'customer_phone': request.data.get('customer_phone', ''),
             }
 
-            # Create the order
-            order = Order(**order_data)
+            # Order, items, payment and the outbox event are written in one transaction
+            with transaction.atomic():
+                # Create the order
+                order = Order(**order_data)
             
-            # Prepare cart items for order ID generation
-            cart_items_for_id = []
-            if items:
-                for item in items:
-                    product_name = ""
-                    if 'product_name' in item:
-                        product_name = item['product_name']
-                    elif 'product' in item or 'product_id' in item:
-                        # Try to get product name from database
-                        try:
-                            product_id = item.get('product') or item.get('product_id')
-                            product = Product.objects.get(id=product_id)
-                            product_name = product.name
-                        except Product.DoesNotExist:
-                            pass
+                # Prepare cart items for order ID generation
+                cart_items_for_id = []
+                if items:
+                    for item in items:
+                        product_name = ""
+                        if 'product_name' in item:
+                            product_name = item['product_name']
+                        elif 'product' in item or 'product_id' in item:
+                            # Try to get product name from database
+                            try:
+                                product_id = item.get('product') or item.get('product_id')
+                                product = Product.objects.get(id=product_id)
+                                product_name = product.name
+                            except Product.DoesNotExist:
+                                pass
                     
-                    cart_items_for_id.append({
-                        'product_name': product_name,
-                        'quantity': item.get('quantity', 1)
-                    })
+                        cart_items_for_id.append({
+                            'product_name': product_name,
+                            'quantity': item.get('quantity', 1)
+                        })
             
-            # Set cart items for order ID generation
-            order._cart_items = cart_items_for_id
-            order.save()
+                # Set cart items for order ID generation
+                order._cart_items = cart_items_for_id
+                order.save()
 
-            # Create order items
-            for item in items:
-                try:
-                    # Try to find the product by ID first (frontend sends 'product' field)
-                    product = None
-                    if 'product' in item:
-                        product = Product.objects.get(id=item['product'])
-                    elif 'product_id' in item:
-                        product = Product.objects.get(id=item['product_id'])
-                    elif 'product_name' in item:
-                        # Try to find by name (this is a fallback)
-                        product = Product.objects.filter(name__icontains=item['product_name']).first()
+                # Create order items
+                for item in items:
+                    try:
+                        # Try to find the product by ID first (frontend sends 'product' field)
+                        product = None
+                        if 'product' in item:
+                            product = Product.objects.get(id=item['product'])
+                        elif 'product_id' in item:
+                            product = Product.objects.get(id=item['product_id'])
+                        elif 'product_name' in item:
+                            # Try to find by name (this is a fallback)
+                            product = Product.objects.filter(name__icontains=item['product_name']).first()
                     
-                    if product:
-                        OrderItem.objects.create(
-                            order=order,
-                            product=product,
-                            quantity=item.get('quantity', 1),
-                            unit_price=item.get('unit_price', item.get('price', product.price))
-                        )
-                except Exception as e:
-                    # If product not found, continue with other items
-                    continue
-
-            # Create payment record
-            payment_method_from_frontend = payment_data.get('payment_method', 'bkash')
-            payment_record_data = {
-                'order': order,
-                'sender_number': transaction_number,
-                'transaction_id': transaction_id,
-                'payment_method': payment_method_from_frontend,
-            }
+                        if product:
+                            OrderItem.objects.create(
+                                order=order,
+                                product=product,
+                                quantity=item.get('quantity', 1),
+                                unit_price=item.get('unit_price', item.get('price', product.price))
+                            )
+                    except Exception as e:
+                        # If product not found, continue with other items
+                        continue
+
+                # Create payment record
+                payment_method_from_frontend = payment_data.get('payment_method', 'bkash')
+                payment_record_data = {
+                    'order': order,
+                    'sender_number': transaction_number,
+                    'transaction_id': transaction_id,
+                    'payment_method': payment_method_from_frontend,
+                }
             
-            payment = OrderPayment.objects.create(**payment_record_data)
+                payment = OrderPayment.objects.create(**payment_record_data)
 
-            # Create order update for payment confirmation
-            OrderUpdate.objects.create(
-                order=order,
-                status=Order.OrderStatus.PROCESSING,
-                notes=f"Payment confirmed. Transaction ID: {transaction_id}. {comment if comment else ''}"
-            )
+                # Create order update for payment confirmation
+                OrderUpdate.objects.create(
+                    order=order,
+                    status=Order.OrderStatus.PROCESSING,
+                    notes=f"Payment confirmed. Transaction ID: {transaction_id}. {comment if comment else ''}"
+                )
+
+                enqueue_event('order.payment_confirmed', order=order, transaction_id=transaction_id)
 
             # Prepare response data
             response_data = {
@@ -1544,3 +1589,402 @@ def debug_orders_api(request):
                 'total_users': 'error',
             }
         }, status=500)
+
+
+@api_view(['POST'])
+@permission_classes([permissions.AllowAny])
+def outbox_webhook_sink(request):
+    """
+    Local stand-in for a partner webhook endpoint.
+    Point OUTBOX_WEBHOOK_URLS here during development to see what the outbox
+    worker sends. Only available when DEBUG is on.
+    """
+    from django.conf import settings
+    if not settings.DEBUG:
+        return Response(status=status.HTTP_404_NOT_FOUND)
+    logger.info(f"Outbox webhook received: {request.data}")
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@api_view(['GET'])
+@permission_classes([IsSellerOrAdmin])
+def sales_analytics(request):
+    """
+    Sales dashboard read from the daily rollup tables.
+    GET /api/orders/analytics/sales/?start=YYYY-MM-DD&end=YYYY-MM-DD&shop=<id>&category=<id>&status=<status>
+
+    Defaults to the last 30 days. Sellers only see their own shop.
+    """
+    from datetime import date
+    from .analytics import default_date_range, get_sales_summary
+
+    try:
+        start, end = default_date_range()
+        if request.query_params.get('start'):
+            start = date.fromisoformat(request.query_params['start'])
+        if request.query_params.get('end'):
+            end = date.fromisoformat(request.query_params['end'])
+    except ValueError:
+        return Response({'error': 'Dates must be in YYYY-MM-DD format'}, status=status.HTTP_400_BAD_REQUEST)
+    if start > end:
+        return Response({'error': 'start must be on or before end'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        shop_id = int(request.query_params['shop']) if request.query_params.get('shop') else None
+        category_id = int(request.query_params['category']) if request.query_params.get('category') else None
+    except ValueError:
+        return Response({'error': 'shop and category must be integer ids'}, status=status.HTTP_400_BAD_REQUEST)
+    if request.user.user_type == 'SELLER':
+        shop = getattr(request.user, 'shop', None)
+        if shop is None:
+            return Response({'error': 'No shop found for this seller'}, status=status.HTTP_404_NOT_FOUND)
+        shop_id = shop.id
+
+    status_param = request.query_params.get('status')
+    if status_param and status_param not in Order.OrderStatus.values:
+        return Response({'error': f'Invalid status: {status_param}'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        summary = get_sales_summary(
+            start, end,
+            shop_id=shop_id,
+            category_id=category_id,
+            status=status_param,
+        )
+        return Response(summary, status=status.HTTP_200_OK)
+    except Exception as e:
+        logger.exception(f"Error building sales analytics: {str(e)}")
+        return Response({
+            'error': f'Failed to build sales analytics: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+def export_orders(request, kind):
+    """
+    Streaming export of orders, order items or landing page orders.
+    GET /api/orders/exports/<orders|order-items|landing-orders>/
+        ?file_format=csv|ndjson&start=YYYY-MM-DD&end=YYYY-MM-DD&status=&payment_status=&background=1
+
+    With background=1 the file is written to ORDER_EXPORT_DIR by the outbox
+    worker and the requester is emailed a link to the admin download view.
+    """
+    from datetime import date
+    from .exports import EXPORT_FORMATS, EXPORT_KINDS, build_export_queryset, export_response
+
+    if kind not in EXPORT_KINDS:
+        return Response({'error': f'Unknown export: {kind}'}, status=status.HTTP_404_NOT_FOUND)
+
+    fmt = request.query_params.get('file_format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return Response({'error': f'file_format must be one of: {", ".join(EXPORT_FORMATS)}'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        start = date.fromisoformat(request.query_params['start']) if request.query_params.get('start') else None
+        end = date.fromisoformat(request.query_params['end']) if request.query_params.get('end') else None
+    except ValueError:
+        return Response({'error': 'Dates must be in YYYY-MM-DD format'}, status=status.HTTP_400_BAD_REQUEST)
+
+    filters = {
+        'start': start,
+        'end': end,
+        'status': request.query_params.get('status') or None,
+        'payment_status': request.query_params.get('payment_status') or None,
+    }
+
+    if request.query_params.get('background') in ('1', 'true', 'yes'):
+        event = enqueue_event(
+            'export.requested',
+            kind=kind,
+            format=fmt,
+            start=start.isoformat() if start else None,
+            end=end.isoformat() if end else None,
+            status=filters['status'],
+            payment_status=filters['payment_status'],
+            requested_by=request.user.email,
+        )
+        return Response({
+            'message': 'Export queued. You will receive an email with the download link when it is ready.',
+            'job_id': event.pk,
+        }, status=status.HTTP_202_ACCEPTED)
+
+    try:
+        return export_response(kind, fmt, build_export_queryset(kind, **filters))
+    except Exception as e:
+        logger.exception(f"Error exporting {kind}: {str(e)}")
+        return Response({
+            'error': f'Failed to export {kind}: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['POST'])
+@permission_classes([IsAdmin])
+def apply_cod_manifest(request):
+    """
+    Apply a courier manifest to COD orders in one transaction.
+    POST /api/orders/cod/manifest/
+    Body (JSON or multipart):
+        manifest: "order_number,outcome[,amount_collected][,notes]" lines, or
+        file: uploaded CSV with the same columns, or
+        entries: [{"order_number": "...", "outcome": "DELIVERED", "amount_collected": "1200", "notes": "..."}]
+        delivery_person_name / delivery_person_phone: optional, applied to every row
+    Outcomes: OUT_FOR_DELIVERY, DELIVERED, ATTEMPTED, PAYMENT_FAILED, RETURNED
+    """
+    from .cod_operations import apply_manifest, parse_manifest
+
+    parse_errors = []
+    if request.data.get('entries'):
+        entries = request.data['entries']
+        if not isinstance(entries, list) or not all(isinstance(entry, dict) for entry in entries):
+            return Response({'error': 'entries must be a list of objects'}, status=status.HTTP_400_BAD_REQUEST)
+        entries = [dict(entry, line=index) for index, entry in enumerate(entries, start=1)]
+    else:
+        uploaded = request.FILES.get('file')
+        text = uploaded.read().decode('utf-8-sig') if uploaded else request.data.get('manifest', '')
+        if not text.strip():
+            return Response({'error': 'Provide a manifest, file or entries'}, status=status.HTTP_400_BAD_REQUEST)
+        entries, parse_errors = parse_manifest(text)
+
+    try:
+        result = apply_manifest(
+            entries,
+            delivery_person_name=request.data.get('delivery_person_name') or None,
+            delivery_person_phone=request.data.get('delivery_person_phone') or None,
+        )
+    except Exception as e:
+        logger.exception(f"Error applying COD manifest: {str(e)}")
+        return Response({
+            'error': f'Failed to apply manifest: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    result['errors'] = parse_errors + result['errors']
+    return Response(result, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+@permission_classes([IsAdmin])
+def plan_delivery_batches(request):
+    """
+    Group pending COD parcels into balanced courier batches.
+    POST /api/orders/cod/batches/
+    Body:
+        couriers: [{"name": "Rahim", "phone": "017..."}, ...]   (required)
+        delivery_date: YYYY-MM-DD (defaults to today; parcels scheduled later are left out)
+        city: only plan parcels in this city
+        max_parcels / max_amount: per-courier limits
+        create: true to save the batches and assign the couriers, otherwise a preview is returned
+    """
+    from datetime import date
+    from decimal import Decimal, InvalidOperation
+    from django.utils import timezone
+    from .routing import create_batches, load_pending_parcels, plan_batches, serialize_plan
+
+    couriers = request.data.get('couriers') or []
+    if not isinstance(couriers, list) or not couriers or not all(
+        isinstance(courier, dict) and courier.get('name') for courier in couriers
+    ):
+        return Response({'error': 'couriers must be a non-empty list of {"name", "phone"}'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        delivery_date = date.fromisoformat(request.data['delivery_date']) if request.data.get('delivery_date') else timezone.localdate()
+        max_parcels = int(request.data['max_parcels']) if request.data.get('max_parcels') not in (None, '') else None
+        max_amount = Decimal(str(request.data['max_amount'])) if request.data.get('max_amount') not in (None, '') else None
+        if (max_parcels is not None and max_parcels < 1) or (max_amount is not None and not max_amount >= 0):
+            raise ValueError('limits must be positive')
+    except (ValueError, InvalidOperation):
+        return Response({'error': 'Invalid delivery_date, max_parcels or max_amount'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        parcels = load_pending_parcels(delivery_date, city=request.data.get('city'))
+        batches, unassigned = plan_batches(couriers, parcels, max_parcels=max_parcels, max_amount=max_amount)
+        result = serialize_plan(batches, unassigned)
+        result['delivery_date'] = delivery_date
+
+        if str(request.data.get('create')).lower() in ('1', 'true', 'yes'):
+            batch_objects, assigned = create_batches(batches, delivery_date, created_by=request.user)
+            result['created_batches'] = [batch.code for batch in batch_objects]
+            result['assigned_parcels'] = assigned
+            return Response(result, status=status.HTTP_201_CREATED)
+        return Response(result, status=status.HTTP_200_OK)
+    except Exception as e:
+        logger.exception(f"Error planning delivery batches: {str(e)}")
+        return Response({
+            'error': f'Failed to plan delivery batches: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+def order_lookup(request):
+    """
+    Staff order lookup by order number, phone, email, tracking number or name.
+    ?q=<terms>&limit=<n> (default 20, max 100). Every word must match.
+    """
+    try:
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+        except ValueError:
+            return Response({'error': 'limit must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+
+        order_ids = search_order_ids(query, limit=limit)
+        orders = {
+            row['id']: row for row in Order.objects.filter(pk__in=order_ids).values(
+                'id', 'order_number', 'customer_name', 'customer_email', 'customer_phone',
+                'tracking_number', 'status', 'payment_status', 'total_amount', 'ordered_at',
+            )
+        }
+        results = [orders[order_id] for order_id in order_ids if order_id in orders]
+        return Response({'query': query, 'count': len(results), 'results': results})
+    except Exception as e:
+        logger.exception(f"Error in order lookup: {str(e)}")
+        return Response({'error': f'Order lookup failed: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+# ---------------------------------------------------------------------------
+# Live order status streams (Server-Sent Events)
+#
+# These are plain async Django views rather than DRF views so they can hold the
+# connection open without tying up a worker thread. Serve the project through
+# backend/asgi.py (e.g. `uvicorn backend.asgi:application`) for streaming.
+# ---------------------------------------------------------------------------
+
+def _is_admin_user(user):
+    return user.is_authenticated and (
+        (hasattr(user, 'user_type') and user.user_type == 'ADMIN') or
+        user.is_superuser or
+        user.is_staff
+    )
+
+
+async def _authenticate_stream_request(request):
+    """
+    Resolve the user from a JWT (Authorization header or ?token=, since
+    EventSource cannot send headers) or fall back to the session.
+    """
+    from asgiref.sync import sync_to_async
+    from rest_framework.exceptions import AuthenticationFailed
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+    raw_token = request.GET.get('token')
+    auth_header = request.headers.get('Authorization', '')
+    if not raw_token and auth_header.startswith('Bearer '):
+        raw_token = auth_header.split(' ', 1)[1].strip()
+
+    if raw_token:
+        authenticator = JWTAuthentication()
+
+        def get_user():
+            return authenticator.get_user(authenticator.get_validated_token(raw_token))
+
+        try:
+            return await sync_to_async(get_user)()
+        except (InvalidToken, TokenError, AuthenticationFailed):
+            return None
+    user = await request.auser()
+    return user if user.is_authenticated else None
+
+
+def _sse_response(stream):
+    from django.http import StreamingHttpResponse
+
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Disable proxy buffering (nginx)
+    return response
+
+
+async def _order_event_stream(channel, initial_events=()):
+    import asyncio
+    from django.conf import settings
+    from .order_stream import format_sse, hub
+
+    queue = hub.subscribe(channel)
+    try:
+        yield f"retry: {settings.ORDER_STREAM_RETRY_MS}\n\n"
+        for event in initial_events:
+            yield format_sse(event)
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=settings.ORDER_STREAM_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            yield format_sse(event)
+    finally:
+        hub.unsubscribe(channel, queue)
+
+
+async def order_status_stream(request, pk):
+    """
+    SSE stream of status changes for one order.
+    GET /api/orders/orders/<pk>/stream/?token=<access token>
+
+    Sends a `snapshot` event with the current state on connect, then
+    `order_update` and `delivery_status` events as they happen.
+    """
+    from asgiref.sync import sync_to_async
+    from django.http import JsonResponse
+    from .order_stream import order_channel
+
+    user = await _authenticate_stream_request(request)
+    if user is None:
+        return JsonResponse({'error': 'Authentication credentials were not provided.'}, status=401)
+
+    def load_snapshot():
+        order = Order.objects.select_related('cash_on_delivery').filter(pk=pk).first()
+        if order is None:
+            return None
+        if not _is_admin_user(user) and not (
+            order.user_id == user.id or
+            (order.user_id is None and order.customer_email == user.email)
+        ):
+            return None
+
+        latest_update = order.updates.order_by('-id').first()
+        cod = getattr(order, 'cash_on_delivery', None)
+        return {
+            'type': 'snapshot',
+            'id': f"u{latest_update.pk}" if latest_update else 's0',
+            'order_id': str(order.pk),
+            'order_number': order.order_number,
+            'status': order.status,
+            'payment_status': order.payment_status,
+            'delivery_status': cod.delivery_status if cod else None,
+            'latest_update': {
+                'status': latest_update.status,
+                'notes': latest_update.notes,
+                'timestamp': latest_update.timestamp.isoformat(),
+            } if latest_update else None,
+        }
+
+    try:
+        snapshot = await sync_to_async(load_snapshot)()
+    except Exception as e:
+        logger.exception(f"Error opening order stream: {str(e)}")
+        return JsonResponse({'error': f'Failed to open order stream: {str(e)}'}, status=500)
+    if snapshot is None:
+        return JsonResponse({'error': 'Order not found'}, status=404)
+
+    return _sse_response(_order_event_stream(order_channel(pk), [snapshot]))
+
+
+async def order_queue_stream(request):
+    """
+    SSE stream of every order status / COD delivery change, for the admin COD dashboard.
+    GET /api/orders/orders/queue/stream/?token=<access token>
+    """
+    from django.http import JsonResponse
+    from .order_stream import QUEUE_CHANNEL
+
+    user = await _authenticate_stream_request(request)
+    if user is None:
+        return JsonResponse({'error': 'Authentication credentials were not provided.'}, status=401)
+    if not _is_admin_user(user):
+        return JsonResponse({'error': 'Admin access required'}, status=403)
+
+    return _sse_response(_order_event_stream(QUEUE_CHANNEL))
@@ -18,6 +18,24 @@ class BrandAdmin(ModelAdmin):
         }),
     )
 
+@admin.register(SearchQuery)
+class SearchQueryAdmin(ModelAdmin):
+    list_display = ('query', 'hits', 'is_hidden', 'last_searched_at')
+    list_filter = ('is_hidden',)
+    search_fields = ('query',)
+    readonly_fields = ('last_searched_at',)
+    actions = ['hide_from_suggestions', 'show_in_suggestions']
+
+    def hide_from_suggestions(self, request, queryset):
+        updated = queryset.update(is_hidden=True)
+        self.message_user(request, f'{updated} queries hidden from suggestions.')
+    hide_from_suggestions.short_description = 'Hide from suggestions'
+
+    def show_in_suggestions(self, request, queryset):
+        updated = queryset.update(is_hidden=False)
+        self.message_user(request, f'{updated} queries shown in suggestions.')
+    show_in_suggestions.short_description = 'Show in suggestions'
+
 @admin.register(Color)
 class ColorAdmin(ModelAdmin):
     list_display = ('name', 'hex_code')
@@ -106,3 +124,12 @@ class LandingPageOrderAdmin(ModelAdmin):
     def has_add_permission(self, request):
         # Prevent adding orders from admin (orders should come from landing page)
         return False
+
+    actions = ['export_landing_orders_csv']
+
+    def export_landing_orders_csv(self, request, queryset):
+        """Stream the selected landing page orders as CSV"""
+        from orders.exports import export_response
+        return export_response('landing-orders', 'csv', queryset.order_by('pk'))
+    export_landing_orders_csv.short_description = 'Export selected orders (CSV)'
+
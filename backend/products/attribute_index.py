@@ -0,0 +1,373 @@
+# products/attribute_index.py
+"""
+In-memory inverted index for the catalog attribute filters.
+
+Every active product gets a slot (a bit position). For each attribute value
+the index keeps a bitmap - a Python int with the bits of the matching products
+set - so a listing filtered on category, subcategories, brands, colors and
+shipping categories resolves with a few OR/AND operations instead of M2M joins
+and DISTINCT:
+
+    ('brand', 'nike') | ('brand', 'puma')  &  ('color', 'Red')  &  active
+
+Every product, active or not, has a slot, and slots are handed out in
+creation order, so the highest set bits of a result are the newest products;
+a page of the default `-created_at` listing is read straight from the bitmap
+and only that page is fetched from the database. A deactivated product keeps
+its slot, so it returns to its place when reactivated.
+
+The index refreshes itself incrementally: at most every
+PRODUCT_ATTRIBUTE_INDEX_REFRESH_INTERVAL seconds it compares a signature of
+the products table (latest updated_at, product counts, latest CatalogChange)
+with the one it was last refreshed at. On a difference it reloads the
+products whose updated_at moved past the last one it saw plus those with new
+CatalogChange rows (colors changed), and rebuilds from scratch when products
+were deleted or a new product would not be the newest slot.
+With PRODUCT_ATTRIBUTE_INDEX_PATH set, the index is persisted there so a new
+worker starts from the file and only catches up on recent changes.
+"""
+import logging
+import os
+import pickle
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Count, Max, Q
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 2
+
+# ProductFilter param -> (index attribute, accepts a comma separated list)
+FILTER_PARAMS = {
+    'category': ('category', False),
+    'subcategory': ('subcategory', False),
+    'subcategories': ('subcategory', True),
+    'brand': ('brand', False),
+    'brands': ('brand', True),
+    'colors': ('color', True),
+    'shipping_categories': ('shipping_category', True),
+}
+# Params the index-backed listing understands besides the filters
+PASSTHROUGH_PARAMS = {'page', 'page_size', 'format', 'fuzzy'}
+DEFAULT_ORDERINGS = {'', '-created_at'}
+
+
+def product_attribute_keys(row, colors):
+    """Index keys of one product from its values() row and color names"""
+    keys = {('category', row['sub_category__category__slug']), ('subcategory', row['sub_category__slug'])}
+    if row['brand__slug']:
+        keys.add(('brand', row['brand__slug']))
+    if row['shipping_category_id'] is not None:
+        keys.add(('shipping_category', str(row['shipping_category_id'])))
+    keys.update(('color', name) for name in colors)
+    return keys
+
+
+class ProductAttributeIndex:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+        self.checked_at = 0.0
+
+    def reset(self):
+        self.ids = []           # slot -> product id
+        self.slots = {}         # product id -> slot
+        self.keys = {}          # slot -> index keys currently set for it
+        self.bitmaps = {}       # (attribute, value) -> bitmap of slots
+        self.active = 0         # bitmap of active products
+        self.watermark = None   # newest updated_at seen
+        self.change_id = 0      # newest CatalogChange id seen
+        self.newest = None      # (created_at, id) of the highest slot
+        self.signature = None   # products table signature at the last refresh
+        self.out_of_order = False
+
+    # ------------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------------
+
+    def _load(self, queryset):
+        """[(product id, is_active, keys, updated_at, created_at)] for `queryset`, in creation order"""
+        from .models import Product
+
+        rows = list(queryset.order_by('created_at', 'pk').values(
+            'pk', 'is_active', 'updated_at', 'created_at', 'brand__slug', 'sub_category__slug',
+            'sub_category__category__slug', 'shipping_category_id',
+        ))
+        colors = {}
+        for product_id, name in Product.colors.through.objects.filter(
+            product_id__in=queryset.values('pk')
+        ).values_list('product_id', 'color__name'):
+            colors.setdefault(product_id, []).append(name)
+        return [
+            (
+                row['pk'], row['is_active'], product_attribute_keys(row, colors.get(row['pk'], ())),
+                row['updated_at'], row['created_at'],
+            )
+            for row in rows
+        ]
+
+    def _apply(self, product_id, is_active, keys, created_at):
+        slot = self.slots.get(product_id)
+        if slot is None:
+            if self.newest is not None and (created_at, str(product_id)) < self.newest:
+                # Slots must follow creation order for the -created_at listing
+                self.out_of_order = True
+            slot = len(self.ids)
+            self.ids.append(product_id)
+            self.slots[product_id] = slot
+            self.newest = (created_at, str(product_id))
+        bit = 1 << slot
+
+        for key in self.keys.pop(slot, ()):
+            remaining = self.bitmaps[key] & ~bit
+            if remaining:
+                self.bitmaps[key] = remaining
+            else:
+                del self.bitmaps[key]
+        self.active &= ~bit
+
+        if is_active:
+            for key in keys:
+                self.bitmaps[key] = self.bitmaps.get(key, 0) | bit
+            self.keys[slot] = keys
+            self.active |= bit
+
+    def rebuild(self):
+        """Build the index from scratch (one products query and one colors query)"""
+        from .models import Product
+
+        started = time.monotonic()
+        with self.lock:
+            self.reset()
+            self.signature = table_signature()
+            self.change_id = self.signature[3]
+            for product_id, is_active, keys, updated_at, created_at in self._load(Product.objects.all()):
+                self._apply(product_id, is_active, keys, created_at)
+                if self.watermark is None or updated_at > self.watermark:
+                    self.watermark = updated_at
+            self.checked_at = time.monotonic()
+        logger.info(
+            f"Product attribute index rebuilt: {len(self.ids)} products, {len(self.bitmaps)} values "
+            f"in {time.monotonic() - started:.2f}s"
+        )
+        self.save()
+        return self
+
+    def refresh(self):
+        """Apply product changes made since the last refresh. Returns the number of products reloaded."""
+        from .models import CatalogChange, Product
+
+        signature = table_signature()
+        with self.lock:
+            if signature == self.signature:
+                self.checked_at = time.monotonic()
+                return 0
+            changed = []
+            if self.signature is not None:
+                recent = Q(pk__in=CatalogChange.objects.filter(pk__gt=self.change_id).values('product_id'))
+                if self.watermark is not None:
+                    recent |= Q(updated_at__gte=self.watermark)
+                changed = self._load(Product.objects.filter(recent))
+            for product_id, is_active, keys, updated_at, created_at in changed:
+                self._apply(product_id, is_active, keys, created_at)
+                if self.watermark is None or updated_at > self.watermark:
+                    self.watermark = updated_at
+            self.change_id = max(self.change_id, signature[3])
+            _, count, active, _ = signature
+            in_sync = (
+                self.signature is not None and not self.out_of_order
+                and len(self.ids) == count and self.active.bit_count() == active
+            )
+            # Changes made after the signature was taken are loaded again next time, which is harmless
+            self.signature = signature
+            self.checked_at = time.monotonic()
+        if not in_sync:
+            # Deleted products, an older product added (or a never built index): start over
+            self.rebuild()
+        elif changed:
+            self.save()
+        return len(changed)
+
+    def ensure_fresh(self):
+        interval = settings.PRODUCT_ATTRIBUTE_INDEX_REFRESH_INTERVAL
+        if time.monotonic() - self.checked_at >= interval:
+            self.refresh()
+        return self
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def save(self, path=None):
+        path = path or settings.PRODUCT_ATTRIBUTE_INDEX_PATH
+        if not path:
+            return
+        with self.lock:
+            state = {
+                'version': FORMAT_VERSION, 'ids': self.ids, 'keys': self.keys,
+                'bitmaps': self.bitmaps, 'active': self.active, 'watermark': self.watermark,
+                'change_id': self.change_id, 'newest': self.newest, 'signature': self.signature,
+            }
+            descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+            with os.fdopen(descriptor, 'wb') as handle:
+                pickle.dump(state, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+
+    def load(self, path=None):
+        """Load a persisted index; returns False when there is none (or it is from another version)"""
+        path = path or settings.PRODUCT_ATTRIBUTE_INDEX_PATH
+        if not path or not os.path.exists(path):
+            return False
+        try:
+            with open(path, 'rb') as handle:
+                state = pickle.load(handle)
+        except Exception as e:
+            logger.warning(f"Could not load product attribute index from {path}: {e}")
+            return False
+        if state.get('version') != FORMAT_VERSION:
+            return False
+        with self.lock:
+            self.ids = state['ids']
+            self.slots = {product_id: slot for slot, product_id in enumerate(self.ids)}
+            self.keys = state['keys']
+            self.bitmaps = state['bitmaps']
+            self.active = state['active']
+            self.watermark = state['watermark']
+            self.change_id = state['change_id']
+            self.newest = state['newest']
+            self.signature = state['signature']
+            self.out_of_order = False
+            self.checked_at = 0.0
+        return True
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def match(self, conditions):
+        """
+        Bitmap of active products matching `conditions`, a list of
+        (attribute, [values]): values of one condition are OR-ed, conditions AND-ed.
+        """
+        with self.lock:
+            result = self.active
+            for attribute, values in conditions:
+                any_value = 0
+                for value in values:
+                    any_value |= self.bitmaps.get((attribute, value), 0)
+                result &= any_value
+                if not result:
+                    break
+        return result
+
+    def newest_ids(self, bitmap, offset, limit):
+        """Product ids of set bits offset..offset+limit, highest slot (newest product) first"""
+        bits = bin(bitmap)[2:] if bitmap else ''
+        top = len(bits) - 1
+        product_ids = []
+        index = bits.find('1')
+        skipped = 0
+        while index != -1 and len(product_ids) < limit:
+            if skipped >= offset:
+                product_ids.append(self.ids[top - index])
+            else:
+                skipped += 1
+            index = bits.find('1', index + 1)
+        return product_ids
+
+
+def table_signature():
+    """(latest updated_at, products, active products, latest CatalogChange id), in two queries"""
+    from .models import CatalogChange, Product
+
+    products = Product.objects.aggregate(
+        latest=Max('updated_at'), count=Count('pk'), active=Count('pk', filter=Q(is_active=True))
+    )
+    change_id = CatalogChange.objects.aggregate(last=Max('pk'))['last'] or 0
+    return products['latest'], products['count'], products['active'], change_id
+
+
+def filter_conditions(params):
+    """
+    Index conditions for ProductFilter query params, or None when the request
+    uses anything the index cannot answer (search, price range, custom ordering).
+    """
+    conditions = []
+    for name in params:
+        values = [value for value in params.getlist(name) if value != '']
+        if name in PASSTHROUGH_PARAMS or not values:
+            continue
+        if name == 'ordering':
+            if values[-1] not in DEFAULT_ORDERINGS:
+                return None
+            continue
+        if name not in FILTER_PARAMS:
+            return None
+        attribute, many = FILTER_PARAMS[name]
+        value = values[-1]
+        if many:
+            wanted = [part.strip() for part in value.split(',') if part.strip()]
+        else:
+            wanted = [value]
+        if attribute == 'shipping_category':
+            try:
+                wanted = [str(int(part)) for part in wanted]
+            except ValueError:
+                return None  # let ProductFilter report the invalid value
+        if wanted:
+            conditions.append((attribute, wanted))
+    return conditions
+
+
+class IndexedProductList:
+    """
+    Sequence over the products of one index match, newest first, for Django's
+    Paginator: len() comes from the bitmap, and slicing fetches only that page.
+    """
+
+    def __init__(self, index, bitmap, queryset):
+        self.index = index
+        self.bitmap = bitmap
+        self.queryset = queryset
+
+    def __len__(self):
+        return self.bitmap.bit_count()
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            raise TypeError('IndexedProductList only supports slicing')
+        start, stop, _ = item.indices(len(self))
+        product_ids = self.index.newest_ids(self.bitmap, start, max(stop - start, 0))
+        products = {product.pk: product for product in self.queryset.filter(pk__in=product_ids)}
+        return [products[product_id] for product_id in product_ids if product_id in products]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_product_index():
+    """The process-wide index, loaded or built on first use and refreshed as products change"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                index = ProductAttributeIndex()
+                if not index.load():
+                    index.rebuild()
+                _index = index
+    return _index.ensure_fresh()
+
+
+def indexed_product_list(params, queryset):
+    """An IndexedProductList for a listing request, or None when the index cannot serve it"""
+    if not settings.PRODUCT_ATTRIBUTE_INDEX_ENABLED:
+        return None
+    conditions = filter_conditions(params)
+    if conditions is None:
+        return None
+    index = get_product_index()
+    return IndexedProductList(index, index.match(conditions), queryset)
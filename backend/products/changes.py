@@ -0,0 +1,128 @@
+# products/changes.py
+"""
+Catalog changes feed (delta sync) for the mobile app and partner feeds.
+
+A sync token is an opaque cursor over two ordered sources:
+
+- products by (updated_at, id), served by the updated_at index: everything
+  created, edited or deactivated since the cursor;
+- CatalogChange rows by id: tombstones of deleted products and products
+  whose specifications, images or reviews changed.
+
+A client starts without a token (a full pull, page by page), then keeps
+calling with the `next_token` of the previous response. Only rows older than
+CATALOG_CHANGES_SETTLE_SECONDS are returned, so a write still committing with
+an earlier timestamp is not skipped. A token whose CatalogChange cursor is
+behind the oldest surviving row is refused: `prune_catalog_changes` deleted
+tombstones it would need and the client has to pull the catalog again.
+"""
+import base64
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+class ExpiredToken(InvalidToken):
+    pass
+
+
+def encode_token(updated_at, product_id, change_id):
+    payload = {
+        'u': updated_at.isoformat() if updated_at else None,
+        'p': str(product_id) if product_id else None,
+        'c': change_id,
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_token(token):
+    """(updated_at, product id, change id) of a token"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        updated_at = parse_datetime(payload['u']) if payload['u'] else None
+        change_id = int(payload['c'])
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidToken('Invalid sync token') from e
+    return updated_at, payload['p'], change_id
+
+
+def check_token_cursor(change_id):
+    """Refuse a cursor whose next CatalogChange rows were pruned (ids are never reused)"""
+    from .models import CatalogChange
+
+    oldest = CatalogChange.objects.aggregate(first=Min('pk'))['first']
+    if oldest is not None and change_id < oldest - 1:
+        raise ExpiredToken('Sync token expired, pull the full catalog again')
+
+
+def current_token():
+    """A token for "now", for consumers that just read the whole catalog another way"""
+    from .models import CatalogChange, Product
+
+    settled = timezone.now() - timedelta(seconds=settings.CATALOG_CHANGES_SETTLE_SECONDS)
+    last = Product.objects.filter(updated_at__lte=settled).order_by('-updated_at', '-pk').values_list(
+        'updated_at', 'pk'
+    ).first()
+    change_id = CatalogChange.objects.filter(changed_at__lte=settled).aggregate(last=Max('pk'))['last'] or 0
+    if last is None:
+        return encode_token(None, None, change_id)
+    return encode_token(last[0], last[1], change_id)
+
+
+def catalog_changes(token=None, limit=100):
+    """
+    One page of changes since `token`:
+    {'product_ids': {id}, 'deleted': [id], 'next_token': str, 'has_more': bool}
+    `product_ids` are the products to (re)fetch, active or not.
+    """
+    from .models import CatalogChange, Product
+
+    settled = timezone.now() - timedelta(seconds=settings.CATALOG_CHANGES_SETTLE_SECONDS)
+    if token:
+        updated_at, last_product_id, change_id = decode_token(token)
+        check_token_cursor(change_id)
+    else:
+        # A full pull: every product, and only deletions from now on
+        updated_at, last_product_id = None, None
+        change_id = CatalogChange.objects.aggregate(last=Max('pk'))['last'] or 0
+
+    products = Product.objects.filter(updated_at__lte=settled)
+    if updated_at is not None:
+        products = products.filter(
+            Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, pk__gt=last_product_id)
+        )
+    products = list(products.order_by('updated_at', 'pk').values_list('pk', 'updated_at')[:limit + 1])
+    changes = list(
+        CatalogChange.objects.filter(pk__gt=change_id)
+        .order_by('pk').values_list('pk', 'product_id', 'kind', 'changed_at')[:limit + 1]
+    )
+    # Stop at the first unsettled row: an id below it may still be committing
+    for position, change in enumerate(changes):
+        if change[3] > settled:
+            changes = changes[:position]
+            break
+    has_more = len(products) > limit or len(changes) > limit
+    products, changes = products[:limit], changes[:limit]
+
+    if products:
+        updated_at, last_product_id = products[-1][1], products[-1][0]
+    if changes:
+        change_id = changes[-1][0]
+
+    changed_ids = {product_id for product_id, _ in products}
+    changed_ids.update(product_id for _, product_id, kind, _ in changes if kind == CatalogChange.Kind.CHANGED)
+    deleted_ids = {product_id for _, product_id, kind, _ in changes if kind == CatalogChange.Kind.DELETED}
+    return {
+        'product_ids': changed_ids - deleted_ids,
+        'deleted': sorted(str(product_id) for product_id in deleted_ids),
+        'next_token': encode_token(updated_at, last_product_id, change_id),
+        'has_more': has_more,
+    }
@@ -0,0 +1,75 @@
+# products/facets.py
+"""
+Sidebar facet counts for a filtered product listing.
+
+`product_facets` takes the queryset ProductViewSet lists (after ProductFilter)
+and counts the matching products per brand, subcategory, shipping category,
+color, size and price bucket. The filtered products are used as a `pk IN
+(...)` subquery, so every facet is one grouped aggregate and the whole
+response costs a fixed six queries regardless of catalog size.
+"""
+from django.conf import settings
+from django.db.models import Count, Max, Min, Q
+
+
+def _matching_ids(queryset):
+    # Drop ordering, select_related and DISTINCT so the subquery is a plain id scan
+    return queryset.order_by().values('pk')
+
+
+def _grouped(queryset, fields, keys):
+    rows = queryset.values(*fields).annotate(count=Count('pk')).order_by('-count', fields[1])
+    return [
+        {key: row[field] for key, field in zip(keys, fields)} | {'count': row['count']}
+        for row in rows
+        if row[fields[0]] is not None
+    ]
+
+
+def price_buckets(edges=None):
+    """[(label, lower, upper)] from ascending bucket edges; the last bucket is open-ended"""
+    edges = list(settings.PRODUCT_FACET_PRICE_BUCKETS if edges is None else edges)
+    bounds = [0, *edges]
+    buckets = []
+    for index, lower in enumerate(bounds):
+        upper = bounds[index + 1] if index + 1 < len(bounds) else None
+        buckets.append((f'{lower}-{upper}' if upper is not None else f'{lower}+', lower, upper))
+    return buckets
+
+
+def product_facets(queryset):
+    """Facet counts for the products in `queryset`"""
+    from .models import Product
+
+    ids = _matching_ids(queryset)
+    products = Product.objects.filter(pk__in=ids)
+    through_colors = Product.colors.through.objects.filter(product_id__in=ids)
+    through_sizes = Product.sizes.through.objects.filter(product_id__in=ids)
+
+    buckets = price_buckets()
+    bucket_counts = {
+        f'bucket_{index}': Count('pk', filter=Q(effective_price__gte=lower, **({'effective_price__lt': upper} if upper is not None else {})))
+        for index, (_, lower, upper) in enumerate(buckets)
+    }
+    price = products.aggregate(total=Count('pk'), min_price=Min('effective_price'), max_price=Max('effective_price'), **bucket_counts)
+
+    return {
+        'total': price['total'],
+        'brands': _grouped(products, ('brand_id', 'brand__name', 'brand__slug'), ('id', 'name', 'slug')),
+        'subcategories': _grouped(
+            products, ('sub_category_id', 'sub_category__name', 'sub_category__slug'), ('id', 'name', 'slug')
+        ),
+        'shipping_categories': _grouped(
+            products, ('shipping_category_id', 'shipping_category__name'), ('id', 'name')
+        ),
+        'colors': _grouped(through_colors, ('color_id', 'color__name', 'color__hex_code'), ('id', 'name', 'hex_code')),
+        'sizes': _grouped(through_sizes, ('size_id', 'size__name'), ('id', 'name')),
+        'price': {
+            'min': price['min_price'],
+            'max': price['max_price'],
+            'buckets': [
+                {'label': label, 'min': lower, 'max': upper, 'count': price[f'bucket_{index}']}
+                for index, (label, lower, upper) in enumerate(buckets)
+            ],
+        },
+    }
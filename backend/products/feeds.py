@@ -0,0 +1,335 @@
+# products/feeds.py
+"""
+Product feeds for Google Merchant Center / Facebook catalogs (XML, CSV, NDJSON).
+
+Feeds are written under MEDIA_ROOT/feeds from `values()` projections read in
+chunks of PRODUCT_FEED_CHUNK_SIZE (one extra query per chunk for additional
+images), so no Product instances or serializers are involved and memory stays
+flat. Every product is exactly one line in every format, ordered by id.
+
+That layout makes regeneration incremental: the state file next to a feed
+keeps the changes-feed token (see products.changes) of the last run, and the
+next run only renders the products changed since then, merging them into the
+previous file line by line and dropping deleted or deactivated ones. Brand and
+category renames do not show up as product changes, so the state also keeps
+the brand/category part of the catalog signature, and a change there forces a
+full run. Output is
+written to a temporary file and renamed, optionally gzip-compressed.
+
+Feeds are only written by `python manage.py generate_product_feed` (run it from
+cron); the feed endpoint serves the last file written.
+"""
+import csv
+import gzip
+import hashlib
+import html
+import io
+import json
+import logging
+import os
+import tempfile
+from decimal import Decimal
+from itertools import islice
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from .changes import InvalidToken, catalog_changes, current_token
+from .suggest import catalog_signature
+
+logger = logging.getLogger(__name__)
+
+FEED_FORMATS = {
+    'xml': 'application/xml',
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+FEED_DIR = 'feeds'
+MAX_DESCRIPTION_LENGTH = 5000
+MAX_ADDITIONAL_IMAGES = 10
+
+FEED_COLUMNS = [
+    'id', 'title', 'description', 'link', 'image_link', 'additional_image_link',
+    'availability', 'price', 'sale_price', 'brand', 'product_type', 'condition',
+]
+
+PRODUCT_FIELDS = (
+    'pk', 'slug', 'name', 'description', 'price', 'effective_price', 'stock', 'thumbnail',
+    'brand__name', 'sub_category__name', 'sub_category__category__name',
+)
+
+
+def _one_line(value):
+    return ' '.join(str(value or '').split())
+
+
+def _money(amount):
+    return f"{Decimal(amount).quantize(Decimal('0.01'))} {settings.PRODUCT_FEED_CURRENCY}"
+
+
+def _media_url(name):
+    return f"{settings.PRODUCT_FEED_MEDIA_URL.rstrip('/')}/{name}" if name else ''
+
+
+def feed_item(row, images):
+    """Feed attributes of one product from its values() row"""
+    on_sale = row['effective_price'] is not None and row['effective_price'] < row['price']
+    product_type = ' > '.join(part for part in (row['sub_category__category__name'], row['sub_category__name']) if part)
+    return {
+        'id': str(row['pk']),
+        'title': _one_line(row['name'])[:150],
+        'description': _one_line(html.unescape(strip_tags(row['description'])))[:MAX_DESCRIPTION_LENGTH],
+        'link': f"{settings.PRODUCT_FEED_SITE_URL.rstrip('/')}/products/{row['slug']}",
+        'image_link': _media_url(row['thumbnail']) or (_media_url(images[0]) if images else ''),
+        'additional_image_link': [_media_url(image) for image in images[:MAX_ADDITIONAL_IMAGES]],
+        'availability': 'in stock' if row['stock'] > 0 else 'out of stock',
+        'price': _money(row['price']),
+        'sale_price': _money(row['effective_price']) if on_sale else '',
+        'brand': row['brand__name'] or '',
+        'product_type': product_type,
+        'condition': 'new',
+    }
+
+
+def iter_feed_items(queryset, chunk_size=None):
+    """Feed items for the products in `queryset`, ordered by id"""
+    from .models import ProductAdditionalImage
+
+    chunk_size = chunk_size or settings.PRODUCT_FEED_CHUNK_SIZE
+    rows = queryset.order_by('pk').values(*PRODUCT_FIELDS).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        images = {}
+        for product_id, image in ProductAdditionalImage.objects.filter(
+            product_id__in=[row['pk'] for row in chunk]
+        ).order_by('pk').values_list('product_id', 'image'):
+            images.setdefault(product_id, []).append(image)
+        for row in chunk:
+            yield feed_item(row, images.get(row['pk'], []))
+
+
+# ---------------------------------------------------------------------------
+# Formats: each item is one line, and `line_id` finds the product id of a line
+# ---------------------------------------------------------------------------
+
+class XMLFeed:
+    """Google Merchant RSS 2.0 feed"""
+    item_prefix = '<item><g:id>'
+
+    def header(self):
+        title = escape(settings.PRODUCT_FEED_TITLE)
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<rss version="2.0" xmlns:g="http://base.google.com/ns/1.0">\n'
+            f'<channel><title>{title}</title><link>{escape(settings.PRODUCT_FEED_SITE_URL)}</link>'
+            f'<description>{title}</description>\n'
+        )
+
+    def footer(self):
+        return '</channel>\n</rss>\n'
+
+    def render(self, item):
+        parts = [f'<g:id>{escape(item["id"])}</g:id>']
+        for column in FEED_COLUMNS[1:]:
+            value = item[column]
+            tag = column if column in ('title', 'description', 'link') else f'g:{column}'
+            for single in (value if isinstance(value, list) else [value]):
+                if single:
+                    parts.append(f'<{tag}>{escape(single)}</{tag}>')
+        return f'<item>{"".join(parts)}</item>\n'
+
+    def line_id(self, line):
+        if line.startswith(self.item_prefix):
+            return line[len(self.item_prefix):line.index('<', len(self.item_prefix))]
+        return None
+
+
+class CSVFeed:
+    def header(self):
+        return self._row(FEED_COLUMNS)
+
+    def footer(self):
+        return ''
+
+    def _row(self, values):
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator='\n').writerow(values)
+        return buffer.getvalue()
+
+    def render(self, item):
+        return self._row([
+            ','.join(item[column]) if isinstance(item[column], list) else item[column]
+            for column in FEED_COLUMNS
+        ])
+
+    def line_id(self, line):
+        product_id = line.split(',', 1)[0]
+        return None if product_id == 'id' else product_id
+
+
+class NDJSONFeed:
+    item_prefix = '{"id": "'
+
+    def header(self):
+        return ''
+
+    def footer(self):
+        return ''
+
+    def render(self, item):
+        return json.dumps(item, ensure_ascii=False) + '\n'
+
+    def line_id(self, line):
+        if line.startswith(self.item_prefix):
+            return line[len(self.item_prefix):line.index('"', len(self.item_prefix))]
+        return None
+
+
+FEED_WRITERS = {'xml': XMLFeed, 'csv': CSVFeed, 'ndjson': NDJSONFeed}
+
+
+# ---------------------------------------------------------------------------
+# Files
+# ---------------------------------------------------------------------------
+
+def feed_path(fmt, compress=False):
+    """Path of a feed relative to MEDIA_ROOT"""
+    return os.path.join(FEED_DIR, f"products.{fmt}{'.gz' if compress else ''}")
+
+
+def _open(path, mode, compress):
+    if compress:
+        return gzip.open(path, mode + 't', encoding='utf-8', newline='')
+    return open(path, mode, encoding='utf-8', newline='')
+
+
+def _temporary_path(full_path):
+    """A new, unique file next to `full_path` to write and rename over it"""
+    descriptor, path = tempfile.mkstemp(dir=os.path.dirname(full_path), suffix='.part')
+    os.close(descriptor)
+    return path
+
+
+def _state_path(full_path):
+    return f'{full_path}.state.json'
+
+
+def read_feed_state(fmt, compress=False):
+    path = _state_path(os.path.join(settings.MEDIA_ROOT, feed_path(fmt, compress)))
+    try:
+        with open(path, encoding='utf-8') as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None
+
+
+def _labels_key():
+    """Hash of the brand/category part of the catalog signature (the brand and product_type columns)"""
+    return hashlib.sha1(repr(catalog_signature()[2:]).encode()).hexdigest()
+
+
+def _active_products():
+    from .models import Product
+
+    return Product.objects.filter(is_active=True)
+
+
+def _changes_since(token):
+    """(changed product ids, deleted product ids, next token) since `token`, following every page"""
+    changed, deleted = set(), set()
+    while True:
+        changes = catalog_changes(token, limit=5000)
+        changed.update(str(product_id) for product_id in changes['product_ids'])
+        deleted.update(changes['deleted'])
+        token = changes['next_token']
+        if not changes['has_more']:
+            return changed - deleted, deleted, token
+
+
+def _merge(old_lines, writer, new_items, dropped_ids):
+    """Old item lines minus `dropped_ids`, merged by id with the re-rendered `new_items`"""
+    new_items = iter(new_items)
+    pending = next(new_items, None)
+    for line in old_lines:
+        product_id = writer.line_id(line)
+        if product_id is None:
+            continue  # header / footer
+        while pending is not None and pending['id'] < product_id:
+            yield writer.render(pending)
+            pending = next(new_items, None)
+        if pending is not None and pending['id'] == product_id:
+            continue  # replaced by the re-rendered item
+        if product_id not in dropped_ids:
+            yield line
+    while pending is not None:
+        yield writer.render(pending)
+        pending = next(new_items, None)
+
+
+def generate_feed(fmt, compress=False, full=False):
+    """
+    Write (or incrementally update) a product feed under MEDIA_ROOT/feeds.
+    Returns {'path', 'items', 'mode', 'rendered'}.
+    """
+    if fmt not in FEED_WRITERS:
+        raise ValueError(f"Unknown feed format: {fmt}")
+    writer = FEED_WRITERS[fmt]()
+    relative_path = feed_path(fmt, compress)
+    full_path = os.path.join(settings.MEDIA_ROOT, relative_path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+
+    labels_key = _labels_key()
+    state = None if full else read_feed_state(fmt, compress)
+    changes = None
+    if state and os.path.exists(full_path) and state.get('labels') == labels_key:
+        try:
+            changes = _changes_since(state['token'])
+        except InvalidToken:
+            changes = None  # too old: rebuild
+
+    tmp_path = _temporary_path(full_path)
+    items = rendered = 0
+    if changes is None:
+        mode = 'full'
+        token = current_token()
+        lines = (writer.render(item) for item in iter_feed_items(_active_products()))
+        old_handle = None
+    else:
+        mode = 'incremental'
+        changed_ids, deleted_ids, token = changes
+        # Changed products that are no longer active drop out of the merge like deleted ones
+        new_items = list(iter_feed_items(_active_products().filter(pk__in=changed_ids)))
+        rendered = len(new_items)
+        dropped_ids = deleted_ids | (changed_ids - {item['id'] for item in new_items})
+        old_handle = _open(full_path, 'r', compress)
+        lines = _merge(old_handle, writer, new_items, dropped_ids)
+
+    try:
+        with _open(tmp_path, 'w', compress) as handle:
+            handle.write(writer.header())
+            for line in lines:
+                handle.write(line)
+                items += 1
+            handle.write(writer.footer())
+        os.replace(tmp_path, full_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    finally:
+        if old_handle is not None:
+            old_handle.close()
+    if mode == 'full':
+        rendered = items
+
+    state_path = _temporary_path(full_path)
+    with open(state_path, 'w', encoding='utf-8') as handle:
+        json.dump({
+            'token': token, 'labels': labels_key, 'generated_at': timezone.now().isoformat(), 'items': items,
+        }, handle)
+    os.replace(state_path, _state_path(full_path))
+    logger.info(f"Wrote {mode} {fmt} product feed to {relative_path}: {items} items, {rendered} rendered")
+    return {'path': relative_path, 'items': items, 'mode': mode, 'rendered': rendered}
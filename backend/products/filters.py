@@ -18,11 +18,12 @@ class ProductFilter(filters.FilterSet):
     colors = CharInFilter(field_name='colors__name', lookup_expr='in') # Filter by color name
     shipping_categories = NumberInFilter(field_name='shipping_category__id', lookup_expr='in') # Filter by shipping category ID
     search = filters.CharFilter(method='filter_search')  # Custom search filter
-    min_price = filters.NumberFilter(field_name='price', lookup_expr='gte')
-    max_price = filters.NumberFilter(field_name='price', lookup_expr='lte')
+    # Price filters and sorting use what the customer pays (discount price when set)
+    min_price = filters.NumberFilter(field_name='effective_price', lookup_expr='gte')
+    max_price = filters.NumberFilter(field_name='effective_price', lookup_expr='lte')
     ordering = filters.OrderingFilter(
         fields=(
-            ('price', 'price'),
+            ('effective_price', 'price'),
             ('name', 'name'),
             ('created_at', 'created_at'),
         )
@@ -45,5 +46,8 @@ class ProductFilter(filters.FilterSet):
         ).distinct()
 
     def filter_queryset(self, queryset):
-        # Use distinct() to avoid duplicate results when filtering on ManyToMany fields
-        return super().filter_queryset(queryset).distinct()
+        # Only the colors (ManyToMany) filter can return a product twice; search applies its own distinct()
+        queryset = super().filter_queryset(queryset)
+        if self.form.cleaned_data.get('colors'):
+            queryset = queryset.distinct()
+        return queryset
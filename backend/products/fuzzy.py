@@ -0,0 +1,220 @@
+# products/fuzzy.py
+"""
+Typo-tolerant product search, used when the exact `search` filter finds
+(almost) nothing.
+
+The FuzzyIndex holds every distinct word of product, brand, category and
+subcategory names (plus adjacent words joined, so "t shirt" also gives
+"tshirt"), a trigram -> words inverted index over them, and word -> products
+postings weighted by where the word occurs (product name over brand over
+category).
+
+For each query word, candidate words are the ones sharing enough trigrams
+with it (q-gram lemma: an edit touches at most three padded trigrams, a
+transposition four), so candidates come from the index and never from a
+catalog scan. Candidates are then checked with a bounded Damerau-Levenshtein distance: no typo allowed for
+words under four characters, one up to six, two beyond. A product matches
+when every query word matches one of its words (short words matching nothing
+at all are skipped); products are ranked by the summed similarity.
+
+The index is rebuilt when the catalog signature (see products.suggest)
+changes, checked at most every PRODUCT_FUZZY_REFRESH_INTERVAL seconds by a
+background thread; requests keep using the previous index meanwhile.
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection
+
+from .suggest import catalog_signature
+
+logger = logging.getLogger(__name__)
+
+NAME_WEIGHT = 1.0
+BRAND_WEIGHT = 0.9
+CATEGORY_WEIGHT = 0.7
+MAX_CANDIDATES = 50  # candidate words per query word checked with edit distance
+
+_JOINERS = re.compile(r"['\u2019\-]")
+_SEPARATORS = re.compile(r'[^\w]+')
+
+
+def fuzzy_words(value):
+    """Case-folded words, with hyphens and apostrophes removed ("T-Shirt" -> ["tshirt"])"""
+    value = _JOINERS.sub('', (value or '').casefold())
+    return [word for word in _SEPARATORS.split(value) if word]
+
+
+def name_terms(value):
+    words = fuzzy_words(value)
+    return set(words) | {first + second for first, second in zip(words, words[1:])}
+
+
+def trigrams(word):
+    padded = f' {word} '
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+
+def allowed_edits(word):
+    if len(word) < 4:
+        return 0
+    return 1 if len(word) <= 6 else 2
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance, or limit + 1 once it is known to exceed `limit`"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = current[0]
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if previous2 is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        if row_min > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class FuzzyIndex:
+    def __init__(self, signature=None):
+        self.signature = signature
+        self.terms = []         # term id -> word
+        self.term_ids = {}      # word -> term id
+        self.grams = {}         # trigram -> [term id]
+        self.postings = {}      # term id -> {product id: weight}
+
+    def _add(self, term, product_id, weight):
+        term_id = self.term_ids.get(term)
+        if term_id is None:
+            term_id = len(self.terms)
+            self.terms.append(term)
+            self.term_ids[term] = term_id
+            for gram in trigrams(term):
+                self.grams.setdefault(gram, []).append(term_id)
+            self.postings[term_id] = {}
+        posting = self.postings[term_id]
+        if posting.get(product_id, 0) < weight:
+            posting[product_id] = weight
+
+    def build(self):
+        from .models import Product
+
+        started = time.monotonic()
+        for product_id, name, brand, category, subcategory in Product.objects.filter(is_active=True).values_list(
+            'pk', 'name', 'brand__name', 'sub_category__category__name', 'sub_category__name'
+        ).iterator(chunk_size=5000):
+            for term in name_terms(name):
+                self._add(term, product_id, NAME_WEIGHT)
+            for term in name_terms(brand):
+                self._add(term, product_id, BRAND_WEIGHT)
+            for term in name_terms(category) | name_terms(subcategory):
+                self._add(term, product_id, CATEGORY_WEIGHT)
+        logger.info(
+            f"Fuzzy index built: {len(self.terms)} words, {len(self.grams)} trigrams "
+            f"in {time.monotonic() - started:.2f}s"
+        )
+        return self
+
+    def similar_terms(self, word):
+        """[(term id, similarity)] of indexed words within the allowed edit distance of `word`"""
+        limit = allowed_edits(word)
+        exact = self.term_ids.get(word)
+        if limit == 0:
+            return [(exact, 1.0)] if exact is not None else []
+
+        word_grams = trigrams(word)
+        needed = max(1, len(word_grams) - 4 * limit)
+        shared = Counter()
+        for gram in word_grams:
+            shared.update(self.grams.get(gram, ()))
+        matches = []
+        for term_id, count in shared.most_common(MAX_CANDIDATES):
+            if count < needed:
+                break
+            distance = edit_distance(word, self.terms[term_id], limit)
+            if distance <= limit:
+                matches.append((term_id, 1.0 - distance / max(len(word), len(self.terms[term_id]))))
+        return matches
+
+    def search(self, query, limit=200):
+        """Product ids matching every word of `query`, best first"""
+        words = fuzzy_words(query)
+        if not words:
+            return []
+        scores = None
+        for word in words:
+            word_scores = {}
+            for term_id, similarity in self.similar_terms(word):
+                for product_id, weight in self.postings[term_id].items():
+                    score = similarity * weight
+                    if score > word_scores.get(product_id, 0):
+                        word_scores[product_id] = score
+            if not word_scores and allowed_edits(word) == 0 and len(words) > 1:
+                continue  # a short word that matches nothing exactly is most likely a typo ("bby")
+            if scores is None:
+                scores = word_scores
+            else:
+                scores = {product_id: score + word_scores[product_id]
+                          for product_id, score in scores.items() if product_id in word_scores}
+            if not scores:
+                return []
+        if scores is None:
+            return []  # every word was a short one matching nothing
+        return sorted(scores, key=lambda product_id: (-scores[product_id], str(product_id)))[:limit]
+
+
+_index = None
+_checked_at = 0.0
+_refreshing = False
+_lock = threading.Lock()
+
+
+def _current_index(index):
+    signature = catalog_signature()
+    if index is not None and index.signature == signature:
+        return index
+    return FuzzyIndex(signature).build()
+
+
+def _refresh():
+    global _index, _checked_at, _refreshing
+    try:
+        _index = _current_index(_index)
+    except Exception as e:
+        logger.error(f"Fuzzy index refresh failed: {e}", exc_info=True)
+    finally:
+        _checked_at = time.monotonic()
+        _refreshing = False
+        connection.close()
+
+
+def get_fuzzy_index():
+    """The process-wide index; refreshed in a background thread, so requests never wait for a rebuild"""
+    global _index, _checked_at, _refreshing
+    if _index is None:
+        with _lock:
+            if _index is None:
+                _index = _current_index(None)
+                _checked_at = time.monotonic()
+    elif not _refreshing and time.monotonic() - _checked_at >= settings.PRODUCT_FUZZY_REFRESH_INTERVAL:
+        with _lock:
+            if not _refreshing:
+                _refreshing = True
+                threading.Thread(target=_refresh, name='fuzzy-index-refresh', daemon=True).start()
+    return _index
+
+
+def fuzzy_product_ids(query, limit=None):
+    return get_fuzzy_index().search(query, limit or settings.PRODUCT_FUZZY_MAX_RESULTS)
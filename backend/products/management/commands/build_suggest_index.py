@@ -0,0 +1,32 @@
+"""
+Django management command to build the autocomplete suggest index snapshot
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from products.suggest import build_index, write_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Build the product autocomplete index and write it to PRODUCT_SUGGEST_SNAPSHOT_PATH'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', help='Write the snapshot here instead of PRODUCT_SUGGEST_SNAPSHOT_PATH')
+
+    def handle(self, *args, **options):
+        self.stdout.write('🔤 Building suggest index...')
+        index = build_index()
+        kinds = {}
+        for kind, _, _, _ in index.entries:
+            kinds[kind] = kinds.get(kind, 0) + 1
+        for kind, count in sorted(kinds.items()):
+            self.stdout.write(f'  {kind}: {count}')
+
+        path = options['path'] or settings.PRODUCT_SUGGEST_SNAPSHOT_PATH
+        if not path:
+            self.stdout.write(self.style.WARNING(
+                'No snapshot path (set PRODUCT_SUGGEST_SNAPSHOT_PATH or pass --path) - nothing was written'
+            ))
+            return
+        write_snapshot(index, path)
+        self.stdout.write(self.style.SUCCESS(f'✅ Wrote {len(index.keys)} keys for {len(index)} entries to {path}'))
@@ -0,0 +1,27 @@
+"""
+Django management command to write the Google Merchant / Facebook product feeds
+"""
+from django.core.management.base import BaseCommand
+
+from products.feeds import FEED_FORMATS, generate_feed
+
+
+class Command(BaseCommand):
+    help = 'Write product feeds under MEDIA_ROOT/feeds (incrementally, from the changes since the last run)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format', choices=[*FEED_FORMATS, 'all'], default='all', help='Feed format to write'
+        )
+        parser.add_argument('--gzip', action='store_true', help='Write gzip-compressed feeds (products.<format>.gz)')
+        parser.add_argument('--full', action='store_true', help='Rebuild from scratch instead of applying changes')
+
+    def handle(self, *args, **options):
+        formats = list(FEED_FORMATS) if options['format'] == 'all' else [options['format']]
+        for fmt in formats:
+            self.stdout.write(f'📦 Writing {fmt} feed...')
+            result = generate_feed(fmt, compress=options['gzip'], full=options['full'])
+            self.stdout.write(
+                f"  {result['mode']}: {result['items']} items ({result['rendered']} rendered) -> {result['path']}"
+            )
+        self.stdout.write(self.style.SUCCESS(f'✅ Wrote {len(formats)} product feed(s)'))
@@ -0,0 +1,33 @@
+"""
+Django management command to prune old catalog change log rows
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from products.models import CatalogChange
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete CatalogChange rows older than CATALOG_CHANGES_RETENTION_DAYS '
+        '(sync tokens from before the oldest kept row are refused)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only count the rows that would be deleted')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=settings.CATALOG_CHANGES_RETENTION_DAYS)
+        # The newest row is always kept: it marks where pruning stopped for token checks
+        newest = CatalogChange.objects.order_by('-pk').values_list('pk', flat=True).first()
+        stale = CatalogChange.objects.filter(changed_at__lt=cutoff).exclude(pk=newest)
+        count = stale.count()
+        self.stdout.write(f'🧹 {count} catalog changes older than {settings.CATALOG_CHANGES_RETENTION_DAYS} days')
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('Dry run - nothing was changed'))
+            return
+        stale.delete()
+        self.stdout.write(self.style.SUCCESS(f'✅ Pruned {count} catalog changes'))
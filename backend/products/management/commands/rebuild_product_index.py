@@ -0,0 +1,33 @@
+"""
+Django management command to rebuild the product attribute index
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from products.attribute_index import ProductAttributeIndex
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the in-memory product attribute index and persist it to PRODUCT_ATTRIBUTE_INDEX_PATH'
+
+    def handle(self, *args, **options):
+        self.stdout.write('🧮 Rebuilding product attribute index...')
+        started = time.monotonic()
+        index = ProductAttributeIndex().rebuild()
+        attributes = {}
+        for attribute, _ in index.bitmaps:
+            attributes[attribute] = attributes.get(attribute, 0) + 1
+        for attribute, count in sorted(attributes.items()):
+            self.stdout.write(f'  {attribute}: {count} values')
+
+        if settings.PRODUCT_ATTRIBUTE_INDEX_PATH:
+            self.stdout.write(f'  saved to {settings.PRODUCT_ATTRIBUTE_INDEX_PATH}')
+        else:
+            self.stdout.write(self.style.WARNING(
+                'PRODUCT_ATTRIBUTE_INDEX_PATH is not set - each worker builds its own index on first use'
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Indexed {index.active.bit_count()} active products in {time.monotonic() - started:.2f}s'
+        ))
@@ -132,7 +132,6 @@ class Migration(migrations.Migration):
                 ('updated_at', models.DateTimeField(auto_now=True)),
                 ('brand', models.ForeignKey(blank=True, help_text='Product brand', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='products', to='products.brand')),
                 ('colors', models.ManyToManyField(blank=True, related_name='products', to='products.color')),
-                ('shipping_category', models.ForeignKey(blank=True, help_text='Determines which shipping methods are available for this product', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='products', to='orders.shippingcategory')),
             ],
             options={
                 'ordering': ['-created_at'],
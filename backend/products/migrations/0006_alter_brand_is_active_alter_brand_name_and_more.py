@@ -1,5 +1,6 @@
 # Generated by Django 5.2.4 on 2025-10-24 06:12
 
+import django.db.models.deletion
 from django.conf import settings
 from django.db import migrations, models
 
@@ -14,6 +15,13 @@ class Migration(migrations.Migration):
     ]
 
     operations = [
+        # Added here rather than in 0001: orders.ShippingCategory is created by
+        # orders.0002, which itself depends on products.0005
+        migrations.AddField(
+            model_name='product',
+            name='shipping_category',
+            field=models.ForeignKey(blank=True, help_text='Determines which shipping methods are available for this product', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='products', to='orders.shippingcategory'),
+        ),
         migrations.AlterField(
             model_name='brand',
             name='is_active',
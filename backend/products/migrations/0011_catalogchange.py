@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-19 03:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_searchquery'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_id', models.UUIDField(help_text='Product the change applies to (kept after the product is deleted)')),
+                ('kind', models.CharField(choices=[('CHANGED', 'Changed'), ('DELETED', 'Deleted')], max_length=10)),
+                ('changed_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Catalog Change',
+                'verbose_name_plural': 'Catalog Changes',
+                'ordering': ['id'],
+            },
+        ),
+    ]
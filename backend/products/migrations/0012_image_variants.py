@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-19 03:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_catalogchange'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='brand',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Responsive WebP/JPEG variants of the image (utils.image_variants)'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Responsive WebP/JPEG variants of the image (utils.image_variants)'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Responsive WebP/JPEG variants of the image (utils.image_variants)'),
+        ),
+        migrations.AddField(
+            model_name='productadditionalimage',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Responsive WebP/JPEG variants of the image (utils.image_variants)'),
+        ),
+        migrations.AddField(
+            model_name='subcategory',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Responsive WebP/JPEG variants of the image (utils.image_variants)'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 04:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0012_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchquery',
+            name='is_hidden',
+            field=models.BooleanField(default=False, help_text='Never suggest this query (still counted)'),
+        ),
+    ]
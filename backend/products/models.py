@@ -1,15 +1,18 @@
 # products/models.py
 import uuid
 from django.db import models # type: ignore
+from django.db.models.signals import m2m_changed, post_delete
+from django.dispatch import receiver
 from django.conf import settings
 from shops.models import Shop
 from ckeditor.fields import RichTextField # type: ignore
-from utils.image_optimizer import ImageOptimizer
+from utils.image_jobs import queue_image_processing
 
 
 class Brand(models.Model):
     name = models.CharField(max_length=100, unique=True, help_text="e.g., Nike, Apple, Samsung", db_index=True)
     logo = models.ImageField(upload_to='brands/', blank=True, null=True, help_text="Brand logo image")
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, help_text="Responsive WebP/JPEG variants of the image (utils.image_variants)")
     description = models.TextField(blank=True, help_text="Brief description of the brand")
     website = models.URLField(blank=True, help_text="Official brand website")
     slug = models.SlugField(unique=True, help_text="URL-friendly brand name", db_index=True)
@@ -24,15 +27,8 @@ class Brand(models.Model):
         return self.name
     
     def save(self, *args, **kwargs):
-        # Optimize logo image before saving
-        if self.logo and hasattr(self.logo, 'file'):
-            try:
-                optimized = ImageOptimizer.optimize_logo_image(self.logo.file)
-                if optimized:
-                    self.logo.file = optimized
-            except Exception as e:
-                print(f"Error optimizing brand logo: {e}")
         super().save(*args, **kwargs)
+        queue_image_processing(self, 'logo', 'logo')
 
 class Color(models.Model):
     name = models.CharField(max_length=50, unique=True, help_text="e.g., Red, Ocean Blue")
@@ -56,6 +52,7 @@ class Size(models.Model):
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True, db_index=True)
     image = models.ImageField(upload_to='categories/', blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, help_text="Responsive WebP/JPEG variants of the image (utils.image_variants)")
     slug = models.SlugField(unique=True, db_index=True)
     
     class Meta:
@@ -66,15 +63,8 @@ class Category(models.Model):
         return self.name
     
     def save(self, *args, **kwargs):
-        # Optimize category image before saving
-        if self.image and hasattr(self.image, 'file'):
-            try:
-                optimized = ImageOptimizer.optimize_category_image(self.image.file)
-                if optimized:
-                    self.image.file = optimized
-            except Exception as e:
-                print(f"Error optimizing category image: {e}")
         super().save(*args, **kwargs)
+        queue_image_processing(self, 'image', 'category')
     
     def get_sections(self):
         """Get all sections this category is part of"""
@@ -93,6 +83,7 @@ class Category(models.Model):
 class SubCategory(models.Model):
     name = models.CharField(max_length=100, db_index=True)
     image = models.ImageField(upload_to='subcategories/', blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, help_text="Responsive WebP/JPEG variants of the image (utils.image_variants)")
     slug = models.SlugField(unique=True, db_index=True)
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='subcategories', db_index=True)
     
@@ -107,15 +98,8 @@ class SubCategory(models.Model):
         return f"{self.name} ({self.category.name})"
     
     def save(self, *args, **kwargs):
-        # Optimize subcategory image before saving
-        if self.image and hasattr(self.image, 'file'):
-            try:
-                optimized = ImageOptimizer.optimize_category_image(self.image.file)
-                if optimized:
-                    self.image.file = optimized
-            except Exception as e:
-                print(f"Error optimizing subcategory image: {e}")
         super().save(*args, **kwargs)
+        queue_image_processing(self, 'image', 'category')
 
 class Product(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -136,6 +120,16 @@ class Product(models.Model):
     )
     price = models.DecimalField(max_digits=10, decimal_places=2, db_index=True)
     discount_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    # What a retail customer pays; computed by the database so price filters and sorting can use an index
+    effective_price = models.GeneratedField(
+        expression=models.Case(
+            models.When(discount_price__gt=0, then=models.F('discount_price')),
+            default=models.F('price'),
+        ),
+        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        db_persist=True,
+        help_text="Discount price when set, otherwise the regular price",
+    )
     wholesale_price = models.DecimalField(
         max_digits=10, 
         decimal_places=2, 
@@ -209,32 +203,34 @@ class Product(models.Model):
     )
     
     thumbnail = models.ImageField(upload_to='products/thumbnails/', blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, help_text="Responsive WebP/JPEG variants of the image (utils.image_variants)")
     colors = models.ManyToManyField(Color, blank=True, related_name='products')
     sizes = models.ManyToManyField(Size, blank=True, related_name='products')
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
+
     class Meta:
         ordering = ['-created_at']  # Order by newest first
         indexes = [
             models.Index(fields=['-created_at'], name='product_created_idx'),
             models.Index(fields=['is_active', '-created_at'], name='product_active_created_idx'),
             models.Index(fields=['sub_category', 'is_active'], name='product_subcat_active_idx'),
+            # Partial on is_active: the ORM renders is_active=True as a bare boolean term, which a
+            # leading is_active column cannot serve but a matching index condition can
+            models.Index(fields=['effective_price'], condition=models.Q(is_active=True), name='product_active_price_idx'),
+            models.Index(
+                fields=['sub_category', 'effective_price'], condition=models.Q(is_active=True),
+                name='product_subcat_price_idx',
+            ),
         ]
 
     def __str__(self):
         return self.name
     
     def save(self, *args, **kwargs):
-        # Optimize product thumbnail before saving
-        if self.thumbnail and hasattr(self.thumbnail, 'file'):
-            try:
-                optimized = ImageOptimizer.optimize_product_image(self.thumbnail.file)
-                if optimized:
-                    self.thumbnail.file = optimized
-            except Exception as e:
-                print(f"Error optimizing product thumbnail: {e}")
         super().save(*args, **kwargs)
+        queue_image_processing(self, 'thumbnail', 'product')
     
     def get_sections(self):
         """Get all sections this product is part of"""
@@ -253,21 +249,16 @@ class Product(models.Model):
 class ProductAdditionalImage(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='additional_images')
     image = models.ImageField(upload_to='products/additional_images/')
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, help_text="Responsive WebP/JPEG variants of the image (utils.image_variants)")
     class Meta:
         verbose_name_plural = "Product Additional Images"
     def __str__(self):
         return f"Image for {self.product.name}"
     
     def save(self, *args, **kwargs):
-        # Optimize additional product image before saving
-        if self.image and hasattr(self.image, 'file'):
-            try:
-                optimized = ImageOptimizer.optimize_product_image(self.image.file)
-                if optimized:
-                    self.image.file = optimized
-            except Exception as e:
-                print(f"Error optimizing additional product image: {e}")
         super().save(*args, **kwargs)
+        queue_image_processing(self, 'image', 'product')
+        CatalogChange.record([self.product_id], CatalogChange.Kind.CHANGED)
 
 class ProductAdditionalDescription(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='additional_descriptions')
@@ -284,6 +275,10 @@ class ProductSpecification(models.Model):
     def __str__(self):
         return f"{self.name}: {self.value}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        CatalogChange.record([self.product_id], CatalogChange.Kind.CHANGED)
+
 class Review(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='reviews', db_index=True)
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reviews', db_index=True)
@@ -297,6 +292,106 @@ class Review(models.Model):
             models.Index(fields=['product', 'rating'], name='review_product_rating_idx'),
         ]
 
+    def save(self, *args, **kwargs):
+        # Reviews feed the product's rating and review count
+        super().save(*args, **kwargs)
+        CatalogChange.record([self.product_id], CatalogChange.Kind.CHANGED)
+
+
+class SearchQuery(models.Model):
+    """Normalized storefront search queries, counted to rank autocomplete suggestions"""
+    query = models.CharField(max_length=100, unique=True)
+    hits = models.PositiveIntegerField(default=0)
+    is_hidden = models.BooleanField(default=False, help_text="Never suggest this query (still counted)")
+    last_searched_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-hits']
+        verbose_name = "Search Query"
+        verbose_name_plural = "Search Queries"
+
+    def __str__(self):
+        return f"{self.query} ({self.hits})"
+
+    @classmethod
+    def record(cls, query, hits=1):
+        """
+        Count `hits` searches for `query` (normalized the way suggestions match it).
+        The storefront goes through suggest.record_search, which batches these writes.
+        """
+        from .suggest import normalize
+
+        query = normalize(query)[:100]
+        if len(query) < 2:
+            return
+        if not cls.objects.filter(query=query).update(hits=models.F('hits') + hits):
+            cls.objects.get_or_create(query=query, defaults={'hits': hits})
+
+
+class CatalogChange(models.Model):
+    """
+    Change log behind the catalog changes feed, for what Product.updated_at
+    cannot show: deleted products (tombstones) and changes to a product's
+    specifications, images, reviews, colors and sizes. The auto-increment id is
+    the feed cursor.
+    """
+    class Kind(models.TextChoices):
+        CHANGED = 'CHANGED', 'Changed'
+        DELETED = 'DELETED', 'Deleted'
+
+    product_id = models.UUIDField(help_text="Product the change applies to (kept after the product is deleted)")
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    changed_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = "Catalog Change"
+        verbose_name_plural = "Catalog Changes"
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.product_id}"
+
+    @classmethod
+    def record(cls, product_ids, kind):
+        cls.objects.bulk_create([cls(product_id=product_id, kind=kind) for product_id in product_ids], batch_size=500)
+
+
+@receiver(m2m_changed, sender=Product.colors.through)
+@receiver(m2m_changed, sender=Product.sizes.through)
+def record_product_attribute_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Colors and sizes are many-to-many, so changing them does not touch Product.updated_at"""
+    if reverse:
+        # color.products.add() etc.: the color or size is the instance, the products are in pk_set
+        if action == 'pre_clear':
+            field = 'colors' if sender is Product.colors.through else 'sizes'
+            product_ids = list(Product.objects.filter(**{field: instance}).values_list('pk', flat=True))
+        elif action in ('post_add', 'post_remove'):
+            product_ids = pk_set
+        else:
+            return
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        product_ids = [instance.pk]
+    else:
+        return
+    if product_ids:
+        CatalogChange.record(product_ids, CatalogChange.Kind.CHANGED)
+
+
+@receiver(post_delete, sender=Product)
+def record_product_deletion(sender, instance, **kwargs):
+    """Tombstone for the changes feed, also when a shop or user deletion cascades to the product"""
+    CatalogChange.record([instance.pk], CatalogChange.Kind.DELETED)
+
+
+@receiver(post_delete, sender=ProductAdditionalImage)
+@receiver(post_delete, sender=ProductSpecification)
+@receiver(post_delete, sender=Review)
+def record_product_detail_deletion(sender, instance, origin=None, **kwargs):
+    """Deleting an image, specification or review changes its product, however the delete started"""
+    if isinstance(origin, Product) or getattr(origin, 'model', None) is Product:
+        return  # the product goes too and gets a tombstone
+    CatalogChange.record([instance.product_id], CatalogChange.Kind.CHANGED)
+
 
 # NOTE: Category-level minimum order quantity model removed.
 # The per-product `minimum_purchase` field on `Product` is used instead.
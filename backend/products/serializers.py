@@ -2,13 +2,15 @@
 from rest_framework import serializers
 from .models import *
 from shops.serializers import ShopSerializer
+from utils.image_variants import srcset_data
 
 class BrandSerializer(serializers.ModelSerializer):
     logo_url = serializers.SerializerMethodField()
+    logo_srcset = serializers.SerializerMethodField()
     
     class Meta:
         model = Brand
-        fields = ['id', 'name', 'slug', 'logo', 'logo_url', 'description', 'website', 'is_active']
+        fields = ['id', 'name', 'slug', 'logo', 'logo_url', 'logo_srcset', 'description', 'website', 'is_active']
     
     def get_logo_url(self, obj):
         request = self.context.get('request')
@@ -18,6 +20,9 @@ class BrandSerializer(serializers.ModelSerializer):
             return obj.logo.url
         return None
 
+    def get_logo_srcset(self, obj):
+        return srcset_data(obj.image_variants.get('logo'), self.context.get('request'))
+
 class ColorSerializer(serializers.ModelSerializer):
     class Meta:
         model = Color
@@ -30,9 +35,10 @@ class SizeSerializer(serializers.ModelSerializer):
 
 class SubCategorySerializer(serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
     class Meta:
         model = SubCategory
-        fields = ['id','name','slug','image','image_url','category']
+        fields = ['id','name','slug','image','image_url','image_srcset','category']
 
     def get_image_url(self, obj):
         request = self.context.get('request')
@@ -42,16 +48,20 @@ class SubCategorySerializer(serializers.ModelSerializer):
             return obj.image.url
         return None
 
+    def get_image_srcset(self, obj):
+        return srcset_data(obj.image_variants.get('image'), self.context.get('request'))
+
 class CategorySerializer(serializers.ModelSerializer):
     subcategories = SubCategorySerializer(many=True, read_only=True)
     total_products = serializers.IntegerField(read_only=True)
     sub_category_count = serializers.IntegerField(read_only=True)
     image_url = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Category
         fields = [
-            'id', 'name', 'slug', 'image', 'image_url',
+            'id', 'name', 'slug', 'image', 'image_url', 'image_srcset',
             'subcategories', 'total_products', 'sub_category_count'
         ]
 
@@ -63,6 +73,9 @@ class CategorySerializer(serializers.ModelSerializer):
             return obj.image.url
         return None
 
+    def get_image_srcset(self, obj):
+        return srcset_data(obj.image_variants.get('image'), self.context.get('request'))
+
 class ShippingCategorySerializer(serializers.ModelSerializer):
     class Meta:
         # Import the model dynamically to avoid circular imports
@@ -77,14 +90,17 @@ class ProductSpecificationSerializer(serializers.ModelSerializer):
 
 class ProductAdditionalImageSerializer(serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
     class Meta:
         model = ProductAdditionalImage
-        fields = ['id', 'image']
+        fields = ['id', 'image', 'image_srcset']
     def get_image(self, obj):
         request = self.context.get('request')
         if obj.image and hasattr(obj.image, 'url'):
             return request.build_absolute_uri(obj.image.url)
         return None
+    def get_image_srcset(self, obj):
+        return srcset_data(obj.image_variants.get('image'), self.context.get('request'))
 
 class ReviewSerializer(serializers.ModelSerializer):
     user = serializers.StringRelatedField()
@@ -103,16 +119,18 @@ class ProductSerializer(serializers.ModelSerializer):
     colors = ColorSerializer(many=True, read_only=True)
     sizes = SizeSerializer(many=True, read_only=True)
     thumbnail_url = serializers.SerializerMethodField()
+    thumbnail_srcset = serializers.SerializerMethodField()
     rating = serializers.SerializerMethodField()
     review_count = serializers.SerializerMethodField()
+    effective_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
 
     class Meta:
         model = Product
         fields = [
             'id', 'shop', 'brand', 'name', 'slug', 'description', 'sub_category', 'shipping_category',
-            'price', 'discount_price', 'wholesale_price', 'minimum_purchase', 'affiliate_commission_rate', 'stock', 'is_active',
+            'price', 'discount_price', 'effective_price', 'wholesale_price', 'minimum_purchase', 'affiliate_commission_rate', 'stock', 'is_active',
             'weight', 'length', 'width', 'height',  # Added physical properties for shipping
-            'thumbnail_url', 'specifications', 'additional_images',
+            'thumbnail_url', 'thumbnail_srcset', 'specifications', 'additional_images',
             'colors', 'sizes', 'reviews', 'rating', 'review_count',
             'enable_landing_page', 'landing_features', 'landing_how_to_use', 'landing_why_choose'  # Landing page fields
         ]
@@ -122,6 +140,9 @@ class ProductSerializer(serializers.ModelSerializer):
         if obj.thumbnail and hasattr(obj.thumbnail, 'url'):
             return request.build_absolute_uri(obj.thumbnail.url)
         return None
+
+    def get_thumbnail_srcset(self, obj):
+        return srcset_data(obj.image_variants.get('thumbnail'), self.context.get('request'))
         
     def get_rating(self, obj):
         from django.db.models import Avg
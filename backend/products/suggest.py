@@ -0,0 +1,458 @@
+# products/suggest.py
+"""
+Search-as-you-type suggestions for the storefront.
+
+A SuggestIndex is an immutable sorted-array index over product, brand,
+category and subcategory names plus popular search queries. Every name is
+indexed once per word ("samsung galaxy s24" under "samsung galaxy s24",
+"galaxy s24" and "s24"), so a query resolves with two bisects to the range of
+keys it prefixes; the heaviest distinct entries of that range are the
+suggestions. Results of one- and two-character prefixes, whose ranges are
+large, are memoized per index.
+
+Weights: products by units sold, brands/categories/subcategories by the sum
+of their products' weights, queries by how often they were searched.
+Searches are counted in memory and written every
+PRODUCT_SEARCH_RECORD_INTERVAL seconds (`record_search`); only searches that
+found products are counted, and queries hidden in the admin are never
+suggested.
+
+The process-wide index is swapped, never mutated. At most every
+PRODUCT_SUGGEST_REFRESH_INTERVAL seconds a background thread compares a cheap
+catalog signature with the one the index was built from. When only products
+changed, the catalog changes feed since the index's sync token is applied to
+a copy of the index (`updated_index`); brand or category changes, more than
+PRODUCT_SUGGEST_MAX_DELTA changed products, and PRODUCT_SUGGEST_MAX_AGE (to
+pick up new popularity) rebuild it. Requests keep using the current index
+meanwhile; only the first request of a process waits for one. With
+PRODUCT_SUGGEST_SNAPSHOT_PATH set, the index is shared through a compressed
+snapshot: the worker that refreshes writes it, the others load it when its
+signature matches theirs.
+"""
+import hashlib
+import heapq
+import logging
+import os
+import pickle
+import re
+import threading
+import time
+import uuid
+import zlib
+from bisect import bisect_left
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PRODUCT = 'product'
+BRAND = 'brand'
+CATEGORY = 'category'
+SUBCATEGORY = 'subcategory'
+QUERY = 'query'
+
+PREFIX_END = '\uffff'  # sorts after every character used in keys
+MEMO_PREFIX_LENGTH = 2
+SNAPSHOT_VERSION = 2
+
+_APOSTROPHES = re.compile(r"['\u2019]")
+_SEPARATORS = re.compile(r'[^\w]+')
+
+
+def normalize(value):
+    """Case-folded words separated by single spaces ("Johnson's Baby-Oil" -> "johnsons baby oil")"""
+    value = _APOSTROPHES.sub('', (value or '').casefold())
+    return ' '.join(_SEPARATORS.split(value)).strip()
+
+
+def word_keys(label, entry_id):
+    """(key, entry_id) for every word suffix of a label"""
+    words = normalize(label).split(' ')
+    return [(' '.join(words[start:]), entry_id) for start in range(len(words)) if words[start]]
+
+
+class SuggestIndex:
+    def __init__(self, entries, signature=None, built_at=None, keys=None, key_entries=None,
+                 sources=None, products=None, token=None):
+        """
+        `entries`: [(kind, label, slug, weight)], None for a removed entry
+        `sources`: {(kind, pk): entry_id}
+        `products`: {product pk: (brand_id, subcategory_id, category_id, weight)}
+        `token`: catalog changes sync token the index is current with
+        """
+        self.entries = entries
+        self.signature = signature
+        self.built_at = time.time() if built_at is None else built_at
+        if keys is None:
+            pairs = []
+            for entry_id, (_, label, _, _) in enumerate(entries):
+                pairs.extend(word_keys(label, entry_id))
+            pairs.sort()
+            keys = [key for key, _ in pairs]
+            key_entries = [entry_id for _, entry_id in pairs]
+        self.keys = keys
+        self.key_entries = key_entries
+        self.sources = sources or {}
+        self.products = products or {}
+        self.token = token
+        self._memo = {}
+
+    def __len__(self):
+        return len(self.sources) if self.sources else len(self.entries)
+
+    def _top(self, prefix, limit):
+        lo = bisect_left(self.keys, prefix)
+        hi = bisect_left(self.keys, prefix + PREFIX_END, lo)
+        entry_ids = set(self.key_entries[lo:hi])
+        return heapq.nlargest(limit, entry_ids, key=lambda entry_id: (self.entries[entry_id][3], -entry_id))
+
+    def suggest(self, query, limit=8, kinds=None):
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        # Over-fetch so a kinds filter still fills the page
+        wanted = limit if kinds is None else limit * 4
+        if len(prefix) <= MEMO_PREFIX_LENGTH:
+            memo_key = (prefix, wanted)
+            if memo_key not in self._memo:
+                self._memo[memo_key] = self._top(prefix, wanted)
+            entry_ids = self._memo[memo_key]
+        else:
+            entry_ids = self._top(prefix, wanted)
+
+        suggestions = []
+        for entry_id in entry_ids:
+            kind, label, slug, weight = self.entries[entry_id]
+            if kinds is not None and kind not in kinds:
+                continue
+            suggestions.append({'type': kind, 'label': label, 'slug': slug, 'weight': weight})
+            if len(suggestions) >= limit:
+                break
+        return suggestions
+
+    def with_products(self, rows, units, touched, signature, token):
+        """
+        A copy with the `touched` products replaced by `rows` (active products,
+        as selected by build_entries) and brand/category weights adjusted.
+        Replaced entries become None and their keys are dropped; new keys are
+        merged into the sorted arrays, so nothing is re-sorted.
+        """
+        entries = list(self.entries)
+        sources = dict(self.sources)
+        products = dict(self.products)
+        dropped = set()
+
+        def shift(groups, sign):
+            brand_id, subcategory_id, category_id, weight = groups
+            for source in ((BRAND, brand_id), (SUBCATEGORY, subcategory_id), (CATEGORY, category_id)):
+                entry_id = sources.get(source)
+                if entry_id is not None:
+                    kind, label, slug, total = entries[entry_id]
+                    entries[entry_id] = (kind, label, slug, total + sign * weight)
+
+        for product_id in touched:
+            entry_id = sources.pop((PRODUCT, product_id), None)
+            if entry_id is not None:
+                entries[entry_id] = None
+                dropped.add(entry_id)
+                shift(products.pop(product_id), -1)
+
+        pairs = []
+        for product_id, name, slug, brand_id, subcategory_id, category_id in rows:
+            weight = 1 + (units.get(product_id) or 0)
+            entry_id = len(entries)
+            entries.append((PRODUCT, name, slug, weight))
+            sources[(PRODUCT, product_id)] = entry_id
+            products[product_id] = (brand_id, subcategory_id, category_id, weight)
+            shift(products[product_id], 1)
+            pairs.extend(word_keys(name, entry_id))
+        pairs.sort()
+
+        kept = ((key, entry_id) for key, entry_id in zip(self.keys, self.key_entries) if entry_id not in dropped)
+        merged = list(heapq.merge(kept, pairs))
+        return SuggestIndex(
+            entries, signature, self.built_at,
+            [key for key, _ in merged], [entry_id for _, entry_id in merged],
+            sources, products, token,
+        )
+
+    # ------------------------------------------------------------------
+    # Snapshots
+    # ------------------------------------------------------------------
+
+    def dumps(self):
+        state = {
+            'version': SNAPSHOT_VERSION, 'signature': self.signature, 'built_at': self.built_at,
+            'entries': self.entries, 'keys': self.keys, 'key_entries': self.key_entries,
+            'sources': self.sources, 'products': self.products, 'token': self.token,
+        }
+        return zlib.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL))
+
+    @classmethod
+    def loads(cls, data):
+        state = pickle.loads(zlib.decompress(data))
+        if state.get('version') != SNAPSHOT_VERSION:
+            return None
+        return cls(
+            state['entries'], state['signature'], state['built_at'], state['keys'], state['key_entries'],
+            state['sources'], state['products'], state['token'],
+        )
+
+
+# ---------------------------------------------------------------------------
+# Building
+# ---------------------------------------------------------------------------
+
+def catalog_signature():
+    """Cheap fingerprint of everything the index is built from (four aggregate queries)"""
+    from .models import Brand, Category, Product, SubCategory
+
+    products = Product.objects.aggregate(latest=Max('updated_at'), count=Count('pk'))
+    brands = Brand.objects.aggregate(latest=Max('updated_at'), count=Count('pk'))
+    # Categories have no updated_at; their names are few and short
+    categories = tuple(Category.objects.order_by('pk').values_list('pk', 'name'))
+    subcategories = tuple(SubCategory.objects.order_by('pk').values_list('pk', 'name', 'category_id'))
+    return (
+        products['latest'], products['count'], brands['latest'], brands['count'],
+        hashlib.sha1(repr((categories, subcategories)).encode()).hexdigest(),
+    )
+
+
+PRODUCT_FIELDS = ('pk', 'name', 'slug', 'brand_id', 'sub_category_id', 'sub_category__category_id')
+
+
+def product_units(product_ids=None):
+    from orders.models import OrderItem
+
+    items = OrderItem.objects.all()
+    if product_ids is not None:
+        items = items.filter(product_id__in=product_ids)
+    return dict(items.values('product_id').annotate(units=Sum('quantity')).values_list('product_id', 'units'))
+
+
+def build_entries():
+    """(entries, sources, products) for a new index"""
+    from .models import Brand, Category, Product, SearchQuery, SubCategory
+
+    units = product_units()
+    entries = []
+    sources = {}
+    products = {}
+    brand_weights, category_weights, subcategory_weights = {}, {}, {}
+    for product_id, name, slug, brand_id, subcategory_id, category_id in Product.objects.filter(
+        is_active=True
+    ).values_list(*PRODUCT_FIELDS).iterator(chunk_size=5000):
+        weight = 1 + (units.get(product_id) or 0)
+        sources[(PRODUCT, product_id)] = len(entries)
+        products[product_id] = (brand_id, subcategory_id, category_id, weight)
+        entries.append((PRODUCT, name, slug, weight))
+        if brand_id is not None:
+            brand_weights[brand_id] = brand_weights.get(brand_id, 0) + weight
+        subcategory_weights[subcategory_id] = subcategory_weights.get(subcategory_id, 0) + weight
+        category_weights[category_id] = category_weights.get(category_id, 0) + weight
+
+    for brand_id, name, slug in Brand.objects.filter(is_active=True).values_list('pk', 'name', 'slug'):
+        sources[(BRAND, brand_id)] = len(entries)
+        entries.append((BRAND, name, slug, 1 + brand_weights.get(brand_id, 0)))
+    for category_id, name, slug in Category.objects.values_list('pk', 'name', 'slug'):
+        sources[(CATEGORY, category_id)] = len(entries)
+        entries.append((CATEGORY, name, slug, 1 + category_weights.get(category_id, 0)))
+    for subcategory_id, name, slug in SubCategory.objects.values_list('pk', 'name', 'slug'):
+        sources[(SUBCATEGORY, subcategory_id)] = len(entries)
+        entries.append((SUBCATEGORY, name, slug, 1 + subcategory_weights.get(subcategory_id, 0)))
+    for query, hits in SearchQuery.objects.filter(
+        hits__gte=settings.PRODUCT_SUGGEST_MIN_QUERY_HITS, is_hidden=False
+    ).values_list('query', 'hits')[:settings.PRODUCT_SUGGEST_MAX_QUERIES]:
+        entries.append((QUERY, query, None, hits))
+    return entries, sources, products
+
+
+def build_index(signature=None):
+    from .changes import current_token
+
+    started = time.monotonic()
+    signature = catalog_signature() if signature is None else signature
+    # Taken before reading: changes made during the build are applied again later, which is harmless
+    token = current_token()
+    entries, sources, products = build_entries()
+    index = SuggestIndex(entries, signature, sources=sources, products=products, token=token)
+    logger.info(
+        f"Suggest index built: {len(index)} entries, {len(index.keys)} keys in {time.monotonic() - started:.2f}s"
+    )
+    return index
+
+
+def updated_index(index, signature):
+    """
+    `index` with the product changes since its sync token applied, or None
+    when it has to be rebuilt (too many changes, or the token expired)
+    """
+    from .changes import InvalidToken, catalog_changes
+    from .models import CatalogChange, Product
+
+    if index.token is None:
+        return None
+    try:
+        changes = catalog_changes(index.token, limit=settings.PRODUCT_SUGGEST_MAX_DELTA)
+    except InvalidToken:
+        return None
+    if changes['has_more']:
+        return None
+
+    touched = set(changes['product_ids']) | {uuid.UUID(product_id) for product_id in changes['deleted']}
+    rows = list(Product.objects.filter(pk__in=changes['product_ids'], is_active=True).values_list(*PRODUCT_FIELDS))
+    units = product_units([row[0] for row in rows])
+
+    # The feed leaves out rows that may still be committing; until they are
+    # in, keep the old signature so the next check applies them
+    settled = timezone.now() - timedelta(seconds=settings.CATALOG_CHANGES_SETTLE_SECONDS)
+    if (
+        Product.objects.filter(updated_at__gt=settled).exists()
+        or CatalogChange.objects.filter(changed_at__gt=settled).exists()
+    ):
+        signature = index.signature
+
+    updated = index.with_products(rows, units, touched, signature, changes['next_token'])
+    logger.info(f"Suggest index updated: {len(touched)} products changed")
+    return updated
+
+
+def write_snapshot(index, path=None):
+    path = path or settings.PRODUCT_SUGGEST_SNAPSHOT_PATH
+    if not path:
+        return
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'wb') as handle:
+        handle.write(index.dumps())
+    os.replace(temp_path, path)
+
+
+def read_snapshot(path=None):
+    path = path or settings.PRODUCT_SUGGEST_SNAPSHOT_PATH
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as handle:
+            return SuggestIndex.loads(handle.read())
+    except Exception as e:
+        logger.warning(f"Could not read suggest snapshot {path}: {e}")
+        return None
+
+
+# ---------------------------------------------------------------------------
+# Process-wide index
+# ---------------------------------------------------------------------------
+
+_index = None
+_checked_at = 0.0
+_refreshing = False
+_lock = threading.Lock()
+
+
+def _is_current(index, signature):
+    return (
+        index is not None and index.signature == signature
+        and time.time() - index.built_at < settings.PRODUCT_SUGGEST_MAX_AGE
+    )
+
+
+def _current_index(index):
+    """
+    Keep the index while it matches the catalog, else load the shared
+    snapshot, apply the product changes, or rebuild (and publish)
+    """
+    signature = catalog_signature()
+    if _is_current(index, signature):
+        return index
+    snapshot = read_snapshot()
+    if _is_current(snapshot, signature):
+        return snapshot
+
+    for base in (index, snapshot):
+        # Signature: (products latest, products count, brands latest, brands count, categories)
+        if (
+            base is not None and base.signature[2:] == signature[2:]
+            and time.time() - base.built_at < settings.PRODUCT_SUGGEST_MAX_AGE
+        ):
+            updated = updated_index(base, signature)
+            if updated is not None:
+                write_snapshot(updated)
+                return updated
+            break
+
+    index = build_index(signature)
+    write_snapshot(index)
+    return index
+
+
+def _refresh():
+    global _index, _checked_at, _refreshing
+    try:
+        _index = _current_index(_index)
+    except Exception as e:
+        logger.error(f"Suggest index refresh failed: {e}", exc_info=True)
+    finally:
+        _checked_at = time.monotonic()
+        _refreshing = False
+        connection.close()
+
+
+def get_suggest_index():
+    """The process-wide index; refreshed in a background thread, so requests never wait for a rebuild"""
+    global _index, _checked_at, _refreshing
+    if _index is None:
+        with _lock:
+            if _index is None:
+                _index = _current_index(None)
+                _checked_at = time.monotonic()
+    elif not _refreshing and time.monotonic() - _checked_at >= settings.PRODUCT_SUGGEST_REFRESH_INTERVAL:
+        with _lock:
+            if not _refreshing:
+                _refreshing = True
+                threading.Thread(target=_refresh, name='suggest-index-refresh', daemon=True).start()
+    return _index
+
+
+# ---------------------------------------------------------------------------
+# Search popularity
+# ---------------------------------------------------------------------------
+
+_searches = Counter()
+_searches_flushed_at = time.monotonic()
+_searches_lock = threading.Lock()
+
+
+def record_search(query):
+    """
+    Count one storefront search that found products. Counts are kept in
+    memory and written every PRODUCT_SEARCH_RECORD_INTERVAL seconds, so a
+    search page view does not write to the database.
+    """
+    global _searches, _searches_flushed_at
+    query = normalize(query)[:100]
+    if len(query) < 2:
+        return
+    with _searches_lock:
+        _searches[query] += 1
+        if time.monotonic() - _searches_flushed_at < settings.PRODUCT_SEARCH_RECORD_INTERVAL:
+            return
+        counts, _searches = _searches, Counter()
+        _searches_flushed_at = time.monotonic()
+    flush_searches(counts)
+
+
+def flush_searches(counts=None):
+    """Write buffered search counts ({query: searches}, by default this process's buffer)"""
+    global _searches
+    from .models import SearchQuery
+
+    if counts is None:
+        with _searches_lock:
+            counts, _searches = _searches, Counter()
+    for query, hits in counts.items():
+        SearchQuery.record(query, hits)
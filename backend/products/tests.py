@@ -1,3 +1,293 @@
-from django.test import TestCase
+import os
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.utils.text import slugify
+from rest_framework.test import APIClient
+
+from shops.models import Shop
+
+from utils.tests import MediaTestCase
+
+from . import fuzzy, suggest
+from .attribute_index import ProductAttributeIndex
+from .changes import ExpiredToken, catalog_changes
+from .feeds import generate_feed
+from .fuzzy import FuzzyIndex
+from .models import Brand, CatalogChange, Category, Color, Product, Review, SearchQuery, SubCategory
+
+
+def create_product(name, sub_category=None, **fields):
+    if sub_category is None:
+        category, _ = Category.objects.get_or_create(name='Baby Care', defaults={'slug': 'baby-care'})
+        sub_category, _ = SubCategory.objects.get_or_create(
+            name='Lotions', category=category, defaults={'slug': 'lotions'}
+        )
+    shop = Shop.objects.first()
+    if shop is None:
+        owner = get_user_model().objects.create_user(email='seller@example.com', password='x', name='Seller')
+        shop = Shop.objects.create(owner=owner, name='Test Shop', slug='test-shop', contact_email='shop@example.com')
+    defaults = {
+        'shop': shop,
+        'slug': slugify(name),
+        'description': name,
+        'sub_category': sub_category,
+        'price': Decimal('100.00'),
+    }
+    defaults.update(fields)
+    return Product.objects.create(name=name, **defaults)
+
+
+class FuzzySearchTests(TestCase):
+
+    def setUp(self):
+        brand = Brand.objects.create(name='Johnson', slug='johnson')
+        self.lotion = create_product('Baby Lotion', brand=brand)
+        self.shampoo = create_product('Baby Shampoo')
+        self.index = FuzzyIndex().build()
+
+    def test_typos_match(self):
+        self.assertEqual(self.index.search('babby lotoin'), [self.lotion.pk])
+        self.assertEqual(self.index.search('jonhson')[:1], [self.lotion.pk])
+
+    def test_every_word_must_match(self):
+        self.assertEqual(self.index.search('shampoo johnson'), [])
+
+    def test_short_words_matching_nothing(self):
+        self.assertEqual(self.index.search('zq xw'), [])
+        self.assertCountEqual(self.index.search('xq baby'), [self.lotion.pk, self.shampoo.pk])
+
+    @override_settings(SECURE_SSL_REDIRECT=False)
+    def test_api_search_without_matches(self):
+        response = APIClient().get('/api/products/products/', {'search': 'zq xw'})
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(PRODUCT_FUZZY_REFRESH_INTERVAL=0)
+    def test_stale_index_is_served_while_refreshing(self):
+        create_product('Baby Powder')
+        with mock.patch.multiple(fuzzy, _index=self.index, _checked_at=0.0, _refreshing=False), \
+                mock.patch('products.fuzzy.threading.Thread') as thread:
+            self.assertIs(fuzzy.get_fuzzy_index(), self.index)
+            self.assertIs(fuzzy.get_fuzzy_index(), self.index)
+            thread.assert_called_once()
+            with mock.patch('products.fuzzy.connection'):
+                thread.call_args.kwargs['target']()
+            self.assertIsNot(fuzzy.get_fuzzy_index(), self.index)
+            self.assertTrue(fuzzy.get_fuzzy_index().search('powder'))
+
+
+@override_settings(CATALOG_CHANGES_SETTLE_SECONDS=0)
+class SuggestIndexTests(TestCase):
+
+    def setUp(self):
+        self.brand = Brand.objects.create(name='Johnson', slug='johnson')
+        self.lotion = create_product('Baby Lotion', brand=self.brand)
+        self.index = suggest.build_index()
+
+    def labels(self, index, query):
+        return [suggestion['label'] for suggestion in index.suggest(query, kinds={suggest.PRODUCT})]
+
+    def update(self):
+        updated = suggest.updated_index(self.index, suggest.catalog_signature())
+        self.assertIsNotNone(updated)
+        return updated
+
+    def test_product_changes_are_applied_in_place(self):
+        create_product('Baby Oil', brand=self.brand)
+        self.lotion.name = 'Baby Cream'
+        self.lotion.save()
+
+        updated = self.update()
+        self.assertCountEqual(self.labels(updated, 'baby'), ['Baby Oil', 'Baby Cream'])
+        self.assertEqual(self.labels(updated, 'lotion'), [])
+        self.assertEqual(updated.suggest('johnson', kinds={suggest.BRAND})[0]['weight'], 3)
+        self.assertEqual(sorted(updated.keys), sorted(suggest.build_index().keys))
+
+    def test_deleted_and_deactivated_products_are_removed(self):
+        oil = create_product('Baby Oil')
+        self.index = self.update()
+        oil.delete()
+        self.lotion.is_active = False
+        self.lotion.save()
+        self.assertEqual(self.labels(self.update(), 'baby'), [])
+
+    def test_too_many_changes_rebuild(self):
+        with override_settings(PRODUCT_SUGGEST_MAX_DELTA=1):
+            create_product('Baby Oil')
+            create_product('Baby Powder')
+            self.assertIsNone(suggest.updated_index(self.index, suggest.catalog_signature()))
+
+    def test_snapshot_round_trip(self):
+        updated = self.update()
+        loaded = suggest.SuggestIndex.loads(updated.dumps())
+        self.assertEqual(self.labels(loaded, 'baby'), ['Baby Lotion'])
+        self.assertEqual((loaded.token, loaded.products), (updated.token, updated.products))
+
+
+class SearchRecordingTests(TestCase):
+
+    def setUp(self):
+        create_product('Baby Lotion')
+        suggest.flush_searches()
+
+    @override_settings(PRODUCT_SEARCH_RECORD_INTERVAL=3600)
+    def test_searches_are_buffered(self):
+        suggest.record_search('Baby  Lotion')
+        suggest.record_search('baby lotion')
+        self.assertFalse(SearchQuery.objects.exists())
+        suggest.flush_searches()
+        self.assertEqual(SearchQuery.objects.get().hits, 2)
+
+    @override_settings(SECURE_SSL_REDIRECT=False, PRODUCT_SEARCH_RECORD_INTERVAL=3600)
+    def test_only_searches_with_results_are_recorded(self):
+        client = APIClient()
+        client.get('/api/products/products/', {'search': 'lotion', 'fuzzy': '0'})
+        client.get('/api/products/products/', {'search': 'buy cheap pills', 'fuzzy': '0'})
+        suggest.flush_searches()
+        self.assertEqual(list(SearchQuery.objects.values_list('query', flat=True)), ['lotion'])
+
+    def test_hidden_queries_are_not_suggested(self):
+        SearchQuery.objects.create(query='baby lotion', hits=10, is_hidden=True)
+        SearchQuery.objects.create(query='baby care', hits=10)
+        queries = [label for kind, label, _, _ in suggest.build_entries()[0] if kind == suggest.QUERY]
+        self.assertEqual(queries, ['baby care'])
+
+
+@override_settings(PRODUCT_ATTRIBUTE_INDEX_PATH='')
+class AttributeIndexTests(TestCase):
+
+    def setUp(self):
+        self.old = create_product('Baby Lotion', is_active=False)
+        self.new = create_product('Baby Oil')
+        self.index = ProductAttributeIndex().rebuild()
+
+    def listing(self):
+        return self.index.newest_ids(self.index.match([]), 0, 10)
+
+    def test_reactivated_product_keeps_its_place(self):
+        self.old.is_active = True
+        self.old.save()
+        self.index.refresh()
+        self.assertEqual(self.listing(), [self.new.pk, self.old.pk])
+
+    def test_older_product_is_not_listed_first(self):
+        backdated = create_product('Baby Powder')
+        Product.objects.filter(pk=backdated.pk).update(created_at=self.old.created_at - timedelta(days=1))
+        self.index.refresh()
+        self.assertEqual(self.listing(), [self.new.pk, backdated.pk])
+
+    def test_delete_and_create_are_detected(self):
+        self.new.delete()
+        replacement = create_product('Baby Powder')
+        self.index.refresh()
+        self.assertEqual(self.listing(), [replacement.pk])
+
+    def test_color_changes_are_applied(self):
+        red = Color.objects.create(name='Red', hex_code='#ff0000')
+        self.new.colors.add(red)
+        self.index.refresh()
+        self.assertEqual(self.index.newest_ids(self.index.match([('color', ['Red'])]), 0, 10), [self.new.pk])
+
+
+@override_settings(CATALOG_CHANGES_SETTLE_SECONDS=0)
+class CatalogChangesTests(TestCase):
+
+    def setUp(self):
+        self.lotion = create_product('Baby Lotion')
+        self.oil = create_product('Baby Oil')
+
+    def sync(self):
+        changes = catalog_changes()
+        while changes['has_more']:
+            changes = catalog_changes(changes['next_token'])
+        return changes['next_token']
+
+    def test_full_pull_then_deltas(self):
+        changes = catalog_changes(limit=1)
+        self.assertTrue(changes['has_more'])
+        changes = catalog_changes(changes['next_token'], limit=1)
+        self.assertEqual(changes['product_ids'] | catalog_changes(limit=1)['product_ids'], {self.lotion.pk, self.oil.pk})
+
+        token = self.sync()
+        self.assertEqual(catalog_changes(token)['product_ids'], set())
+        oil_id = self.oil.pk
+        self.oil.delete()
+        self.assertEqual(catalog_changes(token)['deleted'], [str(oil_id)])
+
+    def test_color_changes_are_reported(self):
+        token = self.sync()
+        red = Color.objects.create(name='Red', hex_code='#ff0000')
+        self.lotion.colors.add(red)
+        self.assertEqual(catalog_changes(token)['product_ids'], {self.lotion.pk})
+
+        token = self.sync()
+        red.products.clear()
+        self.assertEqual(catalog_changes(token)['product_ids'], {self.lotion.pk})
+
+    def test_cascade_deletes_leave_tombstones(self):
+        token = self.sync()
+        self.lotion.shop.delete()
+        changes = catalog_changes(token)
+        self.assertEqual(changes['deleted'], sorted([str(self.lotion.pk), str(self.oil.pk)]))
+        self.assertEqual(changes['product_ids'], set())
+
+    def test_review_deleted_with_its_user_changes_the_product(self):
+        reviewer = get_user_model().objects.create_user(email='reviewer@example.com', password='x', name='Reviewer')
+        Review.objects.create(user=reviewer, product=self.lotion, rating=5)
+        token = self.sync()
+        reviewer.delete()
+        self.assertEqual(catalog_changes(token)['product_ids'], {self.lotion.pk})
+
+    def test_token_behind_pruned_tombstones_expires(self):
+        token = self.sync()
+        self.lotion.delete()
+        self.oil.delete()
+        CatalogChange.objects.update(changed_at=timezone.now() - timedelta(days=60))
+        call_command('prune_catalog_changes', stdout=StringIO())
+
+        self.assertEqual(CatalogChange.objects.count(), 1)
+        with self.assertRaises(ExpiredToken):
+            catalog_changes(token)
+        self.assertEqual(catalog_changes(self.sync())['deleted'], [])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, CATALOG_CHANGES_SETTLE_SECONDS=0)
+class ProductFeedTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.lotion = create_product('Baby Lotion')
+
+    def test_endpoint_serves_the_generated_file_only(self):
+        self.assertEqual(self.client.get('/api/products/feeds/csv/').status_code, 404)
+        self.assertEqual(generate_feed('csv')['items'], 1)
+        create_product('Baby Oil')
+
+        response = self.client.get('/api/products/feeds/csv/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content).count(b'\n'), 2)
+
+    def test_incremental_run_merges_changes(self):
+        generate_feed('csv')
+        oil = create_product('Baby Oil')
+        self.lotion.delete()
+        result = generate_feed('csv')
+        self.assertEqual((result['mode'], result['items'], result['rendered']), ('incremental', 1, 1))
+        self.assertCountEqual(os.listdir(os.path.join(self.media_root, 'feeds')), ['products.csv', 'products.csv.state.json'])
+        with open(os.path.join(self.media_root, result['path'])) as handle:
+            self.assertIn(str(oil.pk), handle.read())
+
+    def test_category_rename_forces_a_full_run(self):
+        generate_feed('csv')
+        Category.objects.filter(name='Baby Care').update(name='Baby & Mom')
+        result = generate_feed('csv')
+        self.assertEqual(result['mode'], 'full')
+        with open(os.path.join(self.media_root, result['path'])) as handle:
+            self.assertIn('Baby & Mom', handle.read())
+        self.assertEqual(generate_feed('csv')['mode'], 'incremental')
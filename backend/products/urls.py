@@ -2,7 +2,8 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (ProductViewSet, CategoryViewSet, SubCategoryViewSet, 
-                    ColorViewSet, BrandViewSet, SizeViewSet, LandingPageOrderViewSet)
+                    ColorViewSet, BrandViewSet, SizeViewSet, LandingPageOrderViewSet,
+                    product_suggest, catalog_changes_feed, product_feed)
 
 # Create router for ViewSets
 router = DefaultRouter()
@@ -18,5 +19,8 @@ app_name = 'products'
 
 urlpatterns = [
     # Product-related API endpoints
+    path('suggest/', product_suggest, name='product-suggest'),
+    path('changes/', catalog_changes_feed, name='catalog-changes'),
+    path('feeds/<str:fmt>/', product_feed, name='product-feed'),
     path('', include(router.urls)),
 ]
@@ -1,17 +1,26 @@
 # products/views.py
 import logging
+import os
 from rest_framework import viewsets, permissions
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, permission_classes
 from .models import Product, Category, SubCategory, Color, Brand, Size, LandingPageOrder
-from django.db.models import Count
+from django.db.models import Case, Count, IntegerField, Value, When
+from django.conf import settings
+from django.http import FileResponse
 from .serializers import (ProductSerializer, CategorySerializer, SubCategorySerializer, 
                           ColorSerializer, BrandSerializer, SizeSerializer,
                           LandingPageOrderSerializer, LandingPageOrderListSerializer)
 from .permissions import IsShopOwnerOrReadOnly
 from .filters import ProductFilter
+from .facets import product_facets
+from .attribute_index import indexed_product_list
+from .suggest import get_suggest_index, record_search
+from .fuzzy import fuzzy_product_ids
+from .changes import ExpiredToken, InvalidToken, catalog_changes
+from .feeds import FEED_FORMATS, feed_path
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -63,15 +72,37 @@ class ProductViewSet(viewsets.ModelViewSet):
         try:
             logger.info(f"ProductViewSet.list called with params: {request.query_params}")
             
-            # Get the queryset
-            queryset = self.filter_queryset(self.get_queryset())
+            # Attribute-only filters are answered from the in-memory index;
+            # anything else (search, price range, ordering) goes through ProductFilter
+            queryset = indexed_product_list(request.query_params, self.get_queryset())
+            if queryset is None:
+                queryset = self.filter_queryset(self.get_queryset())
+
+            # Typo-tolerant fallback when the exact search finds (almost) nothing
+            search_mode = None
+            exact_matches = None
+            if request.query_params.get('search') and request.query_params.get('fuzzy') != '0':
+                exact_matches = len(queryset.values('pk')[:settings.PRODUCT_FUZZY_MIN_RESULTS])
+                if exact_matches < settings.PRODUCT_FUZZY_MIN_RESULTS:
+                    fuzzy_queryset = self.get_fuzzy_queryset(request)
+                    if fuzzy_queryset is not None:
+                        queryset, search_mode = fuzzy_queryset, 'fuzzy'
             
             # Apply pagination
             page = self.paginate_queryset(queryset)
             if page is not None:
                 serializer = self.get_serializer(page, many=True)
                 logger.info(f"Successfully paginated {len(page)} products")
-                return self.get_paginated_response(serializer.data)
+                # Only searches that found products as typed feed suggestions
+                if (
+                    page and (search_mode is None or exact_matches) and request.query_params.get('search')
+                    and request.query_params.get('page', '1') == '1'
+                ):
+                    record_search(request.query_params['search'])
+                response = self.get_paginated_response(serializer.data)
+                if search_mode:
+                    response.data['search_mode'] = search_mode
+                return response
             
             # If no pagination
             serializer = self.get_serializer(queryset, many=True)
@@ -102,6 +133,41 @@ class ProductViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    def get_fuzzy_queryset(self, request):
+        """
+        Products matching the search words up to typos, with the other filters
+        applied and ranked by similarity unless an ordering was requested.
+        """
+        product_ids = fuzzy_product_ids(request.query_params['search'])
+        if not product_ids:
+            return None
+        params = request.query_params.copy()
+        params.pop('search')
+        queryset = self.filterset_class(params, queryset=self.get_queryset(), request=request).qs
+        queryset = queryset.filter(pk__in=product_ids)
+        if not params.get('ordering'):
+            queryset = queryset.order_by(Case(
+                *[When(pk=product_id, then=Value(rank)) for rank, product_id in enumerate(product_ids)],
+                output_field=IntegerField(),
+            ))
+        return queryset
+
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """
+        Brand, subcategory, shipping category, color, size and price bucket
+        counts for the products matching the same filters as the list.
+        """
+        try:
+            queryset = self.filter_queryset(self.get_queryset())
+            return Response(product_facets(queryset))
+        except Exception as e:
+            logger.error(f"Error in ProductViewSet.facets: {str(e)}", exc_info=True)
+            return Response(
+                {"error": f"Internal server error: {str(e)}"}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context.update({"request": self.request})
@@ -430,3 +496,106 @@ class LandingPageOrderViewSet(viewsets.ModelViewSet):
         context = super().get_serializer_context()
         context.update({"request": self.request})
         return context
+
+
+SUGGEST_KINDS = {'product', 'brand', 'category', 'subcategory', 'query'}
+
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def product_suggest(request):
+    """
+    Autocomplete suggestions: GET /api/products/suggest/?q=sam&limit=8&types=product,brand
+    Served from the in-process suggest index, so no catalog query runs per keystroke.
+    """
+    try:
+        query = request.query_params.get('q', '')
+        try:
+            limit = min(max(int(request.query_params.get('limit', 8)), 1), 20)
+        except ValueError:
+            return Response({'error': 'limit must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+        kinds = None
+        if request.query_params.get('types'):
+            kinds = {kind.strip() for kind in request.query_params['types'].split(',')} & SUGGEST_KINDS
+        return Response({
+            'query': query,
+            'suggestions': get_suggest_index().suggest(query, limit, kinds),
+        })
+    except Exception as e:
+        logger.error(f"Error in product_suggest: {str(e)}", exc_info=True)
+        return Response(
+            {"error": f"Internal server error: {str(e)}"}, 
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def catalog_changes_feed(request):
+    """
+    Delta sync: GET /api/products/changes/?since=<token>&limit=100
+    Without `since` the feed pages through the whole catalog; afterwards it returns
+    products created, updated or deactivated since the token plus ids of deleted products.
+    Keep calling with `next_token` while `has_more` is true.
+    """
+    try:
+        try:
+            limit = min(max(int(request.query_params.get('limit', 100)), 1), 500)
+        except ValueError:
+            return Response({'error': 'limit must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            changes = catalog_changes(request.query_params.get('since'), limit)
+        except ExpiredToken as e:
+            return Response({'error': str(e)}, status=status.HTTP_410_GONE)
+        except InvalidToken as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        products = Product.objects.filter(pk__in=changes['product_ids']).select_related(
+            'shop', 'brand', 'sub_category', 'sub_category__category', 'shipping_category'
+        ).prefetch_related(
+            'colors', 'sizes', 'reviews__user', 'specifications', 'additional_images'
+        ).order_by('updated_at', 'pk')
+        return Response({
+            'products': ProductSerializer(products, many=True, context={'request': request}).data,
+            'deleted': changes['deleted'],
+            'next_token': changes['next_token'],
+            'has_more': changes['has_more'],
+        })
+    except Exception as e:
+        logger.error(f"Error in catalog_changes_feed: {str(e)}", exc_info=True)
+        return Response(
+            {"error": f"Internal server error: {str(e)}"}, 
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def product_feed(request, fmt):
+    """
+    Merchant/catalog product feed: GET /api/products/feeds/<xml|csv|ndjson>/?gzip=1
+    Serves the file last written by `generate_product_feed`; the endpoint never
+    regenerates it.
+    """
+    if fmt not in FEED_FORMATS:
+        return Response({'error': f'Unknown feed format: {fmt}'}, status=status.HTTP_404_NOT_FOUND)
+    try:
+        compress = request.query_params.get('gzip') in ('1', 'true')
+        path = os.path.join(settings.MEDIA_ROOT, feed_path(fmt, compress))
+        try:
+            handle = open(path, 'rb')
+        except FileNotFoundError:
+            return Response({'error': 'Feed has not been generated yet'}, status=status.HTTP_404_NOT_FOUND)
+        response = FileResponse(
+            handle,
+            content_type='application/gzip' if compress else FEED_FORMATS[fmt],
+            filename=os.path.basename(path),
+        )
+        response['Cache-Control'] = f'public, max-age={settings.PRODUCT_FEED_MAX_AGE}'
+        return response
+    except Exception as e:
+        logger.error(f"Error in product_feed: {str(e)}", exc_info=True)
+        return Response(
+            {"error": f"Internal server error: {str(e)}"}, 
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
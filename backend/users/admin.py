@@ -190,7 +190,7 @@ class AddressAdmin(ExportMixin, ModelAdmin):
 
     list_display = ('user', 'address_line_1', 'city', 'state', 'country', 'is_default')
     list_filter = ('city', 'state', 'country', 'is_default')
-    search_fields = ('user__email', 'address_line_1', 'city', 'postal_code', 'country')
+    search_fields = ('user__email', 'guest_email', 'address_line_1', 'city', 'postal_code', 'country')
 
     autocomplete_fields = ('user',)
 
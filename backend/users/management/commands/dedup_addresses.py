@@ -0,0 +1,134 @@
+"""
+Django management command to merge duplicate addresses
+"""
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+
+from orders.models import Order
+from users.models import ADDRESS_FINGERPRINT_FIELDS, Address, address_fingerprint
+
+
+class Command(BaseCommand):
+    help = (
+        'Fingerprint every address, merge identical addresses of the same user '
+        '(or guest email) and repoint order shipping/delivery addresses to the kept row'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Duplicates merged per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be merged')
+
+    def handle(self, *args, **options):
+        batch_size = max(options['batch_size'], 1)
+        dry_run = options['dry_run']
+
+        self.stdout.write('🏠 Scanning addresses...')
+        guest_emails = self.guest_emails_from_orders()
+
+        groups = defaultdict(list)
+        rows = {}
+        for row in Address.objects.values(
+            'id', 'user_id', 'guest_email', 'is_default', 'fingerprint', *ADDRESS_FINGERPRINT_FIELDS
+        ).order_by('pk').iterator(chunk_size=5000):
+            row['backfill_email'] = not row['user_id'] and not row['guest_email'] and row['id'] in guest_emails
+            if row['backfill_email']:
+                row['guest_email'] = guest_emails[row['id']]
+            row['new_fingerprint'] = address_fingerprint(**row)
+            rows[row['id']] = row
+            if row['user_id']:
+                owner = ('user', row['user_id'])
+            elif row['guest_email']:
+                owner = ('guest', row['guest_email'])
+            else:
+                continue  # anonymous guest address, nothing to merge it with
+            groups[(owner, row['new_fingerprint'])].append(row['id'])
+
+        # Keep the default address, then one that is already fingerprinted, then the oldest
+        merges = []
+        for address_ids in groups.values():
+            if len(address_ids) < 2:
+                continue
+            keeper = min(
+                address_ids,
+                key=lambda pk: (not rows[pk]['is_default'], rows[pk]['fingerprint'] is None, pk),
+            )
+            merges.extend((duplicate, keeper) for duplicate in address_ids if duplicate != keeper)
+
+        self.stdout.write(
+            f'  {len(rows)} addresses, {len(merges)} duplicates in '
+            f'{sum(1 for ids in groups.values() if len(ids) > 1)} groups'
+        )
+        if dry_run:
+            self.stdout.write(self.style.WARNING('Dry run - nothing was changed'))
+            return
+
+        repointed = 0
+        for start in range(0, len(merges), batch_size):
+            batch = merges[start:start + batch_size]
+            with transaction.atomic():
+                repointed += self.repoint(batch)
+                Address.objects.filter(pk__in=[duplicate for duplicate, _ in batch]).delete()
+                keepers = {keeper for _, keeper in batch}
+                defaults = {keeper for duplicate, keeper in batch if rows[duplicate]['is_default']}
+                if defaults:
+                    Address.objects.filter(pk__in=defaults).update(is_default=True)
+                self.update_fingerprints([rows[pk] for pk in keepers])
+            for duplicate, _ in batch:
+                rows.pop(duplicate, None)
+            self.stdout.write(f'  merged {min(start + batch_size, len(merges))}/{len(merges)}')
+
+        # Backfill the remaining rows that were never fingerprinted
+        stale = [
+            row for row in rows.values()
+            if row['fingerprint'] != row['new_fingerprint'] or row['backfill_email']
+        ]
+        for start in range(0, len(stale), batch_size):
+            with transaction.atomic():
+                self.update_fingerprints(stale[start:start + batch_size])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Merged {len(merges)} duplicate addresses, repointed {repointed} references, '
+            f'fingerprinted {len(stale)} addresses'
+        ))
+
+    def guest_emails_from_orders(self):
+        """Guest addresses have no owner column yet; take the email of the order that used them"""
+        emails = {}
+        for field in ('shipping_address', 'delivery_address'):
+            for address_id, email in Order.objects.filter(
+                **{f'{field}__isnull': False, f'{field}__user__isnull': True, f'{field}__guest_email__isnull': True}
+            ).exclude(customer_email='').values_list(f'{field}_id', 'customer_email').order_by('ordered_at').iterator(chunk_size=5000):
+                emails[address_id] = email.strip().lower()
+        return emails
+
+    def repoint(self, batch):
+        """Point every foreign key at the duplicates to their kept address, one UPDATE per FK"""
+        duplicate_ids = [duplicate for duplicate, _ in batch]
+        updated = 0
+        for relation in Address._meta.related_objects:
+            if not (relation.one_to_many or relation.one_to_one):
+                continue
+            field = relation.field
+            updated += relation.related_model._base_manager.filter(
+                **{f'{field.attname}__in': duplicate_ids}
+            ).update(**{
+                field.attname: Case(
+                    *[When(**{field.attname: duplicate}, then=Value(keeper)) for duplicate, keeper in batch],
+                    default=F(field.attname),
+                    output_field=field.target_field,
+                )
+            })
+        return updated
+
+    def update_fingerprints(self, rows):
+        Address.objects.bulk_update(
+            [Address(id=row['id'], fingerprint=row['new_fingerprint'], guest_email=row['guest_email']) for row in rows],
+            ['fingerprint', 'guest_email'],
+            batch_size=500,
+        )
+        for row in rows:
+            row['fingerprint'] = row['new_fingerprint']
+            row['backfill_email'] = False
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-19 02:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_alter_address_is_default_alter_user_date_joined_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='address',
+            name='fingerprint',
+            field=models.CharField(blank=True, editable=False, help_text='Hash of the normalized address, used to reuse identical addresses', max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='address',
+            name='guest_email',
+            field=models.EmailField(blank=True, help_text='Checkout email for guest addresses', max_length=254, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='address',
+            constraint=models.UniqueConstraint(condition=models.Q(('fingerprint__isnull', False), ('user__isnull', False)), fields=('user', 'fingerprint'), name='address_user_fingerprint_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='address',
+            constraint=models.UniqueConstraint(condition=models.Q(('fingerprint__isnull', False), ('guest_email__isnull', False), ('user__isnull', True)), fields=('guest_email', 'fingerprint'), name='address_guest_fingerprint_uniq'),
+        ),
+    ]
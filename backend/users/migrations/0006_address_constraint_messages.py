@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-19 04:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_address_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AlterConstraint(
+            model_name='address',
+            name='address_user_fingerprint_uniq',
+            constraint=models.UniqueConstraint(condition=models.Q(('fingerprint__isnull', False), ('user__isnull', False)), fields=('user', 'fingerprint'), name='address_user_fingerprint_uniq', violation_error_message='This customer already has this address.'),
+        ),
+        migrations.AlterConstraint(
+            model_name='address',
+            name='address_guest_fingerprint_uniq',
+            constraint=models.UniqueConstraint(condition=models.Q(('fingerprint__isnull', False), ('guest_email__isnull', False), ('user__isnull', True)), fields=('guest_email', 'fingerprint'), name='address_guest_fingerprint_uniq', violation_error_message='This guest already has this address.'),
+        ),
+    ]
@@ -1,6 +1,9 @@
 # users/models.py
+import hashlib
+import re
+
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
-from django.db import models
+from django.db import IntegrityError, models, transaction
 
 class CustomUserManager(BaseUserManager):
     def create_user(self, email, password=None, **extra_fields):
@@ -68,8 +71,57 @@ class User(AbstractBaseUser, PermissionsMixin):
             models.Index(fields=['-date_joined'], name='user_date_joined_idx'),
         ]
 
+ADDRESS_FINGERPRINT_FIELDS = ('address_line_1', 'address_line_2', 'city', 'state', 'postal_code', 'country')
+
+
+def normalize_address_part(value):
+    """Lower-case, drop punctuation and collapse whitespace so cosmetic differences match"""
+    value = re.sub(r'[^\w\s]', ' ', str(value or '').lower())
+    return ' '.join(value.split())
+
+
+def address_fingerprint(**fields):
+    """SHA-256 of the normalized address fields"""
+    normalized = '|'.join(normalize_address_part(fields.get(field)) for field in ADDRESS_FINGERPRINT_FIELDS)
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+class AddressManager(models.Manager):
+    def get_or_create_for_checkout(self, user=None, guest_email=None, is_default=False, **fields):
+        """
+        Reuse the customer's identical address (one indexed lookup on the
+        fingerprint) or create it. Guests are keyed by email; a guest without
+        an email always gets a new row.
+        Returns (address, created).
+        """
+        fingerprint = address_fingerprint(**fields)
+        if user is not None:
+            owner = {'user': user}
+        elif guest_email:
+            owner = {'user__isnull': True, 'guest_email': guest_email.strip().lower()}
+        else:
+            return self.create(is_default=is_default, **fields), True
+
+        existing = self.filter(fingerprint=fingerprint, **owner).first()
+        if existing:
+            return existing, False
+        try:
+            # Savepoint so a concurrent checkout creating the same address
+            # does not break the caller's transaction
+            with transaction.atomic():
+                return self.create(
+                    user=user,
+                    guest_email=owner.get('guest_email'),
+                    is_default=is_default,
+                    **fields,
+                ), True
+        except IntegrityError:
+            return self.get(fingerprint=fingerprint, **owner), False
+
+
 class Address(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='addresses', null=True, blank=True, db_index=True)
+    guest_email = models.EmailField(blank=True, null=True, help_text="Checkout email for guest addresses")
     address_line_1 = models.CharField(max_length=255)
     address_line_2 = models.CharField(max_length=255, blank=True, null=True)
     city = models.CharField(max_length=100)
@@ -77,12 +129,32 @@ class Address(models.Model):
     postal_code = models.CharField(max_length=20)
     country = models.CharField(max_length=100)
     is_default = models.BooleanField(default=False, db_index=True)
+    fingerprint = models.CharField(
+        max_length=64, blank=True, null=True, editable=False,
+        help_text="Hash of the normalized address, used to reuse identical addresses"
+    )
+
+    objects = AddressManager()
 
     class Meta:
         verbose_name_plural = "Addresses"
         indexes = [
             models.Index(fields=['user', 'is_default'], name='address_user_default_idx'),
         ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'fingerprint'],
+                condition=models.Q(user__isnull=False, fingerprint__isnull=False),
+                name='address_user_fingerprint_uniq',
+                violation_error_message="This customer already has this address.",
+            ),
+            models.UniqueConstraint(
+                fields=['guest_email', 'fingerprint'],
+                condition=models.Q(user__isnull=True, guest_email__isnull=False, fingerprint__isnull=False),
+                name='address_guest_fingerprint_uniq',
+                violation_error_message="This guest already has this address.",
+            ),
+        ]
         
     def __str__(self):
         if self.user:
@@ -90,6 +162,69 @@ class Address(models.Model):
         else:
             return f"Guest: {self.address_line_1}, {self.city}"
 
+    def compute_fingerprint(self):
+        return address_fingerprint(**{field: getattr(self, field) for field in ADDRESS_FINGERPRINT_FIELDS})
+
+    def normalize(self):
+        self.fingerprint = self.compute_fingerprint()
+        if self.guest_email:
+            self.guest_email = self.guest_email.strip().lower()
+
+    def validate_constraints(self, exclude=None):
+        # fingerprint is not editable, so model forms exclude it and would skip
+        # the unique constraints on it: check them with the value save() writes,
+        # so a duplicate is a form error instead of an IntegrityError
+        self.normalize()
+        if exclude is not None:
+            exclude = set(exclude) - {'fingerprint'}
+        super().validate_constraints(exclude=exclude)
+
+    def address_key(self):
+        return tuple(self.__dict__.get(field) for field in ADDRESS_FINGERPRINT_FIELDS)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded address so save() can tell when it is edited
+        instance._loaded_address_key = instance.address_key()
+        return instance
+
+    def save(self, *args, **kwargs):
+        self.normalize()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'fingerprint'}
+        edited = not self._state.adding and self.address_key() != getattr(self, '_loaded_address_key', None)
+        if not edited:
+            super().save(*args, **kwargs)
+            self._loaded_address_key = self.address_key()
+            return
+        with transaction.atomic():
+            previous = type(self).objects.select_for_update().filter(pk=self.pk).first()
+            super().save(*args, **kwargs)
+            self._loaded_address_key = self.address_key()
+            if previous is not None and previous.fingerprint != self.fingerprint:
+                self.keep_for_orders(previous)
+
+    def keep_for_orders(self, previous):
+        """
+        Copy-on-write for addresses orders point at: orders placed with the old
+        values move to a copy of them, so editing the address book (or the
+        admin) never rewrites where past orders were shipped
+        """
+        from orders.models import Order
+
+        shipped = Order.objects.filter(shipping_address=self)
+        delivered = Order.objects.filter(delivery_address=self)
+        if not (shipped.exists() or delivered.exists()):
+            return
+        previous.pk = None
+        previous._state.adding = True
+        previous.is_default = False
+        previous.save()
+        shipped.update(shipping_address=previous)
+        delivered.update(delivery_address=previous)
+
 
 class WholesalerProfile(models.Model):
     """Profile for wholesaler users with business information and approval system"""
@@ -1,3 +1,65 @@
+from decimal import Decimal
+
+from django.forms import modelform_factory
 from django.test import TestCase
 
-# Create your tests here.
+from orders.models import Order
+
+from .models import Address, User
+
+ADDRESS = {
+    'address_line_1': 'House 12, Road 5',
+    'city': 'Dhaka',
+    'state': 'Dhaka',
+    'postal_code': '1205',
+    'country': 'Bangladesh',
+}
+
+
+class AddressDedupTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='rahim@example.com', password='x', name='Rahim')
+
+    def test_checkout_reuses_identical_address(self):
+        first, created = Address.objects.get_or_create_for_checkout(user=self.user, **ADDRESS)
+        self.assertTrue(created)
+        second, created = Address.objects.get_or_create_for_checkout(
+            user=self.user, **dict(ADDRESS, address_line_1='house 12 road 5.')
+        )
+        self.assertFalse(created)
+        self.assertEqual(second.pk, first.pk)
+
+    def test_guest_addresses_are_keyed_by_email(self):
+        first, _ = Address.objects.get_or_create_for_checkout(guest_email='Guest@Example.com', **ADDRESS)
+        second, created = Address.objects.get_or_create_for_checkout(guest_email='guest@example.com ', **ADDRESS)
+        self.assertFalse(created)
+        self.assertEqual(second.pk, first.pk)
+        _, created = Address.objects.get_or_create_for_checkout(**ADDRESS)
+        self.assertTrue(created)
+
+    def test_form_reports_duplicate_address(self):
+        Address.objects.create(user=self.user, **ADDRESS)
+        AddressForm = modelform_factory(Address, fields=['user', *ADDRESS])
+        form = AddressForm(data=dict(ADDRESS, user=self.user.pk, city='DHAKA'))
+        self.assertFalse(form.is_valid())
+        self.assertIn('This customer already has this address.', form.non_field_errors())
+
+    def test_editing_an_address_keeps_past_orders_address(self):
+        address = Address.objects.create(user=self.user, is_default=True, **ADDRESS)
+        order = Order.objects.create(
+            total_amount=Decimal('500.00'), customer_name='Rahim', customer_email='rahim@example.com',
+            customer_phone='01700000000', shipping_address=address, delivery_address=address,
+        )
+        address = Address.objects.get(pk=address.pk)
+        address.address_line_1 = 'House 7, Road 2'
+        address.save()
+
+        order.refresh_from_db()
+        self.assertNotEqual(order.shipping_address_id, address.pk)
+        self.assertEqual(order.delivery_address_id, order.shipping_address_id)
+        self.assertEqual(order.shipping_address.address_line_1, 'House 12, Road 5')
+        self.assertFalse(order.shipping_address.is_default)
+        address.refresh_from_db()
+        self.assertEqual(address.address_line_1, 'House 7, Road 2')
+        self.assertTrue(address.is_default)
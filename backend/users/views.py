@@ -387,11 +387,17 @@ def admin_dashboard(request):
         'active_users': User.objects.filter(is_active=True).count(),
         'inactive_users': User.objects.filter(is_active=False).count(),
     }
+
+    # Last 30 days of sales, read from the daily rollups
+    from orders.analytics import default_date_range, get_sales_summary
+    sales = get_sales_summary(*default_date_range())
     
     return Response({
         'message': f'Welcome Admin {request.user.name}',
         'user_type': request.user.user_type,
         'statistics': stats,
+        'sales_last_30_days': sales['totals'],
+        'orders_by_status': sales['by_status'],
         'permissions': {
             'can_manage_users': True,
             'can_view_analytics': True,
@@ -406,9 +412,15 @@ def seller_dashboard(request):
     """
     Seller-only dashboard
     """
+    # Last 30 days of the seller's shop sales, read from the daily rollups
+    from orders.analytics import default_date_range, get_sales_summary
+    shop = getattr(request.user, 'shop', None)
+    sales = get_sales_summary(*default_date_range(), shop_id=shop.id)['totals'] if shop else None
+
     return Response({
         'message': f'Welcome Seller {request.user.name}',
         'user_type': request.user.user_type,
+        'sales_last_30_days': sales,
         'available_actions': [
             'manage_products',
             'view_sales_analytics', 
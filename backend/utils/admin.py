@@ -0,0 +1,48 @@
+from django.contrib import admin
+from django.utils import timezone
+from unfold.admin import ModelAdmin
+
+from .models import ImageProcessingJob, MediaReoptimizationCheckpoint
+
+
+@admin.register(ImageProcessingJob)
+class ImageProcessingJobAdmin(ModelAdmin):
+    list_display = ('id', 'model', 'object_id', 'field_name', 'status', 'attempts', 'available_at', 'created_at', 'processed_at')
+    list_filter = ('status', 'model', 'kind', 'created_at')
+    search_fields = ('object_id', 'source_name', 'result_name', 'last_error')
+    readonly_fields = (
+        'model', 'object_id', 'field_name', 'kind', 'source_name', 'result_name', 'status', 'attempts',
+        'available_at', 'locked_by', 'locked_at', 'last_error', 'created_at', 'processed_at'
+    )
+
+    actions = ['retry_jobs']
+
+    def has_add_permission(self, request):
+        return False
+
+    def retry_jobs(self, request, queryset):
+        """Put failed jobs back into the queue"""
+        updated = queryset.filter(status=ImageProcessingJob.Status.FAILED).update(
+            status=ImageProcessingJob.Status.PENDING,
+            attempts=0,
+            available_at=timezone.now(),
+            locked_by=None,
+            locked_at=None,
+        )
+        self.message_user(request, f'{updated} jobs queued for retry.')
+    retry_jobs.short_description = 'Retry selected jobs'
+
+
+@admin.register(MediaReoptimizationCheckpoint)
+class MediaReoptimizationCheckpointAdmin(ModelAdmin):
+    list_display = (
+        'run', 'model', 'field_name', 'last_pk', 'processed', 'optimized', 'up_to_date', 'failed', 'updated_at', 'finished_at'
+    )
+    list_filter = ('run', 'model')
+    readonly_fields = (
+        'run', 'model', 'field_name', 'last_pk', 'processed', 'optimized', 'up_to_date', 'superseded', 'missing', 'failed',
+        'started_at', 'updated_at', 'finished_at'
+    )
+
+    def has_add_permission(self, request):
+        return False
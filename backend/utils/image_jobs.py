@@ -0,0 +1,299 @@
+"""
+Image Processing Jobs
+Moves image optimization out of the request path.
+
+Models call `queue_image_processing` after saving: the upload is stored as-is
+and an ImageProcessingJob is written in the same transaction. The
+`run_image_worker` management command claims due jobs and runs
+`optimize_stored_image` (resize, re-encode, responsive variants) in a process
+pool across cores; the parent process then swaps the optimized file and its
+variant manifest into the row with a single conditional UPDATE - only if the
+field still holds the upload the job was made for, so a newer upload is never
+overwritten by an older job. Failed jobs are retried with exponential backoff.
+"""
+import logging
+import os
+import random
+import uuid
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .image_optimizer import ImageOptimizer, ImageTooLarge
+from .image_variants import build_variants, delete_variants, sync_variants
+
+logger = logging.getLogger(__name__)
+
+OPTIMIZERS = {
+    'product': ImageOptimizer.optimize_product_image,
+    'banner': ImageOptimizer.optimize_banner_image,
+    'category': ImageOptimizer.optimize_category_image,
+    'logo': ImageOptimizer.optimize_logo_image,
+}
+
+
+def queue_image_processing(instance, field_name, kind, manifest_field='image_variants'):
+    """
+    Call after save(): queue the optimization of a new upload in
+    `instance.<field_name>`. A cleared image only has its variants removed.
+    Returns the job, or None when there is nothing to do.
+    """
+    from .models import ImageProcessingJob
+
+    field_file = getattr(instance, field_name)
+    if not field_file:
+        sync_variants(instance, field_name, kind, manifest_field)
+        return None
+    manifest = (getattr(instance, manifest_field) or {}).get(field_name)
+    if manifest and manifest.get('src') == field_file.name:
+        return None  # this file is the processed one
+
+    lookup = {'model': instance._meta.label, 'object_id': str(instance.pk), 'field_name': field_name}
+    # This upload was optimized before: an instance loaded before the worker's
+    # swap was saved, writing back the replaced upload, or (with
+    # ContentAddressedStorage) the same content uploaded for another object.
+    # Reuse the result instead of optimizing again.
+    done = ImageProcessingJob.objects.filter(
+        source_name=field_file.name, kind=kind, status=ImageProcessingJob.Status.DONE
+    ).order_by('-pk').first()
+    if done is not None and field_file.storage.exists(done.result_name):
+        manifests = dict(getattr(instance, manifest_field) or {})
+        manifests[field_name] = done.result_manifest
+        type(instance)._base_manager.filter(pk=instance.pk).update(
+            **{field_name: done.result_name, manifest_field: manifests}
+        )
+        instance.refresh_from_db(fields=[field_name, manifest_field])
+        return None
+
+    job = ImageProcessingJob.objects.filter(
+        **lookup, source_name=field_file.name,
+        status__in=[ImageProcessingJob.Status.PENDING, ImageProcessingJob.Status.PROCESSING],
+    ).first()
+    if job is None:
+        job = ImageProcessingJob.objects.create(**lookup, kind=kind, source_name=field_file.name)
+    if settings.IMAGE_PROCESSING_INLINE:
+        run_job(job.pk)
+        instance.refresh_from_db(fields=[field_name, manifest_field])
+    return job
+
+
+def claim_jobs(batch_size=20, worker_id=None):
+    """
+    Claim up to `batch_size` due jobs for this worker and return their ids.
+    Jobs stuck in PROCESSING longer than IMAGE_JOB_LOCK_TIMEOUT (crashed
+    worker) are claimed again.
+    """
+    from .models import ImageProcessingJob
+
+    worker_id = worker_id or uuid.uuid4().hex
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=settings.IMAGE_JOB_LOCK_TIMEOUT)
+    claimable = (
+        Q(status=ImageProcessingJob.Status.PENDING, available_at__lte=now) |
+        Q(status=ImageProcessingJob.Status.PROCESSING, locked_at__lt=stale_before)
+    )
+
+    candidate_ids = list(
+        ImageProcessingJob.objects.filter(claimable).order_by('id').values_list('id', flat=True)[:batch_size]
+    )
+    if not candidate_ids:
+        return []
+
+    # The status condition is re-checked in the UPDATE so two workers can never
+    # claim the same row.
+    ImageProcessingJob.objects.filter(claimable, id__in=candidate_ids).update(
+        status=ImageProcessingJob.Status.PROCESSING,
+        locked_by=worker_id,
+        locked_at=now,
+        attempts=F('attempts') + 1,
+    )
+    return list(
+        ImageProcessingJob.objects.filter(
+            id__in=candidate_ids, locked_by=worker_id, locked_at=now
+        ).values_list('id', flat=True)
+    )
+
+
+def optimize_stored_image(source_name, kind):
+    """
+    Optimize a stored upload and build its variants; returns (optimized
+    name, variant manifest). Runs in a worker process: storage and Pillow
+    only, no database access.
+    """
+    storage = default_storage
+    with storage.open(source_name, 'rb') as handle:
+        optimized = OPTIMIZERS[kind](handle)
+        if optimized is None or optimized is handle:
+            raise ValueError(f"Could not optimize {source_name}")
+        content = optimized.read()
+    extension = os.path.splitext(optimized.name)[1]
+    name = storage.save(f"{os.path.splitext(source_name)[0]}{extension}", ContentFile(content))
+    try:
+        manifest = build_variants(storage, name, kind)
+    except Exception:
+        storage.delete(name)
+        raise
+    return name, manifest
+
+
+def _discard(names, manifest=None):
+    """Delete images (and the variants of `manifest`) after the transaction commits"""
+    def discard():
+        if manifest:
+            delete_variants(manifest)
+        for name in names:
+            try:
+                default_storage.delete(name)
+            except Exception as e:
+                logger.warning(f"Could not delete image {name}: {e}")
+    transaction.on_commit(discard)
+
+
+def complete_job(job_id, result):
+    """
+    Swap the optimized image and its variants into the object if it still
+    holds the job's upload. Returns the resulting status.
+    """
+    from .models import ImageProcessingJob
+
+    name, manifest = result
+    job = ImageProcessingJob.objects.get(pk=job_id)
+    model = apps.get_model(job.model)
+    objects = model._base_manager.filter(pk=job.object_id)
+    with transaction.atomic():
+        current = objects.select_for_update().values_list(job.field_name, 'image_variants').first()
+        swapped = current is not None and current[0] == job.source_name
+        if swapped:
+            manifests = dict(current[1] or {})
+            previous = manifests.get(job.field_name)
+            manifests[job.field_name] = manifest
+            changes = {job.field_name: name, 'image_variants': manifests}
+            if any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+                changes['updated_at'] = timezone.now()
+            objects.filter(**{job.field_name: job.source_name}).update(**changes)
+            # The original upload, and variants of the image this one replaced
+            _discard([job.source_name], previous if previous and previous['base'] != manifest['base'] else None)
+            status = ImageProcessingJob.Status.DONE
+        else:
+            # A newer upload (or a deletion) got there first: drop this result and the stale upload
+            _discard([name, job.source_name], manifest)
+            status = ImageProcessingJob.Status.SUPERSEDED
+        ImageProcessingJob.objects.filter(pk=job.pk).update(
+            status=status,
+            result_name=name if swapped else None,
+            result_manifest=manifest if swapped else None,
+            locked_by=None,
+            locked_at=None,
+            last_error=None,
+            processed_at=timezone.now(),
+        )
+    return status
+
+
+def swap_optimized_images(model, field_name, results):
+    """
+    Bulk version of the swap in `complete_job`, for `reoptimize_media`:
+    results are (pk, source name, optimized name, manifest). Rows that no
+    longer hold their source get nothing. Returns (swapped, superseded).
+    """
+    fields = [field_name, 'image_variants']
+    if any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+        fields.append('updated_at')
+    with transaction.atomic():
+        current = {
+            pk: (name, manifests)
+            for pk, name, manifests in model._base_manager.select_for_update().filter(
+                pk__in=[result[0] for result in results]
+            ).values_list('pk', field_name, 'image_variants')
+        }
+        objects = []
+        for pk, source_name, name, manifest in results:
+            name_now, manifests = current.get(pk, (None, None))
+            if name_now != source_name:
+                _discard([name], manifest)
+                continue
+            manifests = dict(manifests or {})
+            previous = manifests.get(field_name)
+            manifests[field_name] = manifest
+            obj = model(pk=pk, **{field_name: name, 'image_variants': manifests})
+            if 'updated_at' in fields:
+                obj.updated_at = timezone.now()
+            objects.append(obj)
+            _discard([source_name], previous if previous and previous['base'] != manifest['base'] else None)
+        model._base_manager.bulk_update(objects, fields)
+    return len(objects), len(results) - len(objects)
+
+
+def get_retry_delay(attempts):
+    """Exponential backoff with jitter, capped at IMAGE_JOB_BACKOFF_MAX seconds"""
+    delay = min(settings.IMAGE_JOB_BACKOFF_BASE * (2 ** max(attempts - 1, 0)), settings.IMAGE_JOB_BACKOFF_MAX)
+    return delay + random.uniform(0, delay * 0.1)
+
+
+def fail_job(job_id, error):
+    """
+    Schedule a retry of a failed job, or give up after IMAGE_JOB_MAX_ATTEMPTS.
+    An image over the pixel budget fails at once: retrying cannot help.
+    Returns the resulting status.
+    """
+    from .models import ImageProcessingJob
+
+    job = ImageProcessingJob.objects.get(pk=job_id)
+    logger.warning(f"Image job {job.pk} ({job.source_name}) failed on attempt {job.attempts}: {error}")
+    if isinstance(error, ImageTooLarge) or job.attempts >= settings.IMAGE_JOB_MAX_ATTEMPTS:
+        status = ImageProcessingJob.Status.FAILED
+        available_at = job.available_at
+    else:
+        status = ImageProcessingJob.Status.PENDING
+        available_at = timezone.now() + timedelta(seconds=get_retry_delay(job.attempts))
+    ImageProcessingJob.objects.filter(pk=job.pk).update(
+        status=status,
+        available_at=available_at,
+        locked_by=None,
+        locked_at=None,
+        last_error=str(error)[:2000],
+    )
+    return status
+
+
+def run_job(job_id):
+    """Claim and process one job in this process (IMAGE_PROCESSING_INLINE)"""
+    from .models import ImageProcessingJob
+
+    claimed = ImageProcessingJob.objects.filter(
+        pk=job_id, status=ImageProcessingJob.Status.PENDING
+    ).update(
+        status=ImageProcessingJob.Status.PROCESSING,
+        locked_by='inline',
+        locked_at=timezone.now(),
+        attempts=F('attempts') + 1,
+    )
+    if not claimed:
+        return None
+    job = ImageProcessingJob.objects.get(pk=job_id)
+    try:
+        result = optimize_stored_image(job.source_name, job.kind)
+    except Exception as e:
+        return fail_job(job_id, e)
+    return complete_job(job_id, result)
+
+
+def default_processes():
+    """One process per core, as many as fit in IMAGE_WORKER_MEMORY_BUDGET_MB at the worst-case decode size"""
+    # RGBA bytes of the largest decode, twice over for the converted/resized copy
+    per_process_mb = settings.IMAGE_DECODE_MAX_PIXELS * 4 * 2 / (1024 * 1024)
+    return max(1, min(os.cpu_count() or 1, int(settings.IMAGE_WORKER_MEMORY_BUDGET_MB // per_process_mb)))
+
+
+def init_worker_process():
+    """ProcessPoolExecutor initializer: make settings and apps usable under the spawn start method too"""
+    import django
+
+    if not apps.ready:
+        django.setup()
@@ -5,10 +5,15 @@ Handles image compression, resizing, and responsive image generation
 import os
 from io import BytesIO
 from PIL import Image
+from django.conf import settings
 from django.core.files.uploadedfile import InMemoryUploadedFile
 import sys
 
 
+class ImageTooLarge(ValueError):
+    """The image exceeds IMAGE_MAX_PIXELS, or cannot be decoded within IMAGE_DECODE_MAX_PIXELS"""
+
+
 class ImageOptimizer:
     """
     Optimizes images for web use by compressing and resizing them.
@@ -46,6 +51,54 @@ class ImageOptimizer:
         'medium': {'width': 200, 'height': 200, 'quality': 90},
     }
     
+    @staticmethod
+    def fit_size(width, height, max_width, max_height):
+        """Dimensions of width x height fitted inside max_width x max_height (never enlarged)"""
+        ratio = min(max_width / width, max_height / height, 1)
+        return max(1, int(width * ratio)), max(1, int(height * ratio))
+
+    @classmethod
+    def open_image(cls, image_field, max_width, max_height):
+        """
+        Open and decode an image no larger than needed for a max_width x
+        max_height result, within the memory budget.
+
+        The size is checked from the header before anything is decoded. JPEGs
+        are decoded scaled down by the DCT (draft mode, 1/2 to 1/8), so a 50MP
+        photo never exists in memory at full size; other formats must fit in
+        IMAGE_DECODE_MAX_PIXELS. Resize the result with `resize_image`.
+
+        Returns (image, original size). Raises ImageTooLarge.
+        """
+        img = Image.open(image_field)  # reads the header only
+        width, height = img.size
+        if width * height > settings.IMAGE_MAX_PIXELS:
+            raise ImageTooLarge(f"Image is {width}x{height}, over the {settings.IMAGE_MAX_PIXELS} pixel limit")
+
+        target_width, target_height = cls.fit_size(width, height, max_width, max_height)
+        if img.format == 'JPEG':
+            # Keep reducing_gap times the target so the final resample still has detail to work with
+            gap = settings.IMAGE_REDUCING_GAP
+            img.draft(None, (int(target_width * gap), int(target_height * gap)))
+        if img.size[0] * img.size[1] > settings.IMAGE_DECODE_MAX_PIXELS:
+            raise ImageTooLarge(
+                f"Decoding {img.size[0]}x{img.size[1]} exceeds the {settings.IMAGE_DECODE_MAX_PIXELS} pixel budget"
+            )
+        img.load()
+        return img, (width, height)
+
+    @staticmethod
+    def resize_image(img, size):
+        """LANCZOS resize, shrinking by an integer factor with reduce() first when far larger than `size`"""
+        if img.size == size:
+            return img
+        if img.mode in ('1', 'P'):
+            img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+        factor = int(min(img.size[0] / size[0], img.size[1] / size[1]) / settings.IMAGE_REDUCING_GAP)
+        if factor > 1:
+            img = img.reduce(factor)
+        return img.resize(size, Image.Resampling.LANCZOS)
+
     @staticmethod
     def optimize_image(image_field, max_width=1920, max_height=1920, quality=85, format='JPEG'):
         """
@@ -65,8 +118,12 @@ class ImageOptimizer:
             return None
             
         try:
-            # Open the image
-            img = Image.open(image_field)
+            # Open the image, decoded at the smallest size that still fits the result
+            img, (original_width, original_height) = ImageOptimizer.open_image(image_field, max_width, max_height)
+            
+            # Resize before converting modes: cheaper on fewer pixels
+            new_size = ImageOptimizer.fit_size(original_width, original_height, max_width, max_height)
+            img = ImageOptimizer.resize_image(img, new_size)
             
             # Convert RGBA to RGB if saving as JPEG
             if format == 'JPEG' and img.mode in ('RGBA', 'LA', 'P'):
@@ -79,18 +136,6 @@ class ImageOptimizer:
             elif img.mode not in ('RGB', 'RGBA'):
                 img = img.convert('RGB')
             
-            # Get original dimensions
-            original_width, original_height = img.size
-            
-            # Calculate new dimensions maintaining aspect ratio
-            ratio = min(max_width / original_width, max_height / original_height)
-            
-            # Only resize if image is larger than max dimensions
-            if ratio < 1:
-                new_width = int(original_width * ratio)
-                new_height = int(original_height * ratio)
-                img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            
             # Save to BytesIO
             output = BytesIO()
             
@@ -135,6 +180,8 @@ class ImageOptimizer:
             
             return optimized_file
             
+        except ImageTooLarge:
+            raise
         except Exception as e:
             print(f"Error optimizing image: {e}")
             return image_field  # Return original if optimization fails
@@ -214,7 +261,7 @@ class ImageOptimizer:
             return None, None
         
         try:
-            img = Image.open(image_field)
+            img = Image.open(image_field)  # header only, nothing is decoded
             width, height = img.size
             image_field.seek(0)  # Reset file pointer
             return width, height
@@ -247,10 +294,13 @@ class ImageOptimizer:
             if image_field.size > max_size_bytes:
                 return False, f"Image size exceeds {max_size_mb}MB limit"
             
-            # Check format
+            # Check format and dimensions from the header, without decoding
             img = Image.open(image_field)
             if img.format not in allowed_formats:
                 return False, f"Invalid format. Allowed: {', '.join(allowed_formats)}"
+            width, height = img.size
+            if width * height > settings.IMAGE_MAX_PIXELS:
+                return False, f"Image dimensions {width}x{height} are too large"
             
             image_field.seek(0)  # Reset file pointer
             return True, None
@@ -0,0 +1,152 @@
+"""
+On-demand Image Resizing
+Resizes originals from MEDIA_ROOT to one of the IMAGE_RESIZE_SIZES boxes on
+first request and keeps the result in a disk cache, for
+`/media/r/<width>x<height>/<path>`. Other sizes are refused: each size is one
+more render and cache entry per image, so anonymous clients must not choose
+them freely.
+
+Cache entries are content-addressed: the file name is a SHA-256 of everything
+the output depends on - the original's name, size and modification time, the
+requested box, format and quality - so a replaced original or changed settings
+simply address new entries, and the digest doubles as a strong ETag.
+
+    IMAGE_RESIZE_CACHE_DIR/3f/3fa2...e1.webp
+
+Hits refresh the entry's modification time (at most once per
+IMAGE_RESIZE_TOUCH_INTERVAL), and once the cache outgrows
+IMAGE_RESIZE_CACHE_MAX_MB the least recently used entries are evicted.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils._os import safe_join
+
+from .image_optimizer import ImageOptimizer
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    'WEBP': ('webp', 'image/webp'),
+    'JPEG': ('jpg', 'image/jpeg'),
+}
+
+_last_eviction = 0.0
+
+
+def is_allowed_size(width, height):
+    """Only sizes from IMAGE_RESIZE_SIZES, up to IMAGE_RESIZE_MAX_DIMENSION"""
+    if not (0 < width <= settings.IMAGE_RESIZE_MAX_DIMENSION and 0 < height <= settings.IMAGE_RESIZE_MAX_DIMENSION):
+        return False
+    return f"{width}x{height}" in settings.IMAGE_RESIZE_SIZES
+
+
+def source_path(name):
+    """Absolute path of original `name` under MEDIA_ROOT, or None if it is not a file there"""
+    try:
+        path = safe_join(settings.MEDIA_ROOT, name)
+    except SuspiciousFileOperation:
+        return None
+    return path if os.path.isfile(path) else None
+
+
+def cache_key(path, name, width, height, image_format):
+    stat = os.stat(path)
+    identity = f"{name}\0{stat.st_size}\0{stat.st_mtime_ns}\0{width}x{height}\0{image_format}\0{settings.IMAGE_RESIZE_QUALITY}"
+    return hashlib.sha256(identity.encode()).hexdigest()
+
+
+def cache_path(key, image_format):
+    return os.path.join(settings.IMAGE_RESIZE_CACHE_DIR, key[:2], f"{key}.{FORMATS[image_format][0]}")
+
+
+def get_resized(path, name, width, height, image_format='JPEG'):
+    """
+    Path of the cached `width` x `height` rendition of original `path` and its
+    cache key, rendering it first on a miss. Raises ImageTooLarge, or
+    ValueError when the original is not a readable image.
+    """
+    key = cache_key(path, name, width, height, image_format)
+    cached = cache_path(key, image_format)
+    try:
+        if time.time() - os.path.getmtime(cached) > settings.IMAGE_RESIZE_TOUCH_INTERVAL:
+            os.utime(cached)  # recently used: keep it out of eviction
+        return cached, key
+    except FileNotFoundError:
+        pass
+
+    with open(path, 'rb') as handle:
+        resized = ImageOptimizer.optimize_image(
+            handle, width, height, quality=settings.IMAGE_RESIZE_QUALITY, format=image_format
+        )
+        if resized is None or resized is handle:
+            raise ValueError(f"Could not resize {name}")
+        content = resized.read()
+
+    # Write then rename: a concurrent request never serves a half-written file
+    os.makedirs(os.path.dirname(cached), exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(cached), suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as output:
+            output.write(content)
+        os.replace(temporary, cached)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+    maybe_evict()
+    return cached, key
+
+
+def maybe_evict():
+    """Evict at most once per IMAGE_RESIZE_EVICT_INTERVAL per process: the scan walks the whole cache"""
+    global _last_eviction
+    now = time.monotonic()
+    if now - _last_eviction < settings.IMAGE_RESIZE_EVICT_INTERVAL:
+        return 0
+    _last_eviction = now
+    return evict_cache()
+
+
+def evict_cache(max_bytes=None):
+    """
+    Delete the least recently used entries until the cache is at 90% of
+    IMAGE_RESIZE_CACHE_MAX_MB (or `max_bytes`). Returns the number deleted.
+    """
+    max_bytes = settings.IMAGE_RESIZE_CACHE_MAX_MB * 1024 * 1024 if max_bytes is None else max_bytes
+    entries = []
+    total = 0
+    try:
+        shards = list(os.scandir(settings.IMAGE_RESIZE_CACHE_DIR))
+    except FileNotFoundError:
+        return 0
+    for shard in shards:
+        if not shard.is_dir():
+            continue
+        for entry in os.scandir(shard.path):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+    if total <= max_bytes:
+        return 0
+
+    target = max_bytes * 0.9  # some headroom, so the next miss doesn't evict again
+    deleted = 0
+    for _, size, path in sorted(entries):
+        if total <= target:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        deleted += 1
+    logger.info(f"Evicted {deleted} resized images from the cache")
+    return deleted
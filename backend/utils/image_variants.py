@@ -0,0 +1,261 @@
+"""
+Responsive Image Variants
+Builds the ImageOptimizer size sets of an uploaded image in WebP with a JPEG
+fallback, and describes them in a compact manifest for srcset.
+
+Variants are stored next to the original, under a `variants/` directory, named
+after the original and a short digest of the size set and encoder settings:
+
+    products/thumbnails/shoe.jpg
+    products/thumbnails/variants/shoe.jpg.5d41402a.card.webp
+    products/thumbnails/variants/shoe.jpg.5d41402a.card.jpg
+
+so changing a size set (or VARIANT_VERSION) gives new names instead of
+overwriting files an older manifest still points at. The manifest is recorded
+in the model's `image_variants` JSON field, keyed by image field:
+
+
+    {"thumbnail": {"src": "products/thumbnails/shoe.jpg", "w": 1200, "h": 900, "bytes": 183422,
+                   "base": "products/thumbnails/variants/shoe.jpg.5d41402a",
+                   "sizes": [["thumbnail", 400, 300], ["card", 600, 450], ["detail", 1200, 900]],
+                   "color": "#c8412e", "lqip": "data:image/webp;base64,UklGR..."}}
+
+Every size is fitted inside its box keeping the aspect ratio, never upscaled;
+sizes that would come out the same as a larger one are left out. The
+dimensions, byte size, dominant colour and a tiny blurred placeholder (LQIP)
+let the API describe an image without opening any file.
+"""
+import base64
+import hashlib
+import json
+import logging
+import posixpath
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import ExifTags, Image, ImageOps
+
+from .image_optimizer import ImageOptimizer
+
+logger = logging.getLogger(__name__)
+
+VARIANT_DIR = 'variants'
+VARIANT_FORMATS = (('webp', 'WEBP'), ('jpg', 'JPEG'))
+PLACEHOLDER_SIZE = 16  # longest side of the LQIP, in pixels
+VARIANT_VERSION = 1  # bump when the way variants are encoded changes
+
+SIZE_SETS = {
+    'product': ImageOptimizer.PRODUCT_SIZES,
+    'banner': ImageOptimizer.BANNER_SIZES,
+    'category': ImageOptimizer.CATEGORY_SIZES,
+    'logo': ImageOptimizer.LOGO_SIZES,
+}
+
+# Image fields that get variants: (model, field, size set)
+VARIANT_FIELDS = [
+    ('products.Brand', 'logo', 'logo'),
+    ('products.Category', 'image', 'category'),
+    ('products.SubCategory', 'image', 'category'),
+    ('products.Product', 'thumbnail', 'product'),
+    ('products.ProductAdditionalImage', 'image', 'product'),
+    ('website.HeroBanner', 'image', 'banner'),
+    ('website.OfferBanner', 'image', 'banner'),
+    ('website.HorizontalPromoBanner', 'image', 'banner'),
+    ('website.BlogPost', 'featured_image', 'banner'),
+]
+
+
+def size_set_digest(sizes):
+    """Short hash of a size set and the encoder settings"""
+    key = json.dumps([VARIANT_VERSION, VARIANT_FORMATS, sorted(sizes.items())])
+    return hashlib.sha256(key.encode()).hexdigest()[:8]
+
+
+def variant_base(name, sizes):
+    """Storage name prefix of the variants of original `name` in size set `sizes`"""
+    directory, filename = posixpath.split(name)
+    # The whole file name: shoe.jpg and shoe.png must not share variants
+    return posixpath.join(directory, VARIANT_DIR, f"{filename}.{size_set_digest(sizes)}")
+
+
+def variant_name(base, label, extension):
+    return f"{base}.{label}.{extension}"
+
+
+def _fit(width, height, box_width, box_height):
+    ratio = min(box_width / width, box_height / height, 1)
+    return max(1, round(width * ratio)), max(1, round(height * ratio))
+
+
+def _encode(img, image_format, quality):
+    if image_format == 'JPEG' and img.mode != 'RGB':
+        # JPEG has no alpha: flatten on white like ImageOptimizer does
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel('A') if 'A' in img.getbands() else None)
+        img = background
+    output = BytesIO()
+    if image_format == 'WEBP':
+        img.save(output, format='WEBP', quality=quality, method=4)
+    else:
+        img.save(output, format='JPEG', quality=quality, optimize=True, progressive=True)
+    return output.getvalue()
+
+
+def placeholder_data(img):
+    """Dominant colour and LQIP data URI of an image (ideally an already small one)"""
+    small = img.convert('RGB')
+    small.thumbnail((64, 64), Image.Resampling.BOX)
+    # The most common of a few quantized colours, rather than a muddy average
+    quantized = small.quantize(colors=5)
+    palette = quantized.getpalette()
+    _, index = max(quantized.getcolors())
+    color = '#{:02x}{:02x}{:02x}'.format(*palette[index * 3:index * 3 + 3])
+
+    lqip = img.copy()
+    lqip.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), Image.Resampling.LANCZOS)
+    output = BytesIO()
+    lqip.save(output, format='WEBP', quality=30)
+    return {'color': color, 'lqip': f"data:image/webp;base64,{base64.b64encode(output.getvalue()).decode()}"}
+
+
+def render_variants(image_file, sizes):
+    """
+    (original width, original height, [(label, width, height, {extension: bytes})],
+    placeholder data) for a size set, largest first
+    """
+    box = max(sizes.values(), key=lambda size: size['width'] * size['height'])
+    box_width, box_height = box['width'], box['height']
+    rotated = Image.open(image_file).getexif().get(ExifTags.Base.Orientation) in (5, 6, 7, 8)
+    image_file.seek(0)
+    if rotated:
+        # Stored sideways: the box applies to the image after transposing
+        box_width, box_height = box_height, box_width
+    # Decoded no larger than the biggest size needs, within the memory budget
+    img, (width, height) = ImageOptimizer.open_image(image_file, box_width, box_height)
+    if rotated:
+        width, height = height, width
+    img = ImageOps.exif_transpose(img)
+    has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+    img = img.convert('RGBA' if has_alpha else 'RGB')
+
+    rendered = []
+    seen = set()
+    current = img
+    # Largest first, each one resized from the previous: fewer pixels to resample
+    for label, size in sorted(sizes.items(), key=lambda item: -item[1]['width'] * item[1]['height']):
+        dimensions = _fit(width, height, size['width'], size['height'])
+        if dimensions in seen:
+            continue
+        seen.add(dimensions)
+        if current.size != dimensions:
+            current = ImageOptimizer.resize_image(current, dimensions)
+        files = {
+            extension: _encode(current, image_format, size['quality'])
+            for extension, image_format in VARIANT_FORMATS
+        }
+        rendered.append((label, dimensions[0], dimensions[1], files))
+    # From the smallest size: a few hundred pixels instead of the whole image
+    return width, height, rendered, placeholder_data(current)
+
+
+def build_variants(storage, name, kind):
+    """Write the variants of stored image `name`; returns its manifest"""
+    base = variant_base(name, SIZE_SETS[kind])
+    with storage.open(name, 'rb') as handle:
+        width, height, rendered, placeholder = render_variants(handle, SIZE_SETS[kind])
+    sizes = []
+    for label, variant_width, variant_height, files in rendered:
+        for extension, content in files.items():
+            variant = variant_name(base, label, extension)
+            if storage.exists(variant):
+                storage.delete(variant)
+            storage.save(variant, ContentFile(content))
+        sizes.append([label, variant_width, variant_height])
+    sizes.reverse()  # smallest first, like srcset
+    return {
+        'src': name, 'w': width, 'h': height, 'bytes': storage.size(name),
+        'base': base, 'sizes': sizes, **placeholder,
+    }
+
+
+def add_metadata(storage, manifest):
+    """
+    A copy of a manifest built before byte sizes and placeholders were stored,
+    with them added. Reads the smallest JPEG variant rather than the original.
+    """
+    name = variant_name(manifest['base'], manifest['sizes'][0][0], 'jpg') if manifest.get('sizes') else manifest['src']
+    if not storage.exists(name):
+        name = manifest['src']
+    with storage.open(name, 'rb') as handle:
+        img = Image.open(handle)
+        img.draft(None, (PLACEHOLDER_SIZE * 8, PLACEHOLDER_SIZE * 8))
+        placeholder = placeholder_data(ImageOps.exif_transpose(img) if name == manifest['src'] else img)
+    return {**manifest, 'bytes': storage.size(manifest['src']), **placeholder}
+
+
+def delete_variants(manifest, storage=None):
+    storage = storage or default_storage
+    for label, _, _ in manifest.get('sizes', ()):
+        for extension, _ in VARIANT_FORMATS:
+            name = variant_name(manifest['base'], label, extension)
+            try:
+                storage.delete(name)
+            except Exception as e:
+                logger.warning(f"Could not delete image variant {name}: {e}")
+
+
+def sync_variants(instance, field_name, kind, manifest_field='image_variants', force=False):
+    """
+    Bring the variants of `instance.<field_name>` in line with its file after a
+    save: build them for a new image, remove them for a cleared one. The
+    manifest is written with an UPDATE so the save is not repeated.
+    Returns True when anything changed.
+    """
+    field_file = getattr(instance, field_name)
+    manifests = dict(getattr(instance, manifest_field) or {})
+    current = manifests.get(field_name)
+    if field_file and current and current.get('src') == field_file.name and not force:
+        return False
+    if not field_file and not current:
+        return False
+
+    if current:
+        delete_variants(current, field_file.storage)
+        del manifests[field_name]
+    if field_file:
+        try:
+            manifests[field_name] = build_variants(field_file.storage, field_file.name, kind)
+        except Exception as e:
+            logger.warning(f"Could not build image variants of {field_file.name}: {e}")
+            if not current:
+                return False
+    setattr(instance, manifest_field, manifests)
+    type(instance)._base_manager.filter(pk=instance.pk).update(**{manifest_field: manifests})
+    return True
+
+
+def srcset_data(manifest, request=None, storage=None):
+    """
+    srcset attributes of a manifest for the API:
+    {'width', 'height', 'bytes', 'color', 'placeholder' (LQIP data URI),
+    'src' (largest JPEG), 'webp' and 'jpeg' (srcset strings)}
+    """
+    if not manifest or not manifest.get('sizes'):
+        return None
+    storage = storage or default_storage
+
+    def url(label, extension):
+        path = storage.url(variant_name(manifest['base'], label, extension))
+        return request.build_absolute_uri(path) if request else path
+
+    return {
+        'width': manifest['w'],
+        'height': manifest['h'],
+        'bytes': manifest.get('bytes'),
+        'color': manifest.get('color'),
+        'placeholder': manifest.get('lqip'),
+        'src': url(manifest['sizes'][-1][0], 'jpg'),
+        'webp': ', '.join(f"{url(label, 'webp')} {width}w" for label, width, _ in manifest['sizes']),
+        'jpeg': ', '.join(f"{url(label, 'jpg')} {width}w" for label, width, _ in manifest['sizes']),
+    }
@@ -0,0 +1,61 @@
+"""
+Django management command to add byte sizes, dominant colours and LQIP placeholders to existing image manifests
+"""
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from utils.image_variants import VARIANT_FIELDS, add_metadata
+
+
+class Command(BaseCommand):
+    help = 'Store image metadata (bytes, dominant colour, placeholder) in manifests built before it was recorded'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows read per query')
+        parser.add_argument('--model', help='Only this model, e.g. products.Product')
+
+    def handle(self, *args, **options):
+        total = 0
+        for label, field_name, kind in VARIANT_FIELDS:
+            if options['model'] and options['model'].lower() != label.lower():
+                continue
+            model = apps.get_model(label)
+            self.stdout.write(f'🖼️ {label}.{field_name}...')
+            updated = failed = superseded = 0
+            rows = model._base_manager.filter(**{f'image_variants__{field_name}__isnull': False}).only(
+                'pk', 'image_variants'
+            ).order_by('pk')
+            for instance in rows.iterator(chunk_size=options['batch_size']):
+                manifest = instance.image_variants[field_name]
+                if not manifest or 'lqip' in manifest:
+                    continue
+                try:
+                    enriched = add_metadata(default_storage, manifest)
+                except Exception as e:
+                    self.stdout.write(self.style.WARNING(f"  Skipped {manifest.get('src')}: {e}"))
+                    failed += 1
+                    continue
+                if self.store(model, instance.pk, field_name, enriched):
+                    updated += 1
+                else:
+                    superseded += 1
+            self.stdout.write(f'  {updated} updated, {failed} skipped, {superseded} changed meanwhile')
+            total += updated
+        self.stdout.write(self.style.SUCCESS(f'✅ Added metadata to {total} image manifest(s)'))
+
+    def store(self, model, pk, field_name, manifest):
+        """
+        Write `manifest` into the row's image_variants if the row still holds
+        its image: an image job may have swapped in a new one while the
+        metadata was computed. Only this field's manifest is replaced.
+        """
+        objects = model._base_manager.filter(pk=pk)
+        with transaction.atomic():
+            current = objects.select_for_update().values_list('image_variants', flat=True).first()
+            stored = (current or {}).get(field_name)
+            if not stored or stored.get('src') != manifest['src']:
+                return False
+            objects.update(image_variants={**current, field_name: manifest})
+        return True
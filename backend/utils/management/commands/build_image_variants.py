@@ -0,0 +1,32 @@
+"""
+Django management command to build the responsive WebP/JPEG variants of uploaded images
+"""
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from utils.image_variants import VARIANT_FIELDS, sync_variants
+
+
+class Command(BaseCommand):
+    help = 'Build missing or outdated image variants for products, categories, brands, banners and blog posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Rebuild variants that are already up to date')
+        parser.add_argument('--model', help='Only this model, e.g. products.Product')
+
+    def handle(self, *args, **options):
+        total = 0
+        for label, field_name, kind in VARIANT_FIELDS:
+            if options['model'] and options['model'].lower() != label.lower():
+                continue
+            model = apps.get_model(label)
+            self.stdout.write(f'🖼️ {label}.{field_name}...')
+            built = 0
+            for instance in model._base_manager.exclude(**{field_name: ''}).exclude(
+                **{f'{field_name}__isnull': True}
+            ).order_by('pk').iterator(chunk_size=500):
+                if sync_variants(instance, field_name, kind, force=options['force']):
+                    built += 1
+            self.stdout.write(f'  {built} updated')
+            total += built
+        self.stdout.write(self.style.SUCCESS(f'✅ Updated variants of {total} image(s)'))
@@ -0,0 +1,139 @@
+"""
+Django management command to re-optimize existing images and build their variants, resumably and in parallel
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from utils.image_jobs import default_processes, init_worker_process, optimize_stored_image, swap_optimized_images
+from utils.image_variants import VARIANT_FIELDS
+from utils.models import ImageProcessingJob, MediaReoptimizationCheckpoint
+
+POOL_ATTEMPTS = 3  # times an image is submitted again after a worker process died while it was in flight
+
+
+class Command(BaseCommand):
+    help = 'Re-optimize every stored image (resize, re-encode, variants) across all cores, resuming where the last run stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--run', default='default', help='Run name: progress is checkpointed per run')
+        parser.add_argument('--restart', action='store_true', help='Discard the checkpoints of this run and start over')
+        parser.add_argument('--model', help='Only this model, e.g. products.Product')
+        parser.add_argument('--force', action='store_true',
+                            help='Also re-encode images that were already optimized (each pass loses some quality)')
+        parser.add_argument('--chunk-size', type=int, default=200, help='Rows optimized and checkpointed together')
+        parser.add_argument('--processes', type=int, default=None,
+                            help='Number of worker processes (default: cores, limited by IMAGE_WORKER_MEMORY_BUDGET_MB)')
+
+    def _new_pool(self, processes):
+        return ProcessPoolExecutor(max_workers=processes, initializer=init_worker_process)
+
+    def handle(self, *args, **options):
+        if options['restart']:
+            MediaReoptimizationCheckpoint.objects.filter(run=options['run']).delete()
+        processes = max(options['processes'] or default_processes(), 1)
+        self.stdout.write(f"🖼️ Re-optimizing media (run '{options['run']}', {processes} processes)...")
+
+        pool = self._new_pool(processes)
+        try:
+            for label, field_name, kind in VARIANT_FIELDS:
+                if options['model'] and options['model'].lower() != label.lower():
+                    continue
+                checkpoint, _ = MediaReoptimizationCheckpoint.objects.get_or_create(
+                    run=options['run'], model=label, field_name=field_name
+                )
+                if checkpoint.finished_at:
+                    self.stdout.write(f'  {label}.{field_name}: already finished in this run')
+                    continue
+                pool = self._reoptimize_field(pool, processes, checkpoint, apps.get_model(label), field_name, kind, options)
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Interrupted: run the command again to resume'))
+            return
+        finally:
+            pool.shutdown(cancel_futures=True)
+
+        checkpoints = MediaReoptimizationCheckpoint.objects.filter(run=options['run'])
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Re-optimized {sum(c.optimized for c in checkpoints)} of {sum(c.processed for c in checkpoints)} images "
+            f"({sum(c.up_to_date for c in checkpoints)} already optimized, "
+            f"{sum(c.missing for c in checkpoints)} missing, {sum(c.failed for c in checkpoints)} failed)"
+        ))
+
+    def _reoptimize_field(self, pool, processes, checkpoint, model, field_name, kind, options):
+        """Process one image field chunk by chunk from the checkpoint; returns the (possibly rebuilt) pool"""
+        rows = model._base_manager.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True}).order_by('pk')
+        while True:
+            chunk = rows.filter(pk__gt=checkpoint.last_pk) if checkpoint.last_pk else rows
+            chunk = list(chunk.values_list('pk', field_name, 'image_variants')[:options['chunk_size']])
+            if not chunk:
+                break
+
+            # Uploads still queued for the image worker are left to it
+            queued = set(ImageProcessingJob.objects.filter(
+                model=model._meta.label, field_name=field_name, object_id__in=[str(pk) for pk, _, _ in chunk],
+                status__in=[ImageProcessingJob.Status.PENDING, ImageProcessingJob.Status.PROCESSING],
+            ).values_list('object_id', flat=True))
+            submit = []
+            up_to_date = missing = failed = 0
+            for pk, name, manifests in chunk:
+                if str(pk) in queued:
+                    continue
+                # The file is the output of an earlier optimization: re-encoding it only loses quality
+                if not options['force'] and ((manifests or {}).get(field_name) or {}).get('src') == name:
+                    up_to_date += 1
+                    continue
+                if not default_storage.exists(name):
+                    missing += 1
+                    continue
+                submit.append((pk, name))
+
+            results = []
+            attempts = {}
+            while submit:
+                futures = {pool.submit(optimize_stored_image, name, kind): (pk, name) for pk, name in submit}
+                submit = []
+                broken = False
+                for future in as_completed(futures):
+                    pk, name = futures[future]
+                    try:
+                        results.append((pk, name, *future.result()))
+                    except BrokenProcessPool:
+                        # Every image in flight fails with the one that killed the worker: try them again
+                        broken = True
+                        attempts[pk] = attempts.get(pk, 0) + 1
+                        if attempts[pk] < POOL_ATTEMPTS:
+                            submit.append((pk, name))
+                        else:
+                            self.stdout.write(self.style.WARNING(f'  Could not optimize {name}: worker process died'))
+                            failed += 1
+                    except Exception as e:
+                        self.stdout.write(self.style.WARNING(f'  Could not optimize {name}: {e}'))
+                        failed += 1
+                if broken:
+                    # A child died (e.g. out of memory on a huge image): start a fresh pool
+                    self.stdout.write(self.style.WARNING('Worker process died, restarting the pool'))
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = self._new_pool(processes)
+
+            swapped, superseded = swap_optimized_images(model, field_name, results) if results else (0, 0)
+            checkpoint.last_pk = str(chunk[-1][0])
+            checkpoint.processed += len(chunk)
+            checkpoint.optimized += swapped
+            checkpoint.up_to_date += up_to_date
+            checkpoint.superseded += superseded
+            checkpoint.missing += missing
+            checkpoint.failed += failed
+            checkpoint.save()
+            self.stdout.write(
+                f'  {model._meta.label}.{field_name}: {checkpoint.processed} processed, '
+                f'{checkpoint.optimized} optimized, {checkpoint.up_to_date} already optimized, '
+                f'{checkpoint.missing} missing, {checkpoint.failed} failed'
+            )
+
+        checkpoint.finished_at = timezone.now()
+        checkpoint.save()
+        return pool
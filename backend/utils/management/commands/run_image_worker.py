@@ -0,0 +1,88 @@
+"""
+Django management command that optimizes queued image uploads
+"""
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from utils.image_jobs import (
+    claim_jobs, complete_job, default_processes, fail_job, init_worker_process, optimize_stored_image,
+)
+from utils.models import ImageProcessingJob
+
+
+class Command(BaseCommand):
+    help = 'Optimize uploaded images (resize, re-encode, responsive variants) in a process pool, with retries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=None,
+                            help='Number of worker processes (default: cores, limited by IMAGE_WORKER_MEMORY_BUDGET_MB)')
+        parser.add_argument('--batch-size', type=int, default=20, help='Jobs claimed per poll')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Process the currently due jobs and exit')
+
+    def _new_pool(self, processes):
+        return ProcessPoolExecutor(max_workers=processes, initializer=init_worker_process)
+
+    def handle(self, *args, **options):
+        worker_id = f"images-{uuid.uuid4().hex[:12]}"
+        processes = max(options['processes'] or default_processes(), 1)
+        self.stdout.write(f'Image worker {worker_id} started with {processes} processes')
+
+        totals = {status: 0 for status in ImageProcessingJob.Status.values}
+        pool = self._new_pool(processes)
+        try:
+            while True:
+                close_old_connections()
+                job_ids = claim_jobs(options['batch_size'], worker_id=worker_id)
+                if not job_ids:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                jobs = ImageProcessingJob.objects.filter(pk__in=job_ids).values_list('pk', 'source_name', 'kind')
+                futures = {
+                    pool.submit(optimize_stored_image, source_name, kind): job_id
+                    for job_id, source_name, kind in jobs
+                }
+                broken = False
+                # Swaps happen here in the parent, the only process touching the database
+                for future in as_completed(futures):
+                    job_id = futures[future]
+                    try:
+                        status = complete_job(job_id, future.result())
+                    except BrokenProcessPool as e:
+                        broken = True
+                        status = fail_job(job_id, e)
+                    except Exception as e:
+                        status = fail_job(job_id, e)
+                    totals[status] += 1
+                if broken:
+                    # A child died (e.g. out of memory on a huge image): start a fresh pool
+                    self.stdout.write(self.style.WARNING('Worker process died, restarting the pool'))
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = self._new_pool(processes)
+
+                self.stdout.write(
+                    f"Processed {len(futures)} images "
+                    f"(done={totals[ImageProcessingJob.Status.DONE]}, "
+                    f"superseded={totals[ImageProcessingJob.Status.SUPERSEDED]}, "
+                    f"retrying={totals[ImageProcessingJob.Status.PENDING]}, "
+                    f"failed={totals[ImageProcessingJob.Status.FAILED]})"
+                )
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Stopping image worker...'))
+        finally:
+            pool.shutdown(cancel_futures=True)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Image worker finished: {totals[ImageProcessingJob.Status.DONE]} done, "
+            f"{totals[ImageProcessingJob.Status.SUPERSEDED]} superseded, "
+            f"{totals[ImageProcessingJob.Status.PENDING]} scheduled for retry, "
+            f"{totals[ImageProcessingJob.Status.FAILED]} failed"
+        ))
@@ -0,0 +1,151 @@
+"""
+Django management command to delete uploaded media files that no database row references
+"""
+import os
+import posixpath
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import models
+
+from utils.image_variants import VARIANT_DIR, VARIANT_FORMATS, variant_name
+from utils.models import ImageProcessingJob
+
+
+class Command(BaseCommand):
+    help = 'Delete files under the upload directories that no file field, image manifest or queued job references'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age', type=float, default=24,
+                            help='Only delete files older than this many hours (uploads in flight are kept)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Files deleted per batch')
+        parser.add_argument('--dry-run', action='store_true', help='Report orphaned files without deleting them')
+
+    def handle(self, *args, **options):
+        self.stdout.write('🔎 Collecting referenced media...')
+        referenced, references, directories = self._referenced_files()
+        self.stdout.write(f'  {references} file field values, {len(referenced)} referenced files including variants')
+
+        cutoff = time.time() - options['min_age'] * 3600
+        deleted = freed = 0
+        batch = []
+        for path, size in self._orphans(directories, referenced, cutoff):
+            batch.append(path)
+            freed += size
+            if len(batch) >= options['batch_size']:
+                deleted += self._delete(batch, cutoff, options['dry_run'])
+                batch = []
+        if batch:
+            deleted += self._delete(batch, cutoff, options['dry_run'])
+
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f'✅ {verb} {deleted} orphaned files ({freed / (1024 * 1024):.1f} MB)'))
+
+    def _referenced_files(self):
+        """
+        (names of every referenced file, number of references, upload directories),
+        streamed from the database
+        """
+        referenced = set()
+        references = 0
+        directories = set()
+        for model in apps.get_models():
+            file_fields = [field for field in model._meta.concrete_fields if isinstance(field, models.FileField)]
+            for field in file_fields:
+                if isinstance(field.upload_to, str) and field.upload_to.strip('/'):
+                    directories.add(field.upload_to.strip('/'))
+                names = model._base_manager.exclude(**{field.name: ''}).exclude(
+                    **{f'{field.name}__isnull': True}
+                ).values_list(field.name, flat=True)
+                for name in names.iterator(chunk_size=2000):
+                    referenced.add(name)
+                    references += 1
+            if file_fields and any(field.name == 'image_variants' for field in model._meta.concrete_fields):
+                for manifests in model._base_manager.values_list('image_variants', flat=True).iterator(chunk_size=2000):
+                    for manifest in (manifests or {}).values():
+                        referenced.add(manifest['src'])
+                        for label, _, _ in manifest.get('sizes', ()):
+                            for extension, _ in VARIANT_FORMATS:
+                                referenced.add(variant_name(manifest['base'], label, extension))
+
+        # Uploads waiting for the image worker
+        referenced.update(ImageProcessingJob.objects.filter(
+            status__in=[ImageProcessingJob.Status.PENDING, ImageProcessingJob.Status.PROCESSING]
+        ).values_list('source_name', flat=True))
+        # Nested upload directories are walked as part of their parent
+        directories = {d for d in directories if not any(d.startswith(f'{other}/') for other in directories)}
+        return referenced, references, sorted(directories)
+
+    def _orphans(self, directories, referenced, cutoff):
+        """(path, size) of unreferenced files older than `cutoff` in the upload directories"""
+        for directory in directories:
+            root = os.path.join(settings.MEDIA_ROOT, directory)
+            for dirpath, _, filenames in os.walk(root):
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    name = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/')
+                    if name in referenced:
+                        continue
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    if stat.st_mtime < cutoff:
+                        yield path, stat.st_size
+
+    def _referenced_now(self, names):
+        """
+        The subset of `names` referenced right now. The referenced set was
+        collected before the walk, so a file reused since then (a new upload of
+        the same content, a finished job's result) is caught here.
+        """
+        names = set(names)
+        variant_bases = {
+            name.rsplit('.', 2)[0] for name in names if posixpath.basename(posixpath.dirname(name)) == VARIANT_DIR
+        }
+        found = set()
+        for model in apps.get_models():
+            file_fields = [field for field in model._meta.concrete_fields if isinstance(field, models.FileField)]
+            for field in file_fields:
+                found.update(
+                    model._base_manager.filter(**{f'{field.name}__in': names}).values_list(field.name, flat=True)
+                )
+            if not file_fields or not any(field.name == 'image_variants' for field in model._meta.concrete_fields):
+                continue
+            manifest_query = models.Q()
+            for field in file_fields:
+                manifest_query |= models.Q(**{f'image_variants__{field.name}__src__in': names})
+                if variant_bases:
+                    manifest_query |= models.Q(**{f'image_variants__{field.name}__base__in': variant_bases})
+            for manifests in model._base_manager.filter(manifest_query).values_list('image_variants', flat=True):
+                for manifest in (manifests or {}).values():
+                    found.add(manifest['src'])
+                    for label, _, _ in manifest.get('sizes', ()):
+                        found.update(variant_name(manifest['base'], label, extension) for extension, _ in VARIANT_FORMATS)
+        found.update(ImageProcessingJob.objects.filter(
+            source_name__in=names,
+            status__in=[ImageProcessingJob.Status.PENDING, ImageProcessingJob.Status.PROCESSING],
+        ).values_list('source_name', flat=True))
+        return found & names
+
+    def _delete(self, paths, cutoff, dry_run):
+        names = {path: os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/') for path in paths}
+        referenced = self._referenced_now(names.values())
+        paths = [path for path in paths if names[path] not in referenced]
+        if dry_run:
+            for path in paths:
+                self.stdout.write(f'  {names[path]}')
+            return len(paths)
+        deleted = 0
+        for path in paths:
+            try:
+                if os.stat(path).st_mtime >= cutoff:
+                    continue  # saved again since the walk
+                os.remove(path)
+                deleted += 1
+            except FileNotFoundError:
+                pass
+        self.stdout.write(f'  Deleted a batch of {deleted} files')
+        return deleted
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.4 on 2026-10-19 03:36
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageProcessingJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(help_text='App label and model, e.g. products.Product', max_length=100)),
+                ('object_id', models.CharField(help_text='Primary key of the object', max_length=64)),
+                ('field_name', models.CharField(max_length=50)),
+                ('kind', models.CharField(help_text='Size set: product, banner, category or logo', max_length=20)),
+                ('source_name', models.CharField(help_text='Storage name of the uploaded original', max_length=255)),
+                ('result_name', models.CharField(blank=True, help_text='Storage name of the optimized image', max_length=255, null=True)),
+                ('result_manifest', models.JSONField(blank=True, help_text='Variant manifest of the optimized image', null=True)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('PROCESSING', 'Processing'), ('DONE', 'Done'), ('SUPERSEDED', 'Superseded'), ('FAILED', 'Failed')], default='PENDING', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now, help_text='Earliest time a worker may pick up this job')),
+                ('locked_by', models.CharField(blank=True, help_text='Worker that claimed this job', max_length=64, null=True)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Image Processing Job',
+                'verbose_name_plural': 'Image Processing Jobs',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['status', 'available_at'], name='imagejob_status_available_idx'), models.Index(fields=['model', 'object_id', 'field_name'], name='imagejob_object_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-19 03:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utils', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaReoptimizationCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run', models.CharField(help_text='Name of the re-optimization run', max_length=50)),
+                ('model', models.CharField(help_text='App label and model, e.g. products.Product', max_length=100)),
+                ('field_name', models.CharField(max_length=50)),
+                ('last_pk', models.CharField(blank=True, default='', help_text='Highest primary key processed so far', max_length=64)),
+                ('processed', models.PositiveIntegerField(default=0)),
+                ('optimized', models.PositiveIntegerField(default=0)),
+                ('superseded', models.PositiveIntegerField(default=0, help_text='Images replaced by a new upload while being optimized')),
+                ('missing', models.PositiveIntegerField(default=0, help_text='Rows whose file does not exist')),
+                ('failed', models.PositiveIntegerField(default=0)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Media Re-optimization Checkpoint',
+                'verbose_name_plural': 'Media Re-optimization Checkpoints',
+                'ordering': ['run', 'model', 'field_name'],
+                'constraints': [models.UniqueConstraint(fields=('run', 'model', 'field_name'), name='media_reopt_checkpoint_uniq')],
+            },
+        ),
+    ]
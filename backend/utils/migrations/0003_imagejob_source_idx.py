@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-19 04:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utils', '0002_media_reoptimization_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='imageprocessingjob',
+            index=models.Index(fields=['source_name', 'kind', 'status'], name='imagejob_source_idx'),
+        ),
+    ]
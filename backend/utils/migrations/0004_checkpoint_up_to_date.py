@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 04:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utils', '0003_imagejob_source_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediareoptimizationcheckpoint',
+            name='up_to_date',
+            field=models.PositiveIntegerField(default=0, help_text='Rows whose image was already optimized'),
+        ),
+    ]
@@ -0,0 +1,80 @@
+# utils/models.py
+from django.db import models
+from django.utils import timezone
+
+
+class ImageProcessingJob(models.Model):
+    """
+    Optimization of one uploaded image, queued by the model's save() and
+    processed by the `run_image_worker` management command, so resizing and
+    encoding never run inside an admin or API request.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'Pending'
+        PROCESSING = 'PROCESSING', 'Processing'
+        DONE = 'DONE', 'Done'
+        SUPERSEDED = 'SUPERSEDED', 'Superseded'
+        FAILED = 'FAILED', 'Failed'
+
+    model = models.CharField(max_length=100, help_text="App label and model, e.g. products.Product")
+    object_id = models.CharField(max_length=64, help_text="Primary key of the object")
+    field_name = models.CharField(max_length=50)
+    kind = models.CharField(max_length=20, help_text="Size set: product, banner, category or logo")
+    source_name = models.CharField(max_length=255, help_text="Storage name of the uploaded original")
+    result_name = models.CharField(max_length=255, blank=True, null=True, help_text="Storage name of the optimized image")
+    result_manifest = models.JSONField(blank=True, null=True, help_text="Variant manifest of the optimized image")
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now, help_text="Earliest time a worker may pick up this job")
+    locked_by = models.CharField(max_length=64, blank=True, null=True, help_text="Worker that claimed this job")
+    locked_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = "Image Processing Job"
+        verbose_name_plural = "Image Processing Jobs"
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='imagejob_status_available_idx'),
+            models.Index(fields=['model', 'object_id', 'field_name'], name='imagejob_object_idx'),
+            models.Index(fields=['source_name', 'kind', 'status'], name='imagejob_source_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.model} {self.object_id} {self.field_name} ({self.get_status_display()})"
+
+
+class MediaReoptimizationCheckpoint(models.Model):
+    """
+    Progress of `reoptimize_media` through one image field: the command
+    continues after `last_pk`, so an interrupted run resumes where it stopped.
+    """
+
+    run = models.CharField(max_length=50, help_text="Name of the re-optimization run")
+    model = models.CharField(max_length=100, help_text="App label and model, e.g. products.Product")
+    field_name = models.CharField(max_length=50)
+    last_pk = models.CharField(max_length=64, blank=True, default='', help_text="Highest primary key processed so far")
+    processed = models.PositiveIntegerField(default=0)
+    optimized = models.PositiveIntegerField(default=0)
+    up_to_date = models.PositiveIntegerField(default=0, help_text="Rows whose image was already optimized")
+    superseded = models.PositiveIntegerField(default=0, help_text="Images replaced by a new upload while being optimized")
+    missing = models.PositiveIntegerField(default=0, help_text="Rows whose file does not exist")
+    failed = models.PositiveIntegerField(default=0)
+    started_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['run', 'model', 'field_name']
+        verbose_name = "Media Re-optimization Checkpoint"
+        verbose_name_plural = "Media Re-optimization Checkpoints"
+        constraints = [
+            models.UniqueConstraint(fields=['run', 'model', 'field_name'], name='media_reopt_checkpoint_uniq'),
+        ]
+
+    def __str__(self):
+        state = 'finished' if self.finished_at else f'after pk {self.last_pk or "-"}'
+        return f"{self.run}: {self.model}.{self.field_name} ({state})"
@@ -0,0 +1,79 @@
+"""
+Content-Addressed Media Storage
+A FileSystemStorage that names uploads after a hash of their content, so the
+same photo uploaded for dozens of products is stored once:
+
+    products/thumbnails/shoe.jpg  ->  products/thumbnails/9f86d081884c7d659a2feaa0c55ad015.jpg
+
+The upload directory and the (lower-cased) extension are kept. Saving content
+that is already stored writes nothing and returns the existing name.
+Variants (utils.image_variants) keep their names: these are derived from the
+content-addressed original and a digest of the size set and encoder settings,
+so an existing variant name always holds the same content, and is shared the
+same way.
+
+A stored file may be referenced by any number of rows, so `delete()` never
+removes anything; `python manage.py sweep_orphan_media` deletes the files no
+row references any more. Saving content that is already stored refreshes the
+file's mtime, so a sweep never takes a file that was just reused for an old one.
+"""
+import hashlib
+import logging
+import os
+import posixpath
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+
+from .image_variants import VARIANT_DIR
+
+logger = logging.getLogger(__name__)
+
+DIGEST_LENGTH = 32  # hex characters of the SHA-256 kept in names
+
+
+def content_digest(content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()[:DIGEST_LENGTH]
+
+
+class ContentAddressedStorage(FileSystemStorage):
+
+    def get_available_name(self, name, max_length=None):
+        # Names are addressed by content: an existing file is the same file, never a clash
+        return name
+
+    def _save(self, name, content):
+        directory, filename = posixpath.split(name)
+        if posixpath.basename(directory) != VARIANT_DIR:
+            extension = os.path.splitext(filename)[1].lower()
+            name = posixpath.join(directory, f"{content_digest(content)}{extension}")
+        if self.exists(name):
+            try:
+                # Reused now: keeps it out of sweep_orphan_media's --min-age window
+                os.utime(self.path(name))
+                return name
+            except FileNotFoundError:
+                pass  # swept meanwhile: write it again
+
+        # Write then rename: concurrent saves of the same content never expose a partial file
+        full_path = self.path(name)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(full_path), suffix='.upload')
+        try:
+            with os.fdopen(descriptor, 'wb') as output:
+                for chunk in content.chunks():
+                    output.write(chunk)
+            os.chmod(temporary, self.file_permissions_mode if self.file_permissions_mode is not None else 0o644)
+            os.replace(temporary, full_path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        return name
+
+    def delete(self, name):
+        # Possibly shared with other rows: sweep_orphan_media removes it once unreferenced
+        logger.debug(f"Leaving {name} for sweep_orphan_media")
@@ -0,0 +1,247 @@
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from products.models import Brand
+
+from .management.commands.reoptimize_media import Command as ReoptimizeMedia
+from .management.commands.sweep_orphan_media import Command as SweepOrphanMedia
+from .image_jobs import complete_job, optimize_stored_image, queue_image_processing, run_job
+from .image_variants import SIZE_SETS, add_metadata, variant_base
+from .models import ImageProcessingJob, MediaReoptimizationCheckpoint
+
+
+def image_file(size=(1200, 900), color=(200, 40, 40)):
+    output = BytesIO()
+    Image.new('RGB', size, color).save(output, 'JPEG', quality=95)
+    return ContentFile(output.getvalue(), name='logo.jpg')
+
+
+class MediaTestCase(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, IMAGE_RESIZE_SIZES=['200x200'])
+class ResizedImageTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache_override = override_settings(IMAGE_RESIZE_CACHE_DIR=self.cache_dir)
+        self.cache_override.enable()
+        self.name = default_storage.save('brands/a.jpg', image_file())
+
+    def tearDown(self):
+        self.cache_override.disable()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        super().tearDown()
+
+    def test_allowed_size_is_rendered_and_cached(self):
+        response = self.client.get(f'/media/r/200x200/{self.name}', HTTP_ACCEPT='image/webp')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertEqual(Image.open(BytesIO(b''.join(response.streaming_content))).size, (200, 150))
+
+        revalidated = self.client.get(
+            f'/media/r/200x200/{self.name}', HTTP_ACCEPT='image/webp', HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_other_sizes_are_refused(self):
+        self.assertEqual(self.client.get(f'/media/r/201x200/{self.name}').status_code, 404)
+        self.assertEqual(self.client.get('/media/r/200x200/../settings.py').status_code, 404)
+
+
+class ContentAddressedStorageTests(MediaTestCase):
+
+    def test_identical_uploads_are_stored_once(self):
+        first = default_storage.save('brands/a.JPG', image_file())
+        second = default_storage.save('brands/b.jpg', image_file())
+        self.assertEqual(first, second)
+        self.assertRegex(first, r'^brands/[0-9a-f]{32}\.jpg$')
+        self.assertNotEqual(default_storage.save('brands/c.jpg', image_file(color=(0, 0, 0))), first)
+
+    def test_identical_upload_refreshes_the_stored_file(self):
+        name = default_storage.save('brands/a.jpg', image_file())
+        old = time.time() - 2 * 86400
+        os.utime(default_storage.path(name), (old, old))
+        default_storage.save('brands/b.jpg', image_file())
+        self.assertGreater(os.path.getmtime(default_storage.path(name)), old + 86400)
+
+    def test_delete_leaves_shared_files(self):
+        name = default_storage.save('brands/a.jpg', image_file())
+        default_storage.delete(name)
+        self.assertTrue(default_storage.exists(name))
+
+    def test_changed_size_set_gets_new_variant_names(self):
+        sizes = SIZE_SETS['logo']
+        label = next(iter(sizes))
+        changed = {**sizes, label: {**sizes[label], 'quality': sizes[label]['quality'] - 10}}
+        self.assertNotEqual(variant_base('brands/a.jpg', sizes), variant_base('brands/a.jpg', changed))
+
+
+class ImageJobTests(MediaTestCase):
+
+    def test_job_swaps_in_the_optimized_image(self):
+        brand = Brand.objects.create(name='Acme', slug='acme', logo=image_file((2000, 1500)))
+        upload = brand.logo.name
+        job = ImageProcessingJob.objects.get(source_name=upload)
+
+        self.assertEqual(run_job(job.pk), ImageProcessingJob.Status.DONE)
+        brand.refresh_from_db()
+        self.assertNotEqual(brand.logo.name, upload)
+        manifest = brand.image_variants['logo']
+        self.assertEqual(manifest['src'], brand.logo.name)
+        self.assertEqual((manifest['w'], manifest['h']), (400, 300))
+
+    def test_identical_upload_reuses_the_finished_job(self):
+        first = Brand.objects.create(name='Acme', slug='acme', logo=image_file())
+        run_job(ImageProcessingJob.objects.get(source_name=first.logo.name).pk)
+        first.refresh_from_db()
+
+        second = Brand.objects.create(name='Other', slug='other', logo=image_file())
+        second.refresh_from_db()
+        self.assertEqual(second.logo.name, first.logo.name)
+        self.assertEqual(ImageProcessingJob.objects.count(), 1)
+
+    def test_newer_upload_supersedes_the_job(self):
+        brand = Brand.objects.create(name='Acme', slug='acme', logo=image_file())
+        job = ImageProcessingJob.objects.get(source_name=brand.logo.name)
+        result = optimize_stored_image(job.source_name, job.kind)
+
+        Brand.objects.filter(pk=brand.pk).update(logo=default_storage.save('brands/new.jpg', image_file(color=(1, 2, 3))))
+        self.assertEqual(complete_job(job.pk, result), ImageProcessingJob.Status.SUPERSEDED)
+        brand.refresh_from_db()
+        self.assertNotEqual(brand.logo.name, result[0])
+
+    def test_unchanged_image_is_not_queued_again(self):
+        brand = Brand.objects.create(name='Acme', slug='acme', logo=image_file())
+        run_job(ImageProcessingJob.objects.get().pk)
+        brand.refresh_from_db()
+        self.assertIsNone(queue_image_processing(brand, 'logo', 'logo'))
+
+
+class SweepOrphanMediaTests(MediaTestCase):
+
+    def test_unreferenced_files_are_deleted(self):
+        brand = Brand.objects.create(name='Acme', slug='acme', logo=image_file())
+        orphan = default_storage.save('brands/orphan.jpg', image_file(color=(0, 0, 0)))
+        recent = default_storage.save('brands/recent.jpg', image_file(color=(9, 9, 9)))
+        old = time.time() - 2 * 86400
+        for name in (brand.logo.name, orphan):
+            os.utime(default_storage.path(name), (old, old))
+
+        call_command('sweep_orphan_media', stdout=StringIO())
+        self.assertTrue(default_storage.exists(brand.logo.name))
+        self.assertFalse(default_storage.exists(orphan))
+        self.assertTrue(default_storage.exists(recent))
+
+    def test_file_referenced_during_the_sweep_is_kept(self):
+        orphan = default_storage.save('brands/orphan.jpg', image_file(color=(0, 0, 0)))
+        old = time.time() - 2 * 86400
+        os.utime(default_storage.path(orphan), (old, old))
+        collect = SweepOrphanMedia._referenced_files
+
+        def collect_then_reference(command):
+            referenced = collect(command)
+            Brand.objects.create(name='Acme', slug='acme')
+            Brand.objects.filter(slug='acme').update(logo=orphan)
+            return referenced
+
+        with mock.patch.object(SweepOrphanMedia, '_referenced_files', collect_then_reference):
+            call_command('sweep_orphan_media', stdout=StringIO())
+        self.assertTrue(default_storage.exists(orphan))
+
+    def test_dry_run_deletes_nothing(self):
+        orphan = default_storage.save('brands/orphan.jpg', image_file())
+        call_command('sweep_orphan_media', '--dry-run', '--min-age', '0', stdout=StringIO())
+        self.assertTrue(default_storage.exists(orphan))
+
+
+class ReoptimizeMediaTests(MediaTestCase):
+
+    def test_optimized_images_are_not_encoded_again(self):
+        brand = Brand.objects.create(name='Acme', slug='acme', logo=image_file())
+        run_job(ImageProcessingJob.objects.get().pk)
+        brand.refresh_from_db()
+
+        call_command('reoptimize_media', '--model', 'products.Brand', '--processes', '1', stdout=StringIO())
+        checkpoint = MediaReoptimizationCheckpoint.objects.get(model='products.Brand')
+        self.assertEqual((checkpoint.processed, checkpoint.up_to_date, checkpoint.optimized), (1, 1, 0))
+        self.assertEqual(Brand.objects.get(pk=brand.pk).logo.name, brand.logo.name)
+
+
+class BackfillImageMetadataTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.brand = Brand.objects.create(name='Acme', slug='acme', logo=image_file())
+        run_job(ImageProcessingJob.objects.get().pk)
+        self.brand.refresh_from_db()
+        self.manifest = {key: value for key, value in self.brand.image_variants['logo'].items() if key != 'lqip'}
+        Brand.objects.filter(pk=self.brand.pk).update(image_variants={'logo': self.manifest})
+
+    def test_metadata_is_added(self):
+        call_command('backfill_image_metadata', '--model', 'products.Brand', stdout=StringIO())
+        self.assertIn('lqip', Brand.objects.get(pk=self.brand.pk).image_variants['logo'])
+
+    def test_manifest_swapped_in_meanwhile_is_kept(self):
+        replacement = {**self.manifest, 'src': 'brands/newer.jpg'}
+
+        def swap_then_add(storage, manifest):
+            Brand.objects.filter(pk=self.brand.pk).update(image_variants={'logo': replacement})
+            return add_metadata(storage, manifest)
+
+        with mock.patch('utils.management.commands.backfill_image_metadata.add_metadata', side_effect=swap_then_add):
+            call_command('backfill_image_metadata', '--model', 'products.Brand', stdout=StringIO())
+        self.assertEqual(Brand.objects.get(pk=self.brand.pk).image_variants, {'logo': replacement})
+
+    def test_images_in_flight_when_a_worker_dies_are_retried(self):
+        brands = [Brand.objects.create(name=f'Brand {n}', slug=f'brand-{n}', logo=image_file(color=(n, 0, 0))) for n in range(2)]
+        pools = []
+
+        class DyingPool:
+            """Runs jobs inline; the first pool dies on its first job"""
+            def __init__(self):
+                self.dead = not pools
+                pools.append(self)
+
+            def submit(self, fn, *args):
+                future = Future()
+                if self.dead:
+                    future.set_exception(BrokenProcessPool('worker died'))
+                else:
+                    future.set_result(fn(*args))
+                return future
+
+            def shutdown(self, **kwargs):
+                pass
+
+        ImageProcessingJob.objects.all().delete()
+        with mock.patch.object(ReoptimizeMedia, '_new_pool', lambda command, processes: DyingPool()):
+            call_command('reoptimize_media', '--model', 'products.Brand', stdout=StringIO())
+        checkpoint = MediaReoptimizationCheckpoint.objects.get(model='products.Brand')
+        self.assertEqual((checkpoint.optimized, checkpoint.failed), (2, 0))
+        self.assertEqual(len(pools), 2)
+        for brand in brands:
+            brand.refresh_from_db()
+            self.assertEqual(brand.image_variants['logo']['src'], brand.logo.name)
@@ -0,0 +1,49 @@
+import logging
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from django.views.decorators.http import require_safe
+
+from .image_optimizer import ImageTooLarge
+from .image_resize import FORMATS, cache_key, get_resized, is_allowed_size, source_path
+
+logger = logging.getLogger(__name__)
+
+
+def _cache_headers(response, etag):
+    response['ETag'] = etag
+    response['Cache-Control'] = f'public, max-age={settings.IMAGE_RESIZE_MAX_AGE}'
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+
+@require_safe
+def resized_image(request, width, height, path):
+    """
+    On-demand resize of a media image: GET /media/r/<width>x<height>/<path>
+    The image is fitted inside the box (never enlarged) and served as WebP to
+    browsers that accept it, JPEG otherwise. Renditions are cached on disk.
+    """
+    if not is_allowed_size(width, height):
+        raise Http404("Image size not allowed")
+    original = source_path(path)
+    if original is None:
+        raise Http404("Image not found")
+
+    image_format = 'WEBP' if 'image/webp' in request.headers.get('Accept', '') else 'JPEG'
+    # The key only depends on the original and the request: revalidation needs no rendering
+    etag = f'"{cache_key(original, path, width, height, image_format)}"'
+    if {etag, '*'} & set(parse_etags(request.headers.get('If-None-Match', ''))):
+        return _cache_headers(HttpResponseNotModified(), etag)
+    try:
+        cached, _ = get_resized(original, path, width, height, image_format)
+        response = FileResponse(open(cached, 'rb'), content_type=FORMATS[image_format][1])
+    except ImageTooLarge as e:
+        return HttpResponse(str(e), status=413, content_type='text/plain')
+    except (ValueError, FileNotFoundError) as e:
+        logger.warning(f"Could not serve resized image {path} at {width}x{height}: {e}")
+        raise Http404("Image could not be resized")
+
+    return _cache_headers(response, etag)
@@ -0,0 +1,22 @@
+"""
+Django management command to write the storefront sitemap index and its shards
+"""
+from django.core.management.base import BaseCommand
+
+from website.sitemaps import generate_sitemaps
+
+
+class Command(BaseCommand):
+    help = 'Write sharded sitemaps under MEDIA_ROOT/sitemaps (rewriting only the shards that changed)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rewrite every shard instead of only changed ones')
+
+    def handle(self, *args, **options):
+        self.stdout.write('🗺️ Writing sitemaps...')
+        result = generate_sitemaps(full=options['full'])
+        self.stdout.write(
+            f"  {result['urls']} URLs in {result['shards']} shards: {result['written']} written, "
+            f"{result['kept']} unchanged, {result['removed']} removed"
+        )
+        self.stdout.write(self.style.SUCCESS(f"✅ Sitemap index written to {result['path']}"))
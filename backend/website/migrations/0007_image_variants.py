@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-19 03:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0006_alter_navbarsettings_link_type_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Responsive WebP/JPEG variants of the image (utils.image_variants)'),
+        ),
+        migrations.AddField(
+            model_name='herobanner',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Responsive WebP/JPEG variants of the image (utils.image_variants)'),
+        ),
+        migrations.AddField(
+            model_name='horizontalpromobanner',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Responsive WebP/JPEG variants of the image (utils.image_variants)'),
+        ),
+        migrations.AddField(
+            model_name='offerbanner',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Responsive WebP/JPEG variants of the image (utils.image_variants)'),
+        ),
+    ]
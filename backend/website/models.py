@@ -1,7 +1,7 @@
 from django.db import models
 from django.core.validators import URLValidator
 import uuid
-from utils.image_optimizer import ImageOptimizer
+from utils.image_jobs import queue_image_processing
 
 class BaseModel(models.Model):
     """Base model with common fields"""
@@ -99,6 +99,7 @@ class HeroBanner(BaseModel):
     
     # Single image field
     image = models.ImageField(upload_to='banners/hero/', blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, help_text="Responsive WebP/JPEG variants of the image (utils.image_variants)")
     
     # External image URL (alternative to uploaded image)
     image_url = models.URLField(blank=True, null=True)
@@ -120,15 +121,8 @@ class HeroBanner(BaseModel):
         return f"Banner {self.order}: {self.title or 'Untitled'}"
     
     def save(self, *args, **kwargs):
-        # Optimize hero banner image before saving
-        if self.image and hasattr(self.image, 'file'):
-            try:
-                optimized = ImageOptimizer.optimize_banner_image(self.image.file)
-                if optimized:
-                    self.image.file = optimized
-            except Exception as e:
-                print(f"Error optimizing hero banner image: {e}")
         super().save(*args, **kwargs)
+        queue_image_processing(self, 'image', 'banner')
 
 class OfferBanner(BaseModel):
     """Promotional offer banners"""
@@ -146,6 +140,7 @@ class OfferBanner(BaseModel):
     
     # Image settings
     image = models.ImageField(upload_to='banners/offers/', blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, help_text="Responsive WebP/JPEG variants of the image (utils.image_variants)")
     image_url = models.URLField(blank=True, null=True)
     alt_text = models.CharField(max_length=200, blank=True, null=True, help_text="SEO alt text for the banner image")
     
@@ -184,16 +179,7 @@ class OfferBanner(BaseModel):
         return f"{self.get_banner_type_display()}: {self.title or 'Untitled'}"
     
     def save(self, *args, **kwargs):
-        """Auto-generate meta fields and optimize image if not provided"""
-        # Optimize banner image before saving
-        if self.image and hasattr(self.image, 'file'):
-            try:
-                optimized = ImageOptimizer.optimize_banner_image(self.image.file)
-                if optimized:
-                    self.image.file = optimized
-            except Exception as e:
-                print(f"Error optimizing offer banner image: {e}")
-        
+        """Auto-generate meta fields if not provided and queue image optimization"""
         # Auto-generate meta fields
         if not self.meta_title and self.title:
             self.meta_title = self.title[:60]
@@ -202,6 +188,7 @@ class OfferBanner(BaseModel):
         if not self.alt_text and self.title:
             self.alt_text = f"{self.title} - {self.discount_text or 'Special Offer'}"
         super().save(*args, **kwargs)
+        queue_image_processing(self, 'image', 'banner')
 
 class HorizontalPromoBanner(BaseModel):
     """Horizontal promotional banners"""
@@ -210,6 +197,7 @@ class HorizontalPromoBanner(BaseModel):
     
     # Image settings
     image = models.ImageField(upload_to='banners/horizontal/', blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, help_text="Responsive WebP/JPEG variants of the image (utils.image_variants)")
     image_url = models.URLField(blank=True, null=True)
     
     # Button settings
@@ -235,15 +223,8 @@ class HorizontalPromoBanner(BaseModel):
         return self.title
     
     def save(self, *args, **kwargs):
-        # Optimize horizontal promo banner image before saving
-        if self.image and hasattr(self.image, 'file'):
-            try:
-                optimized = ImageOptimizer.optimize_banner_image(self.image.file)
-                if optimized:
-                    self.image.file = optimized
-            except Exception as e:
-                print(f"Error optimizing horizontal promo banner image: {e}")
         super().save(*args, **kwargs)
+        queue_image_processing(self, 'image', 'banner')
 
 class BlogPost(BaseModel):
     """Blog posts for blog section"""
@@ -253,6 +234,7 @@ class BlogPost(BaseModel):
     
     # Image settings
     featured_image = models.ImageField(upload_to='blog/', blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, help_text="Responsive WebP/JPEG variants of the image (utils.image_variants)")
     featured_image_url = models.URLField(blank=True, null=True)
     
     # SEO and routing
@@ -272,15 +254,8 @@ class BlogPost(BaseModel):
         return self.title
     
     def save(self, *args, **kwargs):
-        # Optimize blog featured image before saving
-        if self.featured_image and hasattr(self.featured_image, 'file'):
-            try:
-                optimized = ImageOptimizer.optimize_banner_image(self.featured_image.file)
-                if optimized:
-                    self.featured_image.file = optimized
-            except Exception as e:
-                print(f"Error optimizing blog featured image: {e}")
         super().save(*args, **kwargs)
+        queue_image_processing(self, 'featured_image', 'banner')
 
 class FooterSection(BaseModel):
     """Footer sections and links"""
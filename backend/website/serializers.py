@@ -4,6 +4,7 @@ from .models import (
     HorizontalPromoBanner, BlogPost, FooterSection, FooterLink, 
     SocialMediaLink, SiteSettings
 )
+from utils.image_variants import srcset_data
 
 class NavbarSettingsSerializer(serializers.ModelSerializer):
     children = serializers.SerializerMethodField()
@@ -33,12 +34,13 @@ class OfferCategorySerializer(serializers.ModelSerializer):
 
 class HeroBannerSerializer(serializers.ModelSerializer):
     image_url_final = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
     
     class Meta:
         model = HeroBanner
         fields = [
             'id', 'title', 'subtitle', 'description', 'button_text', 'button_url',
-            'order', 'autoplay_duration', 'is_active', 'image_url_final'
+            'order', 'autoplay_duration', 'is_active', 'image_url_final', 'image_srcset'
         ]
     
     def get_image_url_final(self, obj):
@@ -50,8 +52,12 @@ class HeroBannerSerializer(serializers.ModelSerializer):
             return obj.image.url
         return obj.image_url
 
+    def get_image_srcset(self, obj):
+        return srcset_data(obj.image_variants.get('image'), self.context.get('request'))
+
 class OfferBannerSerializer(serializers.ModelSerializer):
     image_url_final = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
     
     class Meta:
         model = OfferBanner
@@ -59,7 +65,7 @@ class OfferBannerSerializer(serializers.ModelSerializer):
             'id', 'title', 'subtitle', 'description', 'banner_type', 'alt_text',
             'image', 'image_url', 'discount_text', 'coupon_code', 'button_text', 'button_url',
             'gradient_colors', 'order', 'show_on_mobile', 'show_on_desktop',
-            'is_active', 'image_url_final', 'meta_title', 'meta_description',
+            'is_active', 'image_url_final', 'image_srcset', 'meta_title', 'meta_description',
             'created_at', 'updated_at'
         ]
     
@@ -71,14 +77,18 @@ class OfferBannerSerializer(serializers.ModelSerializer):
             return obj.image.url
         return obj.image_url
 
+    def get_image_srcset(self, obj):
+        return srcset_data(obj.image_variants.get('image'), self.context.get('request'))
+
 class HorizontalPromoBannerSerializer(serializers.ModelSerializer):
     image_url_final = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
     
     class Meta:
         model = HorizontalPromoBanner
         fields = [
             'id', 'title', 'subtitle', 'button_text', 'button_url',
-            'overlay_colors', 'order', 'is_active', 'image_url_final'
+            'overlay_colors', 'order', 'is_active', 'image_url_final', 'image_srcset'
         ]
     
     def get_image_url_final(self, obj):
@@ -89,14 +99,18 @@ class HorizontalPromoBannerSerializer(serializers.ModelSerializer):
             return obj.image.url
         return obj.image_url
 
+    def get_image_srcset(self, obj):
+        return srcset_data(obj.image_variants.get('image'), self.context.get('request'))
+
 class BlogPostSerializer(serializers.ModelSerializer):
     image_url_final = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
     
     class Meta:
         model = BlogPost
         fields = [
             'id', 'title', 'description', 'content', 'slug', 'publish_date',
-            'is_featured', 'order', 'is_active', 'image_url_final'
+            'is_featured', 'order', 'is_active', 'image_url_final', 'image_srcset'
         ]
     
     def get_image_url_final(self, obj):
@@ -107,15 +121,19 @@ class BlogPostSerializer(serializers.ModelSerializer):
             return obj.featured_image.url
         return obj.featured_image_url
 
+    def get_image_srcset(self, obj):
+        return srcset_data(obj.image_variants.get('featured_image'), self.context.get('request'))
+
 class BlogPostListSerializer(serializers.ModelSerializer):
     """Lighter serializer for list views"""
     image_url_final = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
     
     class Meta:
         model = BlogPost
         fields = [
             'id', 'title', 'description', 'slug', 'publish_date',
-            'is_featured', 'image_url_final'
+            'is_featured', 'image_url_final', 'image_srcset'
         ]
     
     def get_image_url_final(self, obj):
@@ -126,6 +144,9 @@ class BlogPostListSerializer(serializers.ModelSerializer):
             return obj.featured_image.url
         return obj.featured_image_url
 
+    def get_image_srcset(self, obj):
+        return srcset_data(obj.image_variants.get('featured_image'), self.context.get('request'))
+
 class FooterLinkSerializer(serializers.ModelSerializer):
     class Meta:
         model = FooterLink
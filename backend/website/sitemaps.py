@@ -0,0 +1,284 @@
+# website/sitemaps.py
+"""
+Precomputed, sharded XML sitemaps for the storefront.
+
+Sitemaps are written under MEDIA_ROOT/sitemaps and served as static files: a
+`sitemap.xml` index pointing at gzipped shards of at most SITEMAP_SHARD_SIZE
+URLs each (the protocol allows 50,000). Rows are streamed from `values_list`
+iterators straight into the gzip writer, so no model instances are created
+and memory stays flat however large the catalog is.
+
+Shards are keyset ranges, not page numbers: each shard remembers the sort key
+of its last row, and rows are ordered by creation, so new rows only ever land
+in the last shard. On the next run each shard's range is checked with one
+aggregate query (row count and max `updated_at`); only shards whose signature
+changed are rewritten (split if they outgrew the size limit), emptied ones are
+dropped, and the others keep their files. Categories and subcategories have
+no timestamp of their own - their lastmod is the newest product in them - and
+are few, so they are rewritten on every run.
+"""
+import gzip
+import json
+import logging
+import os
+from datetime import datetime, timezone as dt_timezone
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+SITEMAP_DIR = 'sitemaps'
+INDEX_NAME = 'sitemap.xml'
+STATE_NAME = 'state.json'
+STATE_VERSION = 1
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+
+def _after(order_fields, key):
+    """Q for the rows sorting after `key` on `order_fields`"""
+    condition = Q(**{f'{order_fields[-1]}__gt': key[-1]})
+    for field, value in zip(reversed(order_fields[:-1]), reversed(key[:-1])):
+        condition = Q(**{f'{field}__gt': value}) | (Q(**{field: value}) & condition)
+    return condition
+
+
+def _isoformat(value):
+    """W3C datetime of a lastmod value, in UTC"""
+    if value is None:
+        return None
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value.astimezone(dt_timezone.utc).isoformat(timespec='seconds')
+
+
+def _json_key(key):
+    return [value.isoformat() if isinstance(value, datetime) else value if isinstance(value, int) else str(value)
+            for value in key]
+
+
+class SitemapSource:
+    """
+    One kind of storefront page: the rows to list, the unique creation order
+    shards are cut in, where lastmod comes from and the fields formatted into
+    its SITEMAP_URL_PATTERNS entry.
+    """
+
+    def __init__(self, name, queryset, order_fields, lastmod_field, url_fields):
+        self.name = name
+        self.queryset = queryset
+        self.order_fields = order_fields
+        self.lastmod_field = lastmod_field
+        self.url_fields = url_fields
+        # A lastmod across a relation (newest product of a category) is an
+        # aggregate: it cannot be checked per range, the source is rewritten
+        self.tracks_changes = '__' not in lastmod_field
+
+    def rows(self, lower=None, upper=None):
+        """Rows sorting after key `lower`, up to and including key `upper`"""
+        queryset = self.queryset()
+        if lower is not None:
+            queryset = queryset.filter(_after(self.order_fields, lower))
+        if upper is not None:
+            queryset = queryset.exclude(_after(self.order_fields, upper))
+        return queryset
+
+    def signature(self, lower, upper):
+        """[row count, newest lastmod] of a range"""
+        result = self.rows(lower, upper).aggregate(count=Count('pk'), lastmod=Max(self.lastmod_field))
+        return [result['count'], _isoformat(result['lastmod'])]
+
+    def stream(self, lower=None, upper=None):
+        """(sort key, path, lastmod) of the rows of a range, in order"""
+        pattern = settings.SITEMAP_URL_PATTERNS[self.name]
+        queryset = self.rows(lower, upper).order_by(*self.order_fields)
+        lastmod_field = self.lastmod_field
+        if not self.tracks_changes:
+            queryset = queryset.annotate(sitemap_lastmod=Max(lastmod_field))
+            lastmod_field = 'sitemap_lastmod'
+        key_length, url_length = len(self.order_fields), len(self.url_fields)
+        for row in queryset.values_list(*self.order_fields, *self.url_fields, lastmod_field).iterator(
+            chunk_size=settings.SITEMAP_CHUNK_SIZE
+        ):
+            values = dict(zip(self.url_fields, row[key_length:key_length + url_length]))
+            yield row[:key_length], pattern.format(**values), row[-1]
+
+
+def sitemap_sources():
+    """The sources listed in the index, in order; those without a URL pattern are left out"""
+    from products.models import Category, Product, SubCategory
+    from sections.models import Section
+    from .models import BlogPost, OfferCategory
+
+    sources = [
+        SitemapSource(
+            'products', lambda: Product.objects.filter(is_active=True),
+            ('created_at', 'pk'), 'updated_at', ('slug',),
+        ),
+        SitemapSource(
+            'categories', lambda: Category.objects.all(),
+            ('pk',), 'subcategories__products__updated_at', ('slug',),
+        ),
+        SitemapSource(
+            'subcategories', lambda: SubCategory.objects.all(),
+            ('pk',), 'products__updated_at', ('slug', 'category__slug'),
+        ),
+        SitemapSource(
+            'sections', lambda: Section.objects.filter(is_active=True),
+            ('created_at', 'pk'), 'updated_at', ('pk', 'slug'),
+        ),
+        # Offers have no page of their own: list the on-site pages they link to
+        SitemapSource(
+            'offers', lambda: OfferCategory.objects.filter(is_active=True, link__startswith='/'),
+            ('pk',), 'updated_at', ('link', 'slug'),
+        ),
+        SitemapSource(
+            'blog', lambda: BlogPost.objects.filter(is_active=True),
+            ('pk',), 'updated_at', ('slug',),
+        ),
+    ]
+    return [source for source in sources if settings.SITEMAP_URL_PATTERNS.get(source.name)]
+
+
+# ---------------------------------------------------------------------------
+# Files
+# ---------------------------------------------------------------------------
+
+def sitemap_dir():
+    return os.path.join(settings.MEDIA_ROOT, SITEMAP_DIR)
+
+
+def _read_state():
+    try:
+        with open(os.path.join(sitemap_dir(), STATE_NAME), encoding='utf-8') as handle:
+            state = json.load(handle)
+    except (OSError, ValueError):
+        return None
+    return state if state.get('version') == STATE_VERSION else None
+
+
+def _write_atomic(path, content, compress=False):
+    tmp_path = f'{path}.{os.getpid()}.part'
+    opener = gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=6) if compress \
+        else open(tmp_path, 'w', encoding='utf-8')
+    with opener as handle:
+        for chunk in content:
+            handle.write(chunk)
+    os.replace(tmp_path, path)
+
+
+def _url_entry(site_url, path, lastmod):
+    lastmod = _isoformat(lastmod)
+    lastmod_tag = f'<lastmod>{lastmod}</lastmod>' if lastmod else ''
+    return f'<url><loc>{escape(site_url + path)}</loc>{lastmod_tag}</url>\n'
+
+
+def _write_range(source, lower, upper, state):
+    """Write the rows of a range as one or more new shards; returns their state entries"""
+    site_url = settings.SITEMAP_SITE_URL.rstrip('/')
+    shards = []
+    rows = source.stream(lower, upper)
+    row = next(rows, None)
+    while row is not None:
+        state['next_id'] += 1
+        shard = {'file': f"sitemap-{source.name}-{state['next_id']}.xml.gz", 'count': 0, 'lastmod': None}
+
+        def urls():
+            nonlocal row
+            newest = None
+            yield f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{SITEMAP_NS}">\n'
+            while row is not None and shard['count'] < settings.SITEMAP_SHARD_SIZE:
+                key, path, lastmod = row
+                yield _url_entry(site_url, path, lastmod)
+                shard['count'] += 1
+                shard['last_key'] = _json_key(key)
+                if lastmod is not None and (newest is None or lastmod > newest):
+                    newest = lastmod
+                row = next(rows, None)
+            yield '</urlset>\n'
+            shard['lastmod'] = _isoformat(newest)
+
+        _write_atomic(os.path.join(sitemap_dir(), shard['file']), urls(), compress=True)
+        shards.append(shard)
+    return shards
+
+
+def _update_source(source, old_shards, state, stats):
+    """Shards of one source after bringing them up to date"""
+    if not source.tracks_changes or not old_shards:
+        shards = _write_range(source, None, None, state)
+        stats['written'] += len(shards)
+        return shards
+
+    shards = []
+    lower = None
+    for position, shard in enumerate(old_shards):
+        # The last shard is open-ended: new rows land there
+        upper = None if position == len(old_shards) - 1 else shard['last_key']
+        signature = source.signature(lower, upper)
+        if signature == [shard['count'], shard['lastmod']] and os.path.exists(
+            os.path.join(sitemap_dir(), shard['file'])
+        ):
+            shards.append(shard)
+            stats['kept'] += 1
+        elif signature[0]:
+            written = _write_range(source, lower, upper, state)
+            shards.extend(written)
+            stats['written'] += len(written)
+        lower = shard['last_key']
+    return shards
+
+
+def _index_entries(sources, shard_lists):
+    files_url = settings.SITEMAP_FILES_URL.rstrip('/') + '/'
+    yield f'<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="{SITEMAP_NS}">\n'
+    for source in sources:
+        for shard in shard_lists[source.name]:
+            lastmod_tag = f"<lastmod>{shard['lastmod']}</lastmod>" if shard['lastmod'] else ''
+            yield f"<sitemap><loc>{escape(files_url + shard['file'])}</loc>{lastmod_tag}</sitemap>\n"
+    yield '</sitemapindex>\n'
+
+
+def generate_sitemaps(full=False):
+    """
+    Write (or bring up to date) the sitemap index and its shards under
+    MEDIA_ROOT/sitemaps. Returns {'path', 'urls', 'shards', 'written', 'kept', 'removed'}.
+    """
+    os.makedirs(sitemap_dir(), exist_ok=True)
+    old_state = None if full else _read_state()
+    state = {'version': STATE_VERSION, 'next_id': old_state['next_id'] if old_state else 0, 'sources': {}}
+    stats = {'written': 0, 'kept': 0}
+
+    sources = sitemap_sources()
+    for source in sources:
+        old_shards = old_state['sources'].get(source.name, []) if old_state else []
+        state['sources'][source.name] = _update_source(source, old_shards, state, stats)
+
+    _write_atomic(os.path.join(sitemap_dir(), INDEX_NAME), _index_entries(sources, state['sources']))
+    state['generated_at'] = timezone.now().isoformat()
+    _write_atomic(os.path.join(sitemap_dir(), STATE_NAME), [json.dumps(state)])
+
+    # Shards replaced, split or emptied since the last run
+    current = {shard['file'] for shards in state['sources'].values() for shard in shards}
+    removed = 0
+    for name in os.listdir(sitemap_dir()):
+        if name.startswith('sitemap-') and name.endswith('.xml.gz') and name not in current:
+            os.remove(os.path.join(sitemap_dir(), name))
+            removed += 1
+
+    shards = [shard for source_shards in state['sources'].values() for shard in source_shards]
+    result = {
+        'path': os.path.join(SITEMAP_DIR, INDEX_NAME),
+        'urls': sum(shard['count'] for shard in shards),
+        'shards': len(shards),
+        'written': stats['written'],
+        'kept': stats['kept'],
+        'removed': removed,
+    }
+    logger.info(
+        f"Sitemaps: {result['urls']} URLs in {result['shards']} shards "
+        f"({result['written']} written, {result['kept']} unchanged, {result['removed']} removed)"
+    )
+    return result